@@ -0,0 +1,63 @@
+### Prediction Service Load Test ###
+# Concurrent clients against the prediction service, reporting latency percentiles & throughput.
+#   python -m benchmarks.load_test                       (starts a service in-process on a free port)
+#   python -m benchmarks.load_test --url http://127.0.0.1:8050 --clients 32 --seconds 10 --bulk 50
+import json, time, argparse, threading, numpy as np, polars as pl
+from urllib.request import Request, urlopen
+
+def client(url: str, match_ids: list, bulk: int, stop: float, latencies: list, seed: int):
+    rng = np.random.default_rng(seed)
+    while time.perf_counter() < stop:
+        body = json.dumps({"match_ids": list(rng.choice(match_ids, size=bulk))}).encode()
+        start = time.perf_counter()
+        with urlopen(Request(f"{url}/predict", data=body, headers={"Content-Type": "application/json"})) as response:
+            response.read()
+        latencies.append(time.perf_counter() - start)
+
+def run(url: str, match_ids: list, clients: int = 16, seconds: float = 5.0, bulk: int = 1) -> dict:
+    latencies = [[] for _ in range(clients)]
+    stop = time.perf_counter() + seconds
+    threads = [threading.Thread(target=client, args=(url, match_ids, bulk, stop, latencies[n], n)) for n in range(clients)]
+    
+    start = time.perf_counter()
+    [i.start() for i in threads]
+    [i.join() for i in threads]
+    elapsed = time.perf_counter() - start
+
+    latency = np.concatenate([np.array(i) for i in latencies]) * 1000
+    return {
+        "clients": clients,
+        "matches_per_request": bulk,
+        "requests": len(latency),
+        "requests_per_second": round(len(latency) / elapsed, 1),
+        "matches_per_second": round(len(latency) * bulk / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latency, 50)), 2),
+        "p99_ms": round(float(np.percentile(latency, 99)), 2),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=None)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--bulk", type=int, default=1)
+    args = parser.parse_args()
+
+    features = pl.read_csv("data/dropshot.csv").drop("P1_win", "P2_win")
+    url, server = args.url, None
+
+    if url is None:
+        from src.serve import PredictionService, serve
+        server = serve(PredictionService(features=features), port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    match_ids = features.select("match_id").to_series().to_list()
+    result = run(url, match_ids, args.clients, args.seconds, args.bulk)
+    result["model_batches"] = json.loads(urlopen(f"{url}/health").read())["batches"]
+
+    for k, v in result.items():
+        print(f"{k:>20} : {v}")
+
+    if server is not None:
+        server.shutdown()
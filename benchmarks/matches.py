@@ -0,0 +1,49 @@
+### Matches Pipeline Benchmark ###
+# Compares the row-wise (legacy) and vectorised tour results transform on a full 1968 - today ATP + WTA sized history.
+# The history is rebuilt in raw csv shape from the stored partitions, so no network access is needed.
+#   python -m benchmarks.matches
+import time, datetime as dt, polars as pl
+from src import matches
+from benchmarks import legacy
+
+def raw_history(tours: list = ["ATP", "WTA"], start_year: int = 1968, end_year: int = dt.datetime.now().year + 1) -> pl.DataFrame:
+    """Raw (Sackmann csv shaped) tour results, repeated to cover start_year to end_year"""
+    level_map = {1: "A", 2: "M", 3: "F", 4: "G", 0: "D"}
+    frames = []
+
+    for tour in tours:
+        stored = matches.load_tour_results(tour).collect()
+        stored_years = stored.select(pl.col("year").n_unique()).item()
+        stored = stored.with_columns(
+            tourney_level=pl.col("tourney_level").replace_strict(level_map, return_dtype=pl.String),
+            tourney_date=pl.col("tourney_date").dt.strftime("%Y%m%d").cast(pl.Int64),
+            winner_entry=pl.lit(None, pl.String), winner_seed=pl.lit(None, pl.Int64),
+            loser_entry=pl.lit(None, pl.String), loser_seed=pl.lit(None, pl.Int64),
+        ).drop("year", "round_no", "tour_points", "points_winner", "points_loser", "sets_played")
+        
+        frames += [stored] * max(1, round((end_year - start_year) / stored_years))
+
+    return pl.concat(frames, how="vertical_relaxed")
+
+def timed(func, *args) -> tuple:
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+def run() -> dict:
+    raw = raw_history()
+
+    t_legacy, out_legacy = timed(lambda df: legacy.transform_tour_results(legacy.parse_tourney_date(df)), raw)
+    t_vector, out_vector = timed(lambda df: matches.transform_tour_results(matches.parse_tourney_date(df)), raw)
+
+    return {
+        "rows": raw.height,
+        "legacy_seconds": round(t_legacy, 3),
+        "vectorised_seconds": round(t_vector, 3),
+        "speedup": round(t_legacy / t_vector, 1),
+        "parity": out_legacy.equals(out_vector),
+    }
+
+if __name__ == "__main__":
+    for k, v in run().items():
+        print(f"{k:>20} : {v}")
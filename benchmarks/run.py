@@ -0,0 +1,128 @@
+### Pipeline Benchmark Suite ###
+# Times each pipeline stage against a synthetic archive (see benchmarks.synthetic) served over local HTTP, recording 
+# wall time and peak RSS, and compares them with benchmarks/baseline.json. Each stage runs in a fresh process.
+#   python -m benchmarks.run                    1x volume, fails (exit 1) on a regression vs the baseline
+#   python -m benchmarks.run --scales 1 10 100  larger volumes (100x needs a lot of disk & memory)
+#   python -m benchmarks.run --update           record the results as the new baseline
+import os, sys, json, time, shutil, argparse, resource, tempfile, polars as pl
+import multiprocessing as mp
+from benchmarks import synthetic
+
+BASELINE = "benchmarks/baseline.json"
+SLAM_NAMES = {"ausopen": "Australian Open", "frenchopen": "French Open", "wimbledon": "Wimbledon", "usopen": "US Open"}
+
+def stage_tour_results(url: str, work: str, years: dict) -> int:
+    from src.matches import get_tour_results
+    from src.cache import HttpCache
+    start, end = years["tour_years"]
+    return get_tour_results(start, end, "ATP", url_base=f"{url}/atp_matches_", cache=HttpCache(f"{work}/cache")).height
+
+def stage_event_results(url: str, work: str, years: dict) -> int:
+    from src import events, matches
+    from src.cache import HttpCache
+    from src.players import PlayerIndex
+    events.SLAM_URL = f"{url}/"
+    matches.TOUR_URLS["ATP"] = f"{url}/atp_matches_"
+    cache, players, rows = HttpCache(f"{work}/cache"), PlayerIndex(f"{work}/players.csv"), 0
+
+    for year in range(*years["slam_years"]):
+        for slug, name in SLAM_NAMES.items():
+            event = events.EventData("atp", name, year, cache=cache, players=players)
+            path = f"{work}/events/atp-{slug}-{year}.parquet"
+            if event.write(path):
+                rows += pl.scan_parquet(path).select(pl.len()).collect().item()
+    return rows
+
+def stage_feature_table(url: str, work: str, years: dict) -> int:
+    from src.model import NeuralModel
+    from src.features import FeatureStore
+    return NeuralModel.create_feature_table(f"{work}/events", store=FeatureStore(f"{work}/features")).height
+
+def stage_build(url: str, work: str, years: dict) -> int:
+    try:
+        import keras
+    except ImportError:
+        return None
+    from src.model import NeuralModel
+    from src.features import FeatureStore
+    data = NeuralModel.create_feature_table(f"{work}/events", store=FeatureStore(f"{work}/features"))
+    NeuralModel.build(data, config={"epochs": 8})
+    return data.height
+
+def stage_pred(url: str, work: str, years: dict) -> int:
+    from src.model import NeuralModel
+    from src.features import FeatureStore
+    data = NeuralModel.create_feature_table(f"{work}/events", store=FeatureStore(f"{work}/features"))
+    return NeuralModel.pred("models/dropshot.npz", data).height
+
+STAGES = {
+    "get_tour_results": stage_tour_results,
+    "get_results": stage_event_results,
+    "create_feature_table": stage_feature_table,
+    "build": stage_build,
+    "pred": stage_pred,
+}
+
+def _measure(name: str, args: tuple) -> dict:
+    start = time.perf_counter()
+    rows = STAGES[name](*args)
+    seconds = time.perf_counter() - start
+    return {"rows": rows, "seconds": round(seconds, 3), "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+
+def run(scale: int = 1, work: str = None) -> dict:
+    '''Generate a scale x archive, then run & measure each stage in its own process'''
+    work = work or tempfile.mkdtemp(prefix=f"dropshot-bench-{scale}x-")
+    source = f"{work}/source"
+    years = synthetic.generate(source, scale)
+    server, url = synthetic.serve_directory(source)
+    context = mp.get_context("spawn")
+    results = {}
+
+    try:
+        for name in STAGES:
+            with context.Pool(1) as pool:
+                result = pool.apply(_measure, (name, (url, work, years)))
+            if result["rows"] is not None:
+                results[f"{name}@{scale}x"] = result
+    finally:
+        server.shutdown()
+        shutil.rmtree(work, ignore_errors=True)
+    
+    return results
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.5) -> list:
+    '''Stages slower (or with a higher peak RSS) than baseline * (1 + tolerance)'''
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        for metric in ["seconds", "peak_rss_mb"]:
+            if result[metric] > baseline[key][metric] * (1 + tolerance):
+                regressions.append(f"{key} {metric} : {result[metric]} vs baseline {baseline[key][metric]}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", type=int, nargs="+", default=[1])
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--update", action="store_true")
+    args = parser.parse_args()
+
+    results = {}
+    for scale in args.scales:
+        results |= run(scale)
+
+    for key, result in results.items():
+        print(f"{key:>28} : {result['seconds']:>8.2f}s {result['peak_rss_mb']:>8.1f}MB {result['rows']:>10,} rows")
+
+    baseline = json.load(open(BASELINE)) if os.path.exists(BASELINE) else {}
+    if args.update:
+        with open(BASELINE, "w") as f:
+            json.dump(baseline | results, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {BASELINE}")
+    else:
+        regressions = compare(results, baseline, args.tolerance)
+        for i in regressions:
+            print(f"REGRESSION {i}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,208 @@
+### Synthetic Tennis Data ###
+# Sackmann shaped tour results, slam point-by-point matches & points, and ranking columns, at any multiple of the real volume.
+# Volume scales by the number of seasons (real per-file shapes are kept) :
+#   1x = 57 tour seasons (1968 - today) and 14 seasons of point-by-point slams (2011 - 2024), larger scales add
+#   later seasons (10x = 1968 - 2537, slams from 2398)
+#   python -m benchmarks.synthetic data/synthetic 10
+import os, threading, functools, numpy as np, polars as pl
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+TOUR_SEASONS = 57
+SLAM_SEASONS = 14
+TOUR_MATCHES = 2_800 # per season, excluding slams
+SLAMS = {"ausopen": ("Australian Open", "Hard", "01"), "frenchopen": ("Roland Garros", "Clay", "05"), "wimbledon": ("Wimbledon", "Grass", "06"), "usopen": ("US Open", "Hard", "08")}
+ROUNDS = ["R128", "R64", "R32", "R16", "QF", "SF", "F"]
+
+def player_pool(n: int = 600, seed: int = 0) -> pl.DataFrame:
+    rng = np.random.default_rng(seed)
+    first = ["Novak", "Rafael", "Roger", "Andy", "Carlos", "Jannik", "Daniil", "Alexander", "Stefanos", "Casper", "Holger", "Taylor"]
+    return pl.DataFrame({
+        "id": np.arange(100_000, 100_000 + n),
+        "name": [f"{first[i % len(first)]} Player{i:04d}" for i in range(n)],
+        "hand": rng.choice(["R", "L"], size=n, p=[0.85, 0.15]),
+        "ht": rng.integers(170, 211, size=n),
+        "ioc": rng.choice(["SRB", "ESP", "SUI", "GBR", "ITA", "USA", "FRA", "AUS"], size=n),
+        "age": rng.uniform(18, 38, size=n).round(1),
+        "rank": np.arange(1, n + 1),
+        "rank_points": np.maximum(10, 12_000 * np.exp(-np.arange(n) / 60)).astype(np.int64),
+    })
+
+def _draw(rng, players: pl.DataFrame) -> list:
+    '''Random 128 player knockout bracket, as (round index, match no, winner row, loser row) tuples'''
+    alive, matches = list(rng.choice(players.height, size=128, replace=False)), []
+    for r in range(7):
+        nxt = []
+        for m in range(len(alive) // 2):
+            a, b = alive[2 * m], alive[2 * m + 1]
+            # better ranked player wins ~65% of the time
+            w, l = (a, b) if (rng.random() < 0.65) == (a < b) else (b, a)
+            matches.append((r, m + 1, w, l))
+            nxt.append(w)
+        alive = nxt
+    return matches
+
+def _score(rng, n: int, best_of: np.ndarray) -> list:
+    sets = rng.integers(2, 4, size=n) + (best_of == 5) * rng.integers(0, 3, size=n)
+    games = ["6-4", "7-5", "6-3", "7-6(5)", "6-2", "4-6", "3-6"]
+    scores = [" ".join(rng.choice(games, size=s)) for s in sets]
+    return [s + " RET" if rng.random() < 0.01 else s for s in scores]
+
+def tour_season(year: int, players: pl.DataFrame, seed: int = 0) -> pl.DataFrame:
+    '''One season of atp_matches_{year}.csv (tour events plus the four slams)'''
+    rng = np.random.default_rng(seed + year)
+    events = pl.read_csv("data/static/events.csv").filter(pl.col("points") < 2000)
+    rows = []
+
+    # Slams
+    for slug, (name, surface, month) in SLAMS.items():
+        for r, m, w, l in _draw(np.random.default_rng(seed * 7919 + year * 4 + list(SLAMS).index(slug)), players):
+            rows.append((f"{year}-{slug}", name, surface, 128, "G", int(f"{year}{month}15"), 100 * r + m, w, l, 5, ROUNDS[r]))
+
+    # Tour events
+    event = rng.integers(0, events.height, size=TOUR_MATCHES)
+    pairs = np.stack([rng.choice(players.height, size=2, replace=False) for _ in range(TOUR_MATCHES)])
+    for n in range(TOUR_MATCHES):
+        name, points = events.row(int(event[n]))
+        level = "M" if points == 1000 else "F" if points == 1500 else "A"
+        rows.append((f"{year}-{int(event[n]):04d}", name, "Hard", 32, level, int(f"{year}0{1 + event[n] % 9}01"), n, int(pairs[n, 0]), int(pairs[n, 1]), 3, ROUNDS[2 + n % 5]))
+
+    frame = pl.DataFrame(rows, orient="row", schema=[
+        "tourney_id", "tourney_name", "surface", "draw_size", "tourney_level", "tourney_date", "match_num", "w", "l", "best_of", "round"
+    ])
+    p = players.with_row_index("idx").with_columns(pl.col("idx").cast(pl.Int64))
+    frame = frame.join(p.select(pl.all().name.prefix("winner_")), left_on="w", right_on="winner_idx", maintain_order="left")
+    frame = frame.join(p.select(pl.all().name.prefix("loser_")), left_on="l", right_on="loser_idx", maintain_order="left")
+
+    n = frame.height
+    stats = {f"{s}_{k}": rng.integers(lo, hi, size=n) for s in ["w", "l"] for k, lo, hi in [
+        ("ace", 0, 25), ("df", 0, 10), ("svpt", 40, 140), ("1stIn", 20, 90), ("1stWon", 15, 70), ("2ndWon", 5, 30), ("SvGms", 8, 25), ("bpSaved", 0, 10), ("bpFaced", 0, 15)
+    ]}
+    return frame.with_columns(
+        winner_seed=pl.lit(None, pl.Int64), winner_entry=pl.lit(None, pl.String),
+        loser_seed=pl.lit(None, pl.Int64), loser_entry=pl.lit(None, pl.String),
+        score=pl.Series(_score(rng, n, frame["best_of"].to_numpy())),
+        minutes=pl.Series(rng.integers(50, 300, size=n)),
+        **{k: pl.Series(v) for k, v in stats.items()},
+    ).select(
+        "tourney_id", "tourney_name", "surface", "draw_size", "tourney_level", "tourney_date", "match_num",
+        *[f"winner_{i}" for i in ["id", "seed", "entry", "name", "hand", "ht", "ioc", "age"]],
+        *[f"loser_{i}" for i in ["id", "seed", "entry", "name", "hand", "ht", "ioc", "age"]],
+        "score", "best_of", "round", "minutes", *stats.keys(),
+        "winner_rank", "winner_rank_points", "loser_rank", "loser_rank_points",
+    )
+
+def slam_event(year: int, slug: str, tour: pl.DataFrame, seed: int = 0) -> tuple:
+    '''{year}-{slug}-matches.csv & -points.csv for the men's singles draw in tour (as from tour_season)'''
+    rng = np.random.default_rng(seed + year * 31 + len(slug))
+    draw = tour.filter(pl.col("tourney_id") == f"{year}-{slug}").sort("match_num")
+    
+    round_no = draw["match_num"].to_numpy() // 100 + 1
+    match_no = draw["match_num"].to_numpy() % 100
+    match_ids = [f"{year}-{slug}-1{r}{m:02d}" for r, m in zip(round_no, match_no)]
+    flip = rng.random(draw.height) < 0.5
+
+    winner, loser = draw["winner_name"].to_numpy(), draw["loser_name"].to_numpy()
+    matches = pl.DataFrame({
+        "match_id": match_ids,
+        "year": year,
+        "slam": slug,
+        "match_num": [int(i.split("-")[-1]) for i in match_ids],
+        "player1": np.where(flip, loser, winner),
+        "player2": np.where(flip, winner, loser),
+        "status": "Completed",
+        "winner": np.where(flip, 2, 1),
+        "event_name": None,
+        "round": None,
+    })
+
+    # Points, ~250 per match
+    lengths = rng.integers(150, 350, size=draw.height)
+    n = int(lengths.sum())
+    match_col = np.repeat(np.array(match_ids), lengths)
+    point_no = np.concatenate([np.arange(1, k + 1) for k in lengths])
+    server = (np.concatenate([np.arange(k) // 6 for k in lengths]) % 2) + 1
+    won_by_server = rng.random(n) < 0.63
+    point_winner = np.where(won_by_server, server, 3 - server)
+    scores = np.array(["0", "15", "30", "40", "AD"])
+
+    points = pl.DataFrame({
+        "match_id": match_col,
+        "ElapsedTime": "0:00:00",
+        "SetNo": (point_no // 60 + 1).clip(1, 5),
+        "P1GamesWon": (point_no % 60) // 10,
+        "P2GamesWon": (point_no % 50) // 10,
+        "SetWinner": 0,
+        "GameNo": point_no // 6 + 1,
+        "GameWinner": np.where(point_no % 6 == 0, point_winner, 0),
+        "PointNumber": np.where(point_no == 1, "0X", point_no.astype(str)),
+        "PointWinner": point_winner,
+        "PointServer": server,
+        "Speed_KMH": rng.integers(140, 230, size=n),
+        "Rally": rng.integers(1, 20, size=n),
+        "P1Score": scores[rng.integers(0, 5, size=n)],
+        "P2Score": scores[rng.integers(0, 4, size=n)],
+        "P1PointsWon": point_no // 2,
+        "P2PointsWon": point_no // 2,
+        "P1Ace": (rng.random(n) < 0.06).astype(int),
+        "P2Ace": (rng.random(n) < 0.06).astype(int),
+        "P1Winner": (rng.random(n) < 0.15).astype(int),
+        "P2Winner": (rng.random(n) < 0.15).astype(int),
+        "P1DoubleFault": (rng.random(n) < 0.03).astype(int),
+        "P2DoubleFault": (rng.random(n) < 0.03).astype(int),
+        "P1UnfErr": (rng.random(n) < 0.12).astype(int),
+        "P2UnfErr": (rng.random(n) < 0.12).astype(int),
+        "ServeIndicator": np.where(rng.random(n) < 0.62, 1, 2),
+        "P1DistanceRun": rng.uniform(0, 40, size=n).round(3),
+        "P2DistanceRun": rng.uniform(0, 40, size=n).round(3),
+    })
+    return matches, points
+
+def seasons(scale: int = 1) -> dict:
+    '''
+    Tour & slam season ranges for a scale x archive. Seasons run forward from 1968 so every year keeps four digits
+    (tourney_date is parsed as %Y%m%d), with the slams in the last SLAM_SEASONS * scale of them.
+    '''
+    start = 1968
+    end = start + TOUR_SEASONS * scale
+    if end > 10_000:
+        raise ValueError(f"scale {scale} needs seasons beyond 9999, the largest scale is {(10_000 - start) // TOUR_SEASONS}")
+    return {"tour_years": (start, end), "slam_years": (end - SLAM_SEASONS * scale, end)}
+
+def generate(dir: str, scale: int = 1, seed: int = 0, years: dict = None) -> dict:
+    '''
+    Write a synthetic archive to dir (served as the Sackmann repos by serve_directory) :
+        atp_matches_{year}.csv                  tour results (and the rank columns used by EventData.get_ranks)
+        {year}-{slam}-matches.csv / -points.csv point-by-point slams, for the last SLAM_SEASONS * scale seasons
+    years overrides the season ranges (as from seasons), e.g. to write a slice of a large scale.
+    Returns the tour & slam season ranges.
+    '''
+    years = years or seasons(scale)
+    os.makedirs(dir, exist_ok=True)
+    players = player_pool(seed=seed)
+    for year in range(*years["tour_years"]):
+        tour = tour_season(year, players, seed)
+        tour.write_csv(f"{dir}/atp_matches_{year}.csv")
+
+        if years["slam_years"][0] <= year < years["slam_years"][1]:
+            for slug in SLAMS:
+                matches, points = slam_event(year, slug, tour, seed)
+                matches.write_csv(f"{dir}/{year}-{slug}-matches.csv")
+                points.write_csv(f"{dir}/{year}-{slug}-points.csv")
+    
+    return years
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+def serve_directory(dir: str) -> tuple:
+    '''Serve dir over HTTP on a free local port, returns (server, base url)'''
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_QuietHandler, directory=dir))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    import sys
+    print(generate(sys.argv[1] if len(sys.argv) > 1 else "data/synthetic", int(sys.argv[2]) if len(sys.argv) > 2 else 1))
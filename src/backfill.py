@@ -0,0 +1,201 @@
+### Events Backfill ###
+import os, json, time, threading, datetime as dt, polars as pl
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.error import HTTPError
+from src.cache import HttpCache, default_cache
+from src.events import EventData
+from src.players import PlayerIndex, default_index
+from src.instrument import stage
+
+SLAMS = ["Australian Open", "French Open", "Wimbledon", "US Open"]
+TOURS = ["atp", "wta"]
+
+class SharedReads:
+    '''
+    Read-through layer over an HttpCache for one backfill run : each source csv is downloaded and parsed once however
+    many event jobs read it. A missing source (HTTP 404, e.g. an event that hasn't been published) is remembered and
+    raised to every reader, which EventData treats as no data.
+    '''
+    def __init__(self, cache: HttpCache):
+        self.cache = cache
+        self._frames = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def load(self, url: str, **kwargs):
+        key = (url, tuple(sorted(kwargs.items())))
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+
+        with lock:
+            if key not in self._frames:
+                try:
+                    self._frames[key] = self.cache.read_csv(url, **kwargs)
+                except HTTPError as e:
+                    if e.code != 404:
+                        raise
+                    self._frames[key] = e
+            return self._frames[key]
+
+    def prefetch(self, url: str, **kwargs) -> bool:
+        '''Download & parse a source ahead of its readers, False if it doesn't exist'''
+        return not isinstance(self.load(url, **kwargs), Exception)
+
+    def read_csv(self, url: str, **kwargs):
+        frame = self.load(url, **kwargs)
+        if isinstance(frame, Exception):
+            raise frame
+        return frame
+
+    def size(self, url: str) -> int:
+        return self.cache.size(url)
+
+def run_graph(tasks: dict, workers: int = 8) -> dict:
+    '''
+    Run a task graph, tasks = {key: (fn, [dependency keys])}, on a thread pool. A task starts as soon as all of its
+    dependencies have finished, so the run takes as long as the slowest chain rather than the sum of the tasks.
+    A failed task fails its dependents but not the rest of the graph.
+
+    Returns {key: result} with the exception as the result of failed tasks. Raises ValueError for a dependency on
+    an unknown task or a dependency cycle, which could never run.
+    '''
+    unknown = sorted({f"{key} -> {i}" for key, (_, deps) in tasks.items() for i in deps if i not in tasks})
+    if len(unknown) > 0:
+        raise ValueError(f"unknown dependencies : {', '.join(unknown)}")
+
+    results, running = {}, {}
+    waiting = dict(tasks)
+    stuck = None
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        while len(waiting) > 0 or len(running) > 0:
+            for key, (fn, deps) in list(waiting.items()):
+                failed = [i for i in deps if isinstance(results.get(i), Exception)]
+                if len(failed) > 0:
+                    results[key] = RuntimeError(f"dependency failed : {failed[0]} ({results[failed[0]]})")
+                    del waiting[key]
+                elif all(i in results for i in deps):
+                    running[pool.submit(fn)] = key
+                    del waiting[key]
+
+            if len(running) == 0:
+                if len(waiting) == stuck:
+                    raise ValueError(f"dependency cycle between : {', '.join(map(str, waiting))}")
+                stuck = len(waiting)
+                continue # only failed dependents were resolved this pass
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = running.pop(future)
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    results[key] = e
+
+    return results
+
+def has_ids(path: str) -> bool:
+    '''Whether a stored event carries player ids (events stored before the player index have none)'''
+    frame = pl.scan_parquet(path)
+    if not {"p1_id", "p2_id"} <= set(frame.collect_schema().names()):
+        return False
+    return frame.select(pl.col("p1_id").is_not_null().any() | pl.col("p2_id").is_not_null().any()).collect().item()
+
+def event_file(tour: str, slam: str, year: int) -> str:
+    return f"{tour.lower()}-{slam.replace(' ', '').lower()}-{year}.parquet"
+
+def _load_manifest(dir: str) -> dict:
+    try:
+        with open(f"{dir}/backfill.json") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"jobs": {}}
+
+def _save_manifest(dir: str, manifest: dict):
+    os.makedirs(dir, exist_ok=True)
+    with open(f"{dir}/backfill.json.tmp", "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(f"{dir}/backfill.json.tmp", f"{dir}/backfill.json")
+
+def backfill(tours: list = TOURS, slams: list = SLAMS, years: list = range(2011, 2025), dir: str = "data/events", workers: int = 8,
+             refresh: bool = False, cache: HttpCache = None, players: PlayerIndex = None) -> dict:
+    '''
+    Build the point store for every (tour, slam, year) event in parallel.
+
+    Source downloads are tasks of their own which event jobs depend on, so the shared files (a tour's yearly results
+    with its rankings, a slam's match & point files) are fetched and parsed once. Each finished job is recorded in
+    {dir}/backfill.json as it completes : re-runs skip events already in the store (and events with no data in past years)
+    and retry anything that failed, so an interrupted run picks up where it stopped. refresh = True rebuilds everything.
+    Stored events without player ids (written before the player index, see src.players) are rebuilt once, so the
+    whole store carries ids; events rebuilt since are recorded with ids = True and not checked again.
+
+    Returns a count of jobs by outcome (done, empty, failed, skipped).
+    '''
+    cache = cache or default_cache()
+    players = players or default_index()
+    reads = SharedReads(cache)
+    manifest = {"jobs": {}} if refresh else _load_manifest(dir)
+    lock = threading.Lock()
+
+    def finished(name, year):
+        entry = manifest["jobs"].get(name, {"status": "done"}) # events written before the manifest existed count as done
+        if entry.get("status") == "done":
+            return os.path.exists(f"{dir}/{name}") and (entry.get("ids", False) or has_ids(f"{dir}/{name}"))
+        return entry.get("status") == "empty" and year < dt.datetime.now().year
+
+    def record(name, **entry):
+        with lock:
+            manifest["jobs"][name] = {**entry, "finished": dt.datetime.now().isoformat(timespec="seconds")}
+            _save_manifest(dir, manifest)
+
+    def job(event, name):
+        def run():
+            start = time.perf_counter()
+            try:
+                written = event.write(f"{dir}/{name}")
+            except Exception as e:
+                record(name, status="failed", error=repr(e))
+                raise
+            record(name, status="done" if written else "empty", ids=True, seconds=round(time.perf_counter() - start, 2))
+            return written
+        return run
+
+    tasks = {}
+    for tour in tours:
+        for slam in slams:
+            for year in years:
+                name = event_file(tour, slam, year)
+                if finished(name, year):
+                    continue
+
+                event = EventData(tour, slam, year, cache=reads, players=players)
+                deps = []
+                for url, kwargs in event.sources().values():
+                    tasks.setdefault(url, (lambda url=url, kwargs=kwargs: reads.prefetch(url, **kwargs), []))
+                    deps.append(url)
+                tasks[name] = (job(event, name), deps)
+
+    events = [i for i in tasks if i.endswith(".parquet")]
+    os.makedirs(dir, exist_ok=True)
+    with stage("backfill.run", events=len(events), sources=len(tasks) - len(events), workers=workers) as s:
+        results = run_graph(tasks, workers)
+        cache.close() # access times of the run's cache hits
+        s.set(rows_out=sum(results[i] is True for i in events))
+
+    # Failed downloads never reach their jobs, record them so the next run retries
+    for name in events:
+        if isinstance(results[name], Exception) and manifest["jobs"].get(name, {}).get("status") != "failed":
+            record(name, status="failed", error=str(results[name]))
+
+    summary = {"done": 0, "empty": 0, "failed": 0, "skipped": len(tours) * len(slams) * len(years) - len(events)}
+    for name in events:
+        summary["failed" if isinstance(results[name], Exception) else "done" if results[name] else "empty"] += 1
+    return summary
+
+
+if __name__ == "__main__":
+    # python -m src.backfill [tours] [start_year] [end_year], e.g. python -m src.backfill atp,wta 2011 2024
+    import sys
+    tours = sys.argv[1].split(",") if len(sys.argv) > 1 else TOURS
+    start_year = int(sys.argv[2]) if len(sys.argv) > 2 else 2011
+    end_year = int(sys.argv[3]) if len(sys.argv) > 3 else 2024
+    print(backfill(tours, years=range(start_year, end_year + 1), workers=int(os.getenv("BACKFILL_WORKERS", 8))))
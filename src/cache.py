@@ -0,0 +1,194 @@
+### Source File Cache ###
+import io, os, json, time, atexit, hashlib, threading, polars as pl
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError, URLError
+from src.schemas import read_csv as read_source
+
+class HttpCache:
+    '''
+    Content addressed on-disk cache for the raw Sackmann csv's, keyed by URL.
+
+    Files are stored once per unique content hash under dir/objects, with an index mapping each URL to its hash and 
+    the ETag / Last-Modified headers used to revalidate it. Entries younger than max_age seconds are served without 
+    touching the network, older entries are revalidated with a conditional request. When the cache grows beyond 
+    max_bytes the least recently used entries are evicted. In offline mode only cached copies are served.
+    Access times of cache hits are kept in memory and written with the index every persist_every hits, on any store
+    or eviction and on close(), so concurrent hits don't queue up behind index writes.
+    '''
+    def __init__(self, dir: str = "data/cache", max_bytes: int = 2_000_000_000, max_age: int = 3600, offline: bool = False, timeout: int = 60,
+                 persist_every: int = 256):
+        self.dir = dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.offline = offline
+        self.timeout = timeout
+        self.persist_every = persist_every
+        self._unsaved = 0
+
+        self._lock = threading.RLock()
+        self._url_locks = {}
+
+        os.makedirs(f"{self.dir}/objects", exist_ok=True)
+        self.index = self._load_index()
+
+    def _load_index(self) -> dict:
+        try:
+            with open(f"{self.dir}/index.json") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_index(self):
+        tmp = f"{self.dir}/index.json.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp, f"{self.dir}/index.json")
+        self._unsaved = 0
+
+    def close(self):
+        '''Write access times not yet in the index'''
+        with self._lock:
+            if self._unsaved > 0:
+                self._save_index()
+
+    def _blob_path(self, digest: str) -> str:
+        return f"{self.dir}/objects/{digest[:2]}/{digest}"
+
+    def _url_lock(self, url: str) -> threading.Lock:
+        with self._lock:
+            return self._url_locks.setdefault(url, threading.Lock())
+
+    def _read_blob(self, url: str, entry: dict) -> bytes:
+        with open(self._blob_path(entry["sha256"]), "rb") as f:
+            data = f.read()
+
+        with self._lock:
+            entry["accessed"] = time.time()
+            self._unsaved += 1
+            if self._unsaved >= self.persist_every:
+                self._save_index()
+        return data
+
+    def _cached(self, url: str) -> dict:
+        with self._lock:
+            entry = self.index.get(url)
+        if entry is not None and os.path.exists(self._blob_path(entry["sha256"])):
+            return entry
+        return None
+
+    def _store(self, url: str, data: bytes, etag: str, last_modified: str) -> dict:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+
+        now = time.time()
+        with self._lock:
+            old = self.index.get(url)
+            self.index[url] = {
+                "sha256": digest, "size": len(data), "etag": etag, "last_modified": last_modified, 
+                "checked": now, "accessed": now,
+            }
+            if old is not None and old["sha256"] != digest:
+                self._drop_blob(old["sha256"])
+            self._evict()
+            self._save_index()
+        
+        return self.index.get(url, {"sha256": digest})
+
+    def _drop_blob(self, digest: str):
+        # Blobs are shared between URLs with identical content
+        if not any(e["sha256"] == digest for e in self.index.values()):
+            try:
+                os.remove(self._blob_path(digest))
+            except FileNotFoundError:
+                pass
+
+    def _evict(self):
+        sizes = {e["sha256"]: e["size"] for e in self.index.values()}
+        total = sum(sizes.values())
+
+        for url, entry in sorted(self.index.items(), key=lambda x: x[1]["accessed"]):
+            if total <= self.max_bytes:
+                break
+            del self.index[url]
+            if not any(e["sha256"] == entry["sha256"] for e in self.index.values()):
+                total -= entry["size"]
+                self._drop_blob(entry["sha256"])
+
+    def size(self, url: str) -> int:
+        '''Size in bytes of a cached URL (0 if not cached)'''
+        entry = self._cached(url)
+        return 0 if entry is None else entry["size"]
+
+    def digest(self, url: str) -> str:
+        '''Return the content hash of a cached URL (None if not cached)'''
+        entry = self._cached(url)
+        return None if entry is None else entry["sha256"]
+
+    def fetch(self, url: str) -> bytes:
+        '''Return the content of url, downloading or revalidating it only when required'''
+        with self._url_lock(url):
+            entry = self._cached(url)
+
+            if entry is not None and (self.offline or time.time() - entry["checked"] < self.max_age):
+                return self._read_blob(url, entry)
+            
+            if self.offline:
+                raise FileNotFoundError(f"{url} is not cached and the cache is in offline mode")
+
+            headers = {}
+            if entry is not None:
+                if entry.get("etag"):
+                    headers["If-None-Match"] = entry["etag"]
+                if entry.get("last_modified"):
+                    headers["If-Modified-Since"] = entry["last_modified"]
+
+            try:
+                with urlopen(Request(url, headers=headers), timeout=self.timeout) as response:
+                    data = response.read()
+                    self._store(url, data, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+                    return data
+
+            except HTTPError as e:
+                if e.code == 304 and entry is not None:
+                    with self._lock:
+                        entry["checked"] = time.time()
+                    return self._read_blob(url, entry)
+                raise
+
+            except URLError:
+                # Serve a stale copy rather than failing when the source can't be reached
+                if entry is not None:
+                    return self._read_blob(url, entry)
+                raise
+
+    def read_csv(self, url: str, schema: str = None, columns: tuple = None, **kwargs) -> pl.DataFrame:
+        '''pl.read_csv through the cache, or with a declared source schema (see src.schemas.read_csv)'''
+        if schema is not None:
+            return read_source(self.fetch(url), schema, columns)
+        return pl.read_csv(io.BytesIO(self.fetch(url)), columns=columns, **kwargs)
+
+
+_default_cache = None
+
+def default_cache() -> HttpCache:
+    '''
+    Shared cache used by the pipelines, configured from the environment :
+        DROPSHOT_CACHE_DIR (default data/cache), DROPSHOT_CACHE_MAX_BYTES, DROPSHOT_CACHE_MAX_AGE and DROPSHOT_OFFLINE=1
+    '''
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = HttpCache(
+            dir=os.getenv("DROPSHOT_CACHE_DIR", "data/cache"),
+            max_bytes=int(os.getenv("DROPSHOT_CACHE_MAX_BYTES", 2_000_000_000)),
+            max_age=int(os.getenv("DROPSHOT_CACHE_MAX_AGE", 3600)),
+            offline=os.getenv("DROPSHOT_OFFLINE", "0") == "1",
+        )
+        atexit.register(_default_cache.close)
+    return _default_cache
@@ -0,0 +1,188 @@
+### Elo Ratings ###
+import os, datetime as dt, numpy as np, polars as pl
+from src.matches import load_tour_results
+from src.players import name_ids, fill_ids
+from src.instrument import stage
+
+SURFACES = ["Hard", "Clay", "Grass", "Carpet"]
+RATING_COLUMNS = ["elo"] + [f"elo_{i.lower()}" for i in SURFACES]
+INITIAL = 1500.0
+MAX_ELO = 3_000 # feature scaling, ~2,600 is the record
+
+# Slam point-by-point names (see src.events) to tour results tourney_name
+SLAM_NAMES = {"ausopen": "australian open", "australianopen": "australian open", "frenchopen": "roland garros", "wimbledon": "wimbledon", "usopen": "us open"}
+
+def k_factor(matches: int) -> float:
+    '''Update size shrinking with the number of rated matches a player has (FiveThirtyEight's tennis Elo)'''
+    return 250 / (matches + 5) ** 0.4
+
+class EloRatings:
+    '''
+    Overall and per surface Elo ratings for a tour, from the results in data/matches.
+
+    State is a pair of arrays with one row per player (ratings and rated match counts, columns as RATING_COLUMNS) plus
+    a player_id -> row map, persisted in {dir}/{TOUR}/state.npz. Every rated match appends both players' post-match
+    ratings to {dir}/{TOUR}/history.parquet, which is also the checkpoint : update() only rates matches missing from it,
+    unless a new match predates the last one rated, in which case the history is replayed from the start.
+    '''
+    def __init__(self, tour: str = "ATP", dir: str = "data/elo", source: str = "data/matches"):
+        self.tour = tour.upper()
+        self.dir = f"{dir}/{self.tour}"
+        self.source = source
+        self._history = None
+        self.reset()
+
+        if os.path.exists(f"{self.dir}/state.npz"):
+            with np.load(f"{self.dir}/state.npz") as state:
+                self.ids, self.ratings, self.counts = state["ids"], state["ratings"], state["counts"]
+            self.slots = {k: n for n, k in enumerate(self.ids.tolist())}
+
+    def reset(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.ratings = np.empty((0, len(RATING_COLUMNS)), dtype=np.float64)
+        self.counts = np.empty((0, len(RATING_COLUMNS)), dtype=np.int32)
+        self.slots = {}
+
+    def _slot(self, player_id: int) -> int:
+        slot = self.slots.get(player_id)
+        if slot is None:
+            slot = self.slots[player_id] = len(self.slots)
+        return slot
+
+    def history(self) -> pl.DataFrame:
+        '''Post-match ratings of both players for every rated match (player_id, name, tourney_date, tourney_id, match_num, elo, elo_hard ...)'''
+        if self._history is None:
+            if os.path.exists(f"{self.dir}/history.parquet"):
+                self._history = pl.read_parquet(f"{self.dir}/history.parquet")
+            else:
+                self._history = pl.DataFrame(schema={
+                    "player_id": pl.Int64, "name": pl.String, "tourney_date": pl.Datetime("us"), "tourney_id": pl.String, "match_num": pl.Int64,
+                    **{i: pl.Float64 for i in RATING_COLUMNS},
+                })
+        return self._history
+
+    def rate(self, matches: pl.DataFrame) -> pl.DataFrame:
+        '''Rate matches in order, updating the state, returns the history rows for them'''
+        rows = matches.select("winner_id", "loser_id", pl.col("surface").replace_strict({k: n + 1 for n, k in enumerate(SURFACES)}, default=0)).rows()
+        for player_id in matches["winner_id"].to_list() + matches["loser_id"].to_list():
+            self._slot(player_id)
+
+        grow = len(self.slots) - len(self.ratings)
+        self.ratings = np.concatenate([self.ratings, np.full((grow, len(RATING_COLUMNS)), INITIAL)])
+        self.counts = np.concatenate([self.counts, np.zeros((grow, len(RATING_COLUMNS)), dtype=np.int32)])
+        self.ids = np.array(list(self.slots.keys()), dtype=np.int64)
+
+        # Elo is sequential, the loop works on plain lists & writes the arrays back at the end
+        ratings, counts = self.ratings.tolist(), self.counts.tolist()
+        after = np.empty((2, len(rows), len(RATING_COLUMNS)))
+        for n, (winner, loser, surface) in enumerate(rows):
+            w, l = ratings[self.slots[winner]], ratings[self.slots[loser]]
+            wn, ln = counts[self.slots[winner]], counts[self.slots[loser]]
+            for col in (0, surface) if surface > 0 else (0,):
+                expected = 1 / (1 + 10 ** ((l[col] - w[col]) / 400))
+                w[col] += k_factor(wn[col]) * (1 - expected)
+                l[col] -= k_factor(ln[col]) * (1 - expected)
+                wn[col] += 1
+                ln[col] += 1
+            after[0, n], after[1, n] = w, l
+
+        self.ratings, self.counts = np.array(ratings).reshape(-1, len(RATING_COLUMNS)), np.array(counts, dtype=np.int32).reshape(-1, len(RATING_COLUMNS))
+        keys = matches.select("tourney_date", "tourney_id", "match_num")
+        return pl.concat([
+            pl.concat([matches.select(player_id = pl.col(f"{side}_id"), name = pl.col(f"{side}_name")), keys, pl.DataFrame(after[i], schema=RATING_COLUMNS)], how="horizontal")
+            for i, side in enumerate(["winner", "loser"])
+        ]).sort("tourney_date", "tourney_id", "match_num", maintain_order=True)
+
+    def update(self) -> int:
+        '''Rate the matches added to the source since the last update and persist the state, returns the number rated'''
+        columns = ["tourney_date", "tourney_id", "round_no", "match_num", "surface", "winner_id", "winner_name", "loser_id", "loser_name", "score"]
+        with stage("elo.update", tour=self.tour) as s:
+            matches = load_tour_results(self.tour, self.source).select(columns).filter(
+                pl.col("winner_id").is_not_null() & pl.col("loser_id").is_not_null() & ~pl.col("score").fill_null("").str.contains("W/O", literal=True),
+            ).sort("tourney_date", "tourney_id", "round_no", "match_num").collect()
+
+            history = self.history()
+            new = matches.join(history.select("tourney_id", "match_num").unique(), on=["tourney_id", "match_num"], how="anti", maintain_order="left")
+            if new.height > 0 and history.height > 0 and new["tourney_date"].min() < history["tourney_date"].max():
+                self.reset()
+                history, new = history.clear(), matches # a back-dated match changes every rating after it, replay
+            s.set(rows_in=new.height, replay=new.height == matches.height)
+
+            if new.height == 0:
+                return 0
+
+            self._history = pl.concat([history, self.rate(new)])
+            os.makedirs(self.dir, exist_ok=True)
+            self._history.write_parquet(f"{self.dir}/history.parquet.tmp", compression="zstd", statistics=True)
+            np.savez(f"{self.dir}/state.npz.tmp.npz", ids=self.ids, ratings=self.ratings, counts=self.counts)
+            os.replace(f"{self.dir}/history.parquet.tmp", f"{self.dir}/history.parquet")
+            os.replace(f"{self.dir}/state.npz.tmp.npz", f"{self.dir}/state.npz")
+            s.set(rows_out=self._history.height)
+        return new.height
+
+    def current(self) -> pl.DataFrame:
+        '''Latest ratings & rated match counts for every player'''
+        names = self.history().group_by("player_id").agg(pl.col("name").last())
+        return pl.DataFrame({"player_id": self.ids}).with_columns(
+            *[pl.Series(i, self.ratings[:, n]) for n, i in enumerate(RATING_COLUMNS)],
+            matches = pl.Series(self.counts[:, 0]),
+        ).join(names, on="player_id", how="left").sort("elo", descending=True)
+
+    def as_of(self, frame: pl.DataFrame, id_col: str, date_col: str, surface_col: str = None, prefix: str = "") -> pl.DataFrame:
+        '''
+        Point-in-time join : each row gets its player's ratings from before date (matches on the same tourney date are
+        excluded, so nothing from the event itself leaks in). Adds {prefix}elo and, given a surface column, {prefix}surface_elo.
+        Players without rated matches get the initial rating.
+        '''
+        history = self.history().select("player_id", "tourney_date", *RATING_COLUMNS).sort("tourney_date")
+        joined = frame.with_row_index("_row").sort(date_col).join_asof(
+            history, left_on=date_col, right_on="tourney_date", by_left=id_col, by_right="player_id",
+            strategy="backward", allow_exact_matches=False, check_sortedness=False,
+        ).sort("_row")
+
+        ratings = [pl.col("elo").fill_null(INITIAL).alias(f"{prefix}elo")]
+        if surface_col is not None:
+            surface = pl.col(surface_col).cast(pl.String).str.to_lowercase()
+            ratings.append(
+                pl.coalesce([pl.when(surface == i.lower()).then(pl.col(f"elo_{i.lower()}")) for i in SURFACES]).fill_null(INITIAL).alias(f"{prefix}surface_elo")
+            )
+        return joined.select(*frame.columns, *ratings)
+
+    def event_features(self, files: list) -> pl.DataFrame:
+        '''
+        Ratings features for stored slam events (see src.store) : match_id, p1_elo, p2_elo, p1_surface_elo, p2_surface_elo,
+        scaled for NeuralModel. Ratings are as of the start of the slam, players are matched on id, or on name when the event has none.
+        '''
+        schema = {"match_id": pl.String, **{i: pl.Float64 for i in ["p1_elo", "p2_elo", "p1_surface_elo", "p2_surface_elo"]}}
+        if len(files) == 0:
+            return pl.DataFrame(schema=schema)
+
+        starts = load_tour_results(self.tour, self.source).group_by(pl.col("tourney_name").str.to_lowercase(), "year").agg(pl.col("tourney_date").min()).collect()
+        # Point-by-point names are full or abbreviated (L. Pouille), matched exactly then on initial + surname, best rated first
+        names = name_ids(self.current())
+
+        events = []
+        for file in files:
+            slam, year = os.path.basename(file).removesuffix(".parquet").split("-")[-2:]
+            start = starts.filter((pl.col("tourney_name") == SLAM_NAMES.get(slam, slam)) & (pl.col("year") == int(year)))["tourney_date"]
+            events.append(pl.scan_parquet(file).select(
+                pl.col("match_id", "surface", "player1", "player2").cast(pl.String), "p1_id", "p2_id",
+            ).unique("match_id").with_columns(
+                date = pl.lit(start[0] if len(start) > 0 else dt.datetime(int(year), 1, 1), dtype=pl.Datetime("us")),
+            ).collect())
+
+        events = pl.concat(events).with_columns(pl.col("p1_id", "p2_id").cast(pl.Int64))
+        for i in (1, 2):
+            # Player ids from the events pipeline (see src.players) are used as is, names only fill in rows without one
+            events = self.as_of(fill_ids(events, names, f"p{i}_id", f"player{i}"), f"p{i}_id", "date", "surface", prefix=f"p{i}_")
+
+        return events.select("match_id", *[(pl.col(i) / MAX_ELO).alias(i) for i in list(schema)[1:]]).sort("match_id")
+
+
+if __name__ == "__main__":
+    # python -m src.elo [ATP|WTA]
+    import sys
+    ratings = EloRatings(sys.argv[1] if len(sys.argv) > 1 else "ATP")
+    print(f"{ratings.update()} matches rated")
+    with pl.Config(tbl_rows=20):
+        print(ratings.current().head(20))
@@ -1,21 +1,43 @@
 import polars as pl
+from src.cache import HttpCache, default_cache
+from src.players import PlayerIndex, default_index
+from src.matches import TOUR_URLS
+from src.store import write_points
+from src.schemas import RANKINGS
+from src.instrument import stage
+
+SLAM_URL = r"https://raw.githubusercontent.com/JeffSackmann/tennis_slam_pointbypoint/master/"
 
 class EventData:
-    def __init__(self, tour:str, slam:str, year:int):
+    def __init__(self, tour:str, slam:str, year:int, cache:HttpCache = None, players:PlayerIndex = None):
         self.tour = tour
         self.slam = slam
         self.year = year
+        self.cache = cache or default_cache()
+        self.players = players or default_index()
 
         self.slam_url = "ausopen" if slam.lower() == "australian open" else slam.replace(" ", "").lower()
 
+    def sources(self) -> dict:
+        '''Source csv for each table, as (url, read_csv kwargs). Matches & points files are shared by both tours, the ranks file by a tour's slams'''
+        return {
+            "matches": (f"{SLAM_URL}{self.year}-{self.slam_url}-matches.csv", {"schema": "slam_matches"}),
+            "points": (f"{SLAM_URL}{self.year}-{self.slam_url}-points.csv", {"schema": "slam_points"}),
+            "ranks": (TOUR_URLS["ATP" if self.tour.lower() == "atp" else "WTA"] + f"{self.year}.csv", {"schema": "tour", "columns": tuple(RANKINGS)}),
+        }
+
+    def _read(self, table: str) -> pl.DataFrame:
+        url, kwargs = self.sources()[table]
+        return self.cache.read_csv(url, **kwargs)
+
     def get_matches(self) -> pl.DataFrame:
         try: 
-            data = pl.read_csv(f"https://raw.githubusercontent.com/JeffSackmann/tennis_slam_pointbypoint/master/{self.year}-{self.slam_url}-matches.csv")
+            data = self._read("matches")
         except Exception as e:
             return pl.DataFrame()
         else:
             data = data.with_columns(
-                match_num = pl.col("match_id").map_elements(lambda x: x.split("-")[2], return_dtype=pl.String),
+                match_num = pl.col("match_id").str.split("-").list.get(2, null_on_oob=True),
                 surface = pl.lit("clay") if self.slam.lower() == "french open" else pl.lit("grass") if self.slam.lower() == "wimbledon" else pl.lit("hard")
             )
 
@@ -26,37 +48,25 @@ class EventData:
 
     def get_points(self) -> pl.DataFrame:
         try:
-            data = pl.read_csv(
-            source=f"https://raw.githubusercontent.com/JeffSackmann/tennis_slam_pointbypoint/master/{self.year}-{self.slam_url}-points.csv",
-                infer_schema_length=10000,
-            )
+            data = self._read("points")
         except Exception as e:
             return pl.DataFrame()
         else:
             data = data.with_columns(
-                P1Score = pl.col("P1Score").map_elements(lambda x: 45 if str(x) == "AD" else int(x), return_dtype=pl.Int32),
-                P2Score = pl.col("P2Score").map_elements(lambda x: 45 if str(x) == "AD" else int(x), return_dtype=pl.Int32),
-                PointNumber = pl.col("PointNumber").map_elements(lambda x: 0 if str(x).startswith("0") else int(x), return_dtype=pl.Int32),
+                P1Score = pl.col("P1Score").replace("AD", "45").cast(pl.Int32, strict=False),
+                P2Score = pl.col("P2Score").replace("AD", "45").cast(pl.Int32, strict=False),
+                PointNumber = pl.when(pl.col("PointNumber").str.starts_with("0")
+                    ).then(pl.lit(0, pl.Int32)
+                    ).otherwise(pl.col("PointNumber").cast(pl.Int32, strict=False)),
             )
             return data
     
     def get_ranks(self) -> pl.DataFrame:
-        return_cols = [
-            "tourney_name", "winner_name", "winner_age", "winner_rank", 
-            "winner_rank_points", "loser_name", "loser_age", "loser_rank", 
-            "loser_rank_points", 
-        ]
-
-        if self.tour.lower() == "atp":
-            url = f"https://raw.githubusercontent.com/JeffSackmann/tennis_atp/master/atp_matches_{self.year}.csv"
-        else: 
-            url = f"https://raw.githubusercontent.com/JeffSackmann/tennis_wta/master/wta_matches_{self.year}.csv"
-
         try: 
             if self.slam.lower() == "french open": # name switches to RG in rank tables
-                data = pl.read_csv(url).select(return_cols).filter(pl.col("tourney_name").str.to_lowercase().eq("roland garros"))       
+                data = self._read("ranks").filter(pl.col("tourney_name").str.to_lowercase().eq("roland garros"))       
             else:
-                data = pl.read_csv(url).select(return_cols).filter(pl.col("tourney_name").str.to_lowercase().eq(self.slam.lower()))
+                data = self._read("ranks").filter(pl.col("tourney_name").str.to_lowercase().eq(self.slam.lower()))
         except Exception as e:
             return pl.DataFrame()
         else:
@@ -64,69 +74,68 @@ class EventData:
 
     def get_results(self) -> pl.DataFrame:
         # Get data
-        matches = self.get_matches()
-        points = self.get_points()
-        ranks = self.get_ranks()
+        with stage("events.download", event=f"{self.tour}-{self.slam_url}-{self.year}") as s:
+            matches = self.get_matches()
+            points = self.get_points()
+            ranks = self.get_ranks()
+            source_bytes = sum(self.cache.size(url) for url, _ in self.sources().values())
+            s.set(rows_out=matches.height + points.height + ranks.height, bytes_read=source_bytes)
 
         if matches.is_empty() or points.is_empty() or ranks.is_empty():
             return pl.DataFrame()
         
-        # Process rank data into single name / age / rank cols
-        w_rank = ranks.select("winner_name", "winner_age", "winner_rank", "winner_rank_points").unique().rename({
-            "winner_name": "name", 
-            "winner_age": "age", 
-            "winner_rank": "rank", 
-            "winner_rank_points": "rank_points"
-        })
-
-        l_rank = ranks.select("loser_name", "loser_age", "loser_rank", "loser_rank_points").unique().rename({
-            "loser_name": "name", 
-            "loser_age": "age", 
-            "loser_rank": "rank", 
-            "loser_rank_points": "rank_points"
-        })
-
-        ranks = pl.concat([w_rank, l_rank]).unique().with_columns(
-            join_name = pl.col("name").map_elements(
-                function=lambda x: " ".join([i[0] if n==0 else i for n, i in enumerate(str(x).split(" "))]),
-                return_dtype=pl.String
-            ),
-        )
+        with stage("events.join", event=f"{self.tour}-{self.slam_url}-{self.year}", rows_in=points.height, bytes_read=source_bytes) as s:
+            event = self._join(matches, points, ranks)
+            s.set(rows_out=event.height)
+        return event
+
+    def _join(self, matches: pl.DataFrame, points: pl.DataFrame, ranks: pl.DataFrame) -> pl.DataFrame:
+        # Process rank data into single player id / name / age / rank cols (one row per player)
+        rank_cols = ["id", "name", "age", "rank", "rank_points"]
+        ranks = pl.concat([
+            ranks.select(pl.col(f"winner_{i}").alias(i) for i in rank_cols),
+            ranks.select(pl.col(f"loser_{i}").alias(i) for i in rank_cols),
+        ]).rename({"id": "player_id"}).sort("player_id", "rank", nulls_last=True).unique("player_id", keep="first")
+
+        # Map display names to player id's
+        players = self.players.resolve(self.tour, pl.concat([matches["player1"], matches["player2"]]), ranks)
 
         # Create combined event table
         matches = matches.with_columns(
-            round = pl.col("match_id").map_elements(lambda x: int(str(x)[-3]), pl.Int32),
-            p1_join_name = pl.col("player1").map_elements(
-                function=lambda x: " ".join([i[0] if n==0 else i for n, i in enumerate(str(x).split(" "))]),
-                return_dtype=pl.String
-            ),
-            p2_join_name = pl.col("player2").map_elements(
-                function=lambda x: " ".join([i[0] if n==0 else i for n, i in enumerate(str(x).split(" "))]),
-                return_dtype=pl.String
-            ),
+            round = pl.col("match_id").str.slice(-3, 1).cast(pl.Int32),
+        ).join(
+            players.rename({"name": "player1", "player_id": "p1_id"}), on="player1", how="left", maintain_order="left",
+        ).join(
+            players.rename({"name": "player2", "player_id": "p2_id"}), on="player2", how="left", maintain_order="left",
         )
-        
-        event = matches.join(ranks, left_on="p1_join_name", right_on="join_name", suffix="_p1", how="left")
-        event = event.join(ranks, left_on="p2_join_name", right_on="join_name", suffix="_p2", how="left")
-        event = event.join(points, "match_id", how="left")
+
+        ranks = ranks.drop("name")
+        event = matches.join(ranks, left_on="p1_id", right_on="player_id", how="left", maintain_order="left")
+        event = event.join(ranks, left_on="p2_id", right_on="player_id", suffix="_p2", how="left", maintain_order="left")
+        event = event.join(points, "match_id", how="left", maintain_order="left")
 
         # Consolidate overlapping cols        
         output_cols = [
-            "match_id", "surface", "player1", "player2", "winner", "round", "age", "rank", "rank_points", "age_p2", "rank_p2", "rank_points_p2", 
+            "match_id", "surface", "player1", "player2", "p1_id", "p2_id", "winner", "round", "age", "rank", "rank_points", "age_p2", "rank_p2", "rank_points_p2", 
             "ElapsedTime", "SetNo", "P1GamesWon", "P2GamesWon", "SetWinner", "GameNo", "GameWinner", "PointNumber", "PointWinner", "PointServer", 
-            "Speed_MPH", "Speed_KMH", "Rally", "RallyCount", "ServeIndicator", "ServeNumber", "P1DistanceRun", "P2DistanceRun",
+            "serve_mph", "rally_count", "ServeIndicator", "P1DistanceRun", "P2DistanceRun",
             "P1Score", "P2Score", "P1PointsWon", "P2PointsWon", "P1Ace", "P2Ace", "P1Winner", "P2Winner", "P1DoubleFault", "P2DoubleFault", "P1UnfErr", "P2UnfErr",  
         ]
         
         return event.select([i for i in output_cols if i in event.columns])
 
-if __name__ == "__main__":
-    tournaments = ["Australian Open", "French Open", "Wimbledon", "US Open"]
-    years = list(range(2011, 2025))
+    def write(self, path: str) -> bool:
+        '''Write the event results to the point store (see src.store), returns False if there was no data for the event'''
+        results = self.get_results()
+        if results.is_empty():
+            return False
 
-    tour_map = [(i, j) for i in tournaments for j in years]
-    for event, year in tour_map:
-        res = EventData("atp", event, year).get_results()
-        
-        if not res.is_empty():
-            res.write_parquet(f"data/events/atp-{event.replace(" ", "").lower()}-{year}.parquet")
+        write_points(results, path)
+        return True
+
+if __name__ == "__main__":
+    # Both tours, all slams 2011 - 2024, see src.backfill, then player form for the new events (see src.form)
+    from src.backfill import backfill
+    from src.form import PlayerForm
+    print(backfill())
+    print(f"{PlayerForm().update()} player matches added to form")
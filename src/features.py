@@ -0,0 +1,74 @@
+### Feature Store ###
+import os, json, hashlib, threading, polars as pl
+
+# Bump when the per-match feature definitions change, so every stored event is recomputed
+FEATURE_VERSION = 1
+
+def file_hash(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+class FeatureStore:
+    '''
+    Materialised per-match features, stored as one parquet file per event file.
+
+    Stored features are keyed by the content hash of their source event file and a feature version (FEATURE_VERSION 
+    plus the hash of any static inputs, e.g. match_winners.csv). Unchanged events are served from the store, new or 
+    changed events are computed & stored on first use. File size & mtime are checked first, to skip re-hashing.
+    '''
+    def __init__(self, dir: str = "data/features", inputs: list = ["data/static/match_winners.csv"]):
+        self.dir = dir
+        self.version = "-".join([str(FEATURE_VERSION)] + [file_hash(i)[:16] for i in inputs if os.path.exists(i)])
+        self._lock = threading.Lock()
+
+        os.makedirs(self.dir, exist_ok=True)
+        try:
+            with open(f"{self.dir}/manifest.json") as f:
+                self.manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.manifest = {}
+
+    def _save_manifest(self):
+        with open(f"{self.dir}/manifest.json", "w") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+
+    def _source_key(self, path: str, entry: dict) -> str:
+        stat = os.stat(path)
+        if entry is not None and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+            return entry["sha256"]
+        return file_hash(path)
+
+    def get(self, path: str, compute) -> pl.DataFrame:
+        '''Return the features for event file path, calling compute(path) if they are not stored (or out of date)'''
+        name = os.path.basename(path).removesuffix(".parquet")
+        stored = f"{self.dir}/{name}.parquet"
+
+        with self._lock:
+            entry = self.manifest.get(name)
+        digest = self._source_key(path, entry)
+
+        if entry is not None and entry["sha256"] == digest and entry["version"] == self.version and os.path.exists(stored):
+            return pl.read_parquet(stored)
+
+        table = compute(path)
+        table.write_parquet(stored)
+
+        stat = os.stat(path)
+        with self._lock:
+            self.manifest[name] = {"sha256": digest, "version": self.version, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "rows": table.height}
+            self._save_manifest()
+        
+        return table
+
+
+_default_store = None
+
+def default_store() -> FeatureStore:
+    '''Shared store in data/features'''
+    global _default_store
+    if _default_store is None:
+        _default_store = FeatureStore()
+    return _default_store
@@ -0,0 +1,192 @@
+### Player Form ###
+import os, glob, json, datetime as dt, polars as pl
+from src.store import POINT_SCHEMA, conform
+from src.players import fill_ids, name_ids, player_key, tour_players
+from src.instrument import stage
+
+# Bump when the history definitions change, so update() rebuilds it from every event file
+FORM_VERSION = 3
+
+# Slam order within a year, events are dated by their start month
+SLAM_MONTHS = {"ausopen": 1, "australianopen": 1, "frenchopen": 5, "wimbledon": 7, "usopen": 8}
+
+# Per player, per match point counts kept in the history
+COUNTS = ["serve", "serve_won", "first", "first_won", "secnd", "secnd_won", "return", "return_won", "winners", "errors"]
+
+# Rolling form columns, with the value for players without earlier matches
+FORM = {"serve_won": 0.62, "return_won": 0.38, "first_won": 0.7, "secnd_won": 0.5, "win_err": 1.0, "matches": 0.0}
+
+def event_date(file: str) -> dt.datetime:
+    '''Start of the event in a point store file ({tour}-{tournament}-{year}.parquet)'''
+    slam, year = os.path.basename(file).removesuffix(".parquet").split("-")[-2:]
+    return dt.datetime(int(year), SLAM_MONTHS.get(slam, 1), 1)
+
+def scan_event(file: str) -> pl.LazyFrame:
+    frame = pl.scan_parquet(file)
+    return frame if frame.collect_schema() == pl.Schema(POINT_SCHEMA) else conform(frame)
+
+def match_counts(file: str, names: pl.DataFrame = None) -> pl.DataFrame:
+    '''Point counts for both players of every match in an event file, one row per player & match, names fills in missing ids (see name_ids)'''
+    columns = ["match_id", "player1", "player2", "p1_id", "p2_id", "PointServer", "PointWinner", "ServeIndicator", "P1Winner", "P2Winner", "P1UnfErr", "P2UnfErr"]
+    frame = scan_event(file)
+
+    n = lambda expr: expr.cast(pl.Int32).sum()
+    sides = []
+    for i, j in [(1, 2), (2, 1)]:
+        server, receiver, won = pl.col("PointServer") == i, pl.col("PointServer") == j, pl.col("PointWinner") == i
+        sides.append(frame.select(columns).group_by("match_id").agg(
+            player = pl.col(f"player{i}").first().cast(pl.String),
+            player_id = pl.col(f"p{i}_id").first(),
+            serve = n(server),
+            serve_won = n(server & won),
+            first = n(server & (pl.col("ServeIndicator") == 1)),
+            first_won = n(server & won & (pl.col("ServeIndicator") == 1)),
+            secnd = n(server & (pl.col("ServeIndicator") == 2)),
+            secnd_won = n(server & won & (pl.col("ServeIndicator") == 2)),
+            ret = n(receiver),
+            return_won = n(receiver & won),
+            winners = pl.col(f"P{i}Winner").cast(pl.Int32).sum(),
+            errors = pl.col(f"P{i}UnfErr").cast(pl.Int32).sum(),
+        ).rename({"ret": "return"}))
+
+    name = os.path.basename(file).removesuffix(".parquet")
+    counts = pl.concat(sides).collect().filter((pl.col("serve") > 0) & pl.col("player").is_not_null())
+    if names is not None:
+        counts = fill_ids(counts, names, "player_id", "player")
+    return counts.select(
+        pl.lit(name.split("-")[0]).alias("tour"),
+        pl.lit(name).alias("event"),
+        pl.lit(event_date(file), dtype=pl.Datetime("us")).alias("date"),
+        pl.col("match_id").cast(pl.String),
+        player_key("player_id", "player").alias("player"),
+        *COUNTS,
+    )
+
+class PlayerForm:
+    '''
+    Rolling per player serve, return and winner / error stats over their last window matches in the point store.
+
+    Per match point counts for both players are kept in {dir}/history.parquet, with a manifest of the event files they
+    came from (size & mtime) : update() only scans event files that are new or changed. The rolling windows are
+    recomputed over the whole history on load (a few thousand rows per tour & year), so back-dated events need no replay.
+    Players are keyed by tour and player id : events stored without ids have them filled from the names in the tour
+    results partitions under matches (see src.matches), otherwise they fall back to initial + surname (see player_key).
+    '''
+    def __init__(self, dir: str = "data/form", source: str = "data/events", window: int = 10, matches: str = "data/matches"):
+        self.dir = dir
+        self.source = source
+        self.window = window
+        self.matches = matches
+        self._history = None
+        self._form = None
+        self._names = {}
+
+    def names(self, tour: str) -> pl.DataFrame:
+        '''Name lookup for the tour's players (see src.players.name_ids), best ranked first'''
+        if tour not in self._names:
+            self._names[tour] = name_ids(tour_players(tour, self.matches))
+        return self._names[tour]
+
+    def _manifest(self) -> dict:
+        '''Stamps of the event files in the history, empty if it was built by another FORM_VERSION'''
+        try:
+            with open(f"{self.dir}/manifest.json") as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        return manifest.get("files", {}) if manifest.get("version") == FORM_VERSION else {}
+
+    def history(self) -> pl.DataFrame:
+        '''Point counts for every player & stored match (tour, event, date, match_id, player, serve, serve_won ...)'''
+        if self._history is None:
+            if os.path.exists(f"{self.dir}/history.parquet"):
+                self._history = pl.read_parquet(f"{self.dir}/history.parquet")
+            else:
+                self._history = pl.DataFrame(schema={
+                    "tour": pl.String, "event": pl.String, "date": pl.Datetime("us"), "match_id": pl.String, "player": pl.String,
+                    **{i: pl.Int32 for i in COUNTS},
+                })
+        return self._history
+
+    def update(self) -> int:
+        '''Add the matches of new or changed event files to the history, returns the number of player matches added'''
+        files = sorted(glob.glob(f"{self.source}/*.parquet"))
+        stamp = {os.path.basename(i): [os.stat(i).st_size, os.stat(i).st_mtime_ns] for i in files}
+        manifest = self._manifest()
+        changed = [i for i in files if manifest.get(os.path.basename(i)) != stamp[os.path.basename(i)]]
+        removed = [k for k in manifest if k not in stamp]
+
+        with stage("form.update", files=len(changed)) as s:
+            if len(changed) == 0 and len(removed) == 0:
+                return 0
+
+            events = [os.path.basename(i).removesuffix(".parquet") for i in changed + removed]
+            new = [match_counts(i, self.names(os.path.basename(i).split("-")[0])) for i in changed]
+            kept = self.history().filter(~pl.col("event").is_in(events)) if len(manifest) > 0 else self.history().clear()
+            self._history = pl.concat([kept, *new]).sort("tour", "player", "date", "match_id")
+            self._form = None
+            added = sum(i.height for i in new)
+            s.set(rows_in=added, rows_out=self._history.height)
+
+            os.makedirs(self.dir, exist_ok=True)
+            self._history.write_parquet(f"{self.dir}/history.parquet.tmp", compression="zstd", statistics=True)
+            os.replace(f"{self.dir}/history.parquet.tmp", f"{self.dir}/history.parquet")
+            with open(f"{self.dir}/manifest.json", "w") as f:
+                json.dump({"version": FORM_VERSION, "files": stamp}, f, indent=2, sort_keys=True)
+        return added
+
+    def form(self) -> pl.DataFrame:
+        '''Each player's form after every match (rolling sums over their last window matches, then rates)'''
+        if self._form is None:
+            rolling = lambda c: pl.col(c).rolling_sum(self.window, min_samples=1).over("tour", "player")
+            rate = lambda won, n: rolling(won) / rolling(n)
+            self._form = self.history().sort("tour", "player", "date", "match_id").select(
+                "tour", "player", "date",
+                serve_won = rate("serve_won", "serve"),
+                return_won = rate("return_won", "return"),
+                first_won = rate("first_won", "first"),
+                secnd_won = rate("secnd_won", "secnd"),
+                win_err = rolling("winners") / pl.max_horizontal(rolling("errors"), 1),
+                matches = (pl.int_range(pl.len()).over("tour", "player") + 1).clip(upper_bound=self.window) / self.window,
+            ).fill_nan(None)
+        return self._form
+
+    def as_of(self, frame: pl.DataFrame, tour_col: str, player_col: str, date_col: str, prefix: str = "") -> pl.DataFrame:
+        '''
+        Point-in-time join : each row gets its player's form from matches before date (the event on date itself is
+        excluded, so the match being predicted never leaks in). Adds {prefix}form_serve_won ... {prefix}form_matches,
+        players without earlier matches get the FORM defaults. player_col holds player_key values.
+        '''
+        form = self.form().rename({"tour": "_tour", "player": "_player", "date": "_date"}).sort("_date")
+        joined = frame.with_row_index("_row").sort(date_col).join_asof(
+            form, left_on=date_col, right_on="_date", by_left=[tour_col, player_col], by_right=["_tour", "_player"],
+            strategy="backward", allow_exact_matches=False, check_sortedness=False,
+        ).sort("_row")
+        return joined.select(*frame.columns, *[pl.col(k).fill_null(v).alias(f"{prefix}form_{k}") for k, v in FORM.items()])
+
+    def event_features(self, files: list) -> pl.DataFrame:
+        '''Form features for stored slam events (see src.store) : match_id, p1_form_serve_won ... p2_form_matches'''
+        columns = [f"p{i}_form_{k}" for i in (1, 2) for k in FORM]
+        if len(files) == 0:
+            return pl.DataFrame(schema={"match_id": pl.String, **{i: pl.Float64 for i in columns}})
+
+        events = []
+        for file in files:
+            tour = os.path.basename(file).split("-")[0]
+            event = scan_event(file).select(pl.col("match_id", "player1", "player2").cast(pl.String), pl.col("p1_id", "p2_id").cast(pl.Int64)).unique("match_id").collect()
+            for i in (1, 2):
+                event = fill_ids(event, self.names(tour), f"p{i}_id", f"player{i}")
+            events.append(event.with_columns(tour = pl.lit(tour), date = pl.lit(event_date(file), dtype=pl.Datetime("us"))))
+        events = pl.concat(events).with_columns(player_key("p1_id", "player1").alias("p1_key"), player_key("p2_id", "player2").alias("p2_key"))
+
+        for i in (1, 2):
+            events = self.as_of(events, "tour", f"p{i}_key", "date", prefix=f"p{i}_")
+        return events.select("match_id", *columns).sort("match_id")
+
+
+if __name__ == "__main__":
+    # python -m src.form
+    import time
+    form = PlayerForm()
+    start = time.perf_counter()
+    print(f"{form.update()} player matches added, {form.form().height} rows in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,94 @@
+### NumPy Inference ###
+import io, os, json, zipfile, threading, numpy as np
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0, out=x),
+    "sigmoid": lambda x: 1 / (1 + np.exp(-x)),
+    "tanh": np.tanh,
+}
+
+class DenseModel:
+    '''
+    Pure NumPy forward pass for a Sequential stack of Dense layers (e.g. dropshot's 256-128-64-32-16-1 network).
+
+    predict() matches keras' Model.predict output shape, (n, 1) for the win probability, and runs in batches.
+    '''
+    def __init__(self, weights: list, biases: list, activations: list):
+        self.weights = [np.asarray(i, dtype=np.float32) for i in weights]
+        self.biases = [np.asarray(i, dtype=np.float32) for i in biases]
+        self.activations = activations
+
+    @classmethod
+    def load(cls, path: str) -> "DenseModel":
+        '''Load exported weights (.npz) or read them directly from a saved keras model (.keras)'''
+        if path.endswith(".keras"):
+            return cls(*read_keras(path))
+
+        with np.load(path) as f:
+            activations = [str(i) for i in f["activations"]]
+            return cls(
+                weights=[f[f"kernel_{n}"] for n in range(len(activations))], 
+                biases=[f[f"bias_{n}"] for n in range(len(activations))], 
+                activations=activations,
+            )
+
+    def save(self, path: str) -> str:
+        '''Write the weights as a compressed NumPy archive'''
+        arrays = {f"kernel_{n}": w for n, w in enumerate(self.weights)} | {f"bias_{n}": b for n, b in enumerate(self.biases)}
+        np.savez_compressed(path, activations=np.array(self.activations), **arrays)
+        return path
+
+    def predict(self, x, batch_size: int = 8192) -> np.ndarray:
+        x = np.asarray(x, dtype=np.float32)
+        out = np.empty((x.shape[0], self.weights[-1].shape[1]), dtype=np.float32)
+
+        for start in range(0, x.shape[0], batch_size):
+            layer = x[start:start + batch_size]
+            for w, b, activation in zip(self.weights, self.biases, self.activations):
+                layer = ACTIVATIONS[activation](layer @ w + b)
+            out[start:start + batch_size] = layer
+        
+        return out
+
+def read_keras(path: str) -> tuple:
+    '''Dense layer kernels, biases & activations from a .keras archive (config.json + model.weights.h5), without importing keras'''
+    try:
+        import h5py
+    except ImportError as e:
+        raise ImportError(f"reading {path} needs h5py (pip install h5py), or load the exported .npz instead") from e
+
+    with zipfile.ZipFile(path) as archive:
+        config = json.loads(archive.read("config.json"))
+        weights = h5py.File(io.BytesIO(archive.read("model.weights.h5")), "r")
+    
+    layers = [i["config"] for i in config["config"]["layers"] if i["class_name"] == "Dense"]
+    kernels = [weights[f"layers/{i['name']}/vars/0"][()] for i in layers]
+    biases = [weights[f"layers/{i['name']}/vars/1"][()] for i in layers]
+    weights.close()
+
+    return kernels, biases, [i["activation"] for i in layers]
+
+def export(path: str = "models/dropshot.keras", out: str = "models/dropshot.npz") -> str:
+    '''Export a saved keras model to a NumPy weight file for TensorFlow free inference'''
+    return DenseModel.load(path).save(out)
+
+
+_models = {}
+_lock = threading.Lock()
+
+def load_model(path: str) -> DenseModel:
+    '''Load a model once, reloading only if the file on disk has changed'''
+    key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+    with _lock:
+        if key not in _models:
+            for old in [i for i in _models if i[0] == key[0]]:
+                del _models[old]
+            _models[key] = DenseModel.load(path)
+        return _models[key]
+
+
+if __name__ == "__main__":
+    # python -m src.inference [models/dropshot.keras] [models/dropshot.npz]
+    import sys
+    print(export(*sys.argv[1:3]))
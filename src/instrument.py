@@ -0,0 +1,136 @@
+### Pipeline Instrumentation ###
+# Records wall time, rows in / out, bytes read and memory (RSS change over the stage, process peak RSS) for named
+# pipeline stages as NDJSON.
+# Enable with DROPSHOT_PROFILE=path/to/run.ndjson (and DROPSHOT_PROFILE_PLANS=1 to capture Polars query plans), or enable().
+#   python -m src.instrument show run.ndjson
+#   python -m src.instrument diff before.ndjson after.ndjson
+import os, sys, json, time, uuid, resource, threading, datetime as dt
+
+_config = {"path": os.getenv("DROPSHOT_PROFILE") or None, "plans": os.getenv("DROPSHOT_PROFILE_PLANS", "0") == "1"}
+_run = f"{dt.datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+_lock = threading.Lock()
+
+def enable(path: str, plans: bool = False):
+    _config["path"], _config["plans"] = path, plans
+
+def disable():
+    _config["path"] = None
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError):
+        return None
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+class _NullStage:
+    '''Returned when instrumentation is off, every call is a no-op'''
+    def __enter__(self):
+        return self
+    def __exit__(self, *args):
+        return False
+    def set(self, **fields):
+        return self
+    def plan(self, frame):
+        return self
+
+_NULL = _NullStage()
+
+class Stage:
+    def __init__(self, name: str, fields: dict):
+        self.record = {"run": _run, "stage": name} | fields
+
+    def __enter__(self):
+        self.record["rss_start_mb"] = _rss_mb()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.record["seconds"] = round(time.perf_counter() - self._start, 6)
+        self.record["rss_end_mb"] = _rss_mb()
+        if self.record["rss_start_mb"] is not None and self.record["rss_end_mb"] is not None:
+            self.record["rss_delta_mb"] = round(self.record["rss_end_mb"] - self.record["rss_start_mb"], 1)
+        self.record["process_peak_rss_mb"] = _peak_rss_mb() # high-water mark of the whole process so far, not of the stage
+        self.record["time"] = dt.datetime.now().isoformat(timespec="milliseconds")
+        if exc_type is not None:
+            self.record["error"] = exc_type.__name__
+
+        line = json.dumps(self.record, default=str)
+        with _lock:
+            with open(_config["path"], "a") as f:
+                f.write(line + "\n")
+        return False
+
+    def set(self, **fields):
+        '''Add fields to the record (rows_in, rows_out, bytes_read, ...)'''
+        self.record.update(fields)
+        return self
+
+    def plan(self, frame):
+        '''Capture the optimised query plan of a LazyFrame (if plan capture is on)'''
+        if _config["plans"]:
+            self.record["plan"] = frame.explain()
+        return self
+
+def stage(name: str, **fields):
+    '''
+    Context manager timing a named stage, e.g.
+
+        with stage("matches.transform", rows_in=df.height) as s:
+            df = transform(df)
+            s.set(rows_out=df.height)
+    '''
+    if _config["path"] is None:
+        return _NULL
+    return Stage(name, fields)
+
+def load(path: str) -> list:
+    with open(path) as f:
+        return [json.loads(i) for i in f if i.strip()]
+
+def summarise(records: list) -> dict:
+    '''Totals per stage : calls, seconds, rows & bytes summed, the largest RSS change and process peak RSS as maxima'''
+    out = {}
+    for r in records:
+        s = out.setdefault(r["stage"], {"calls": 0, "seconds": 0.0, "rows_in": 0, "rows_out": 0, "bytes_read": 0, "rss_delta_mb": 0.0, "process_peak_rss_mb": 0.0})
+        s["calls"] += 1
+        s["seconds"] += r.get("seconds") or 0
+        for k in ["rows_in", "rows_out", "bytes_read"]:
+            s[k] += r.get(k) or 0
+        s["rss_delta_mb"] = max(s["rss_delta_mb"], r.get("rss_delta_mb") or 0)
+        s["process_peak_rss_mb"] = max(s["process_peak_rss_mb"], r.get("process_peak_rss_mb", r.get("peak_rss_mb")) or 0) # older profiles
+    return out
+
+def show(path: str) -> str:
+    summary = summarise(load(path))
+    lines = [f"{'stage':<28}{'calls':>7}{'seconds':>11}{'rows in':>13}{'rows out':>13}{'MB read':>10}{'RSS +MB':>10}{'proc peak MB':>14}"]
+    for name, s in summary.items():
+        lines.append(f"{name:<28}{s['calls']:>7}{s['seconds']:>11.3f}{s['rows_in']:>13,}{s['rows_out']:>13,}{s['bytes_read'] / 2**20:>10.1f}{s['rss_delta_mb']:>10.1f}{s['process_peak_rss_mb']:>14.1f}")
+    return "\n".join(lines)
+
+def diff(before: str, after: str) -> str:
+    a, b = summarise(load(before)), summarise(load(after))
+    lines = [f"{'stage':<28}{'before s':>11}{'after s':>11}{'change':>9}{'rows before':>14}{'rows after':>14}{'RSS +MB before':>16}{'RSS +MB after':>15}"]
+    for name in list(a) + [i for i in b if i not in a]:
+        x, y = a.get(name), b.get(name)
+        change = f"{100 * (y['seconds'] - x['seconds']) / x['seconds']:+.0f}%" if x and y and x["seconds"] > 0 else "-"
+        cell = lambda s, k, fmt: format(s[k], fmt) if s else "-"
+        lines.append(
+            f"{name:<28}{cell(x, 'seconds', '.3f'):>11}{cell(y, 'seconds', '.3f'):>11}{change:>9}"
+            f"{cell(x, 'rows_out', ','):>14}{cell(y, 'rows_out', ','):>14}{cell(x, 'rss_delta_mb', '.1f'):>16}{cell(y, 'rss_delta_mb', '.1f'):>15}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "show":
+        print(show(sys.argv[2]))
+    elif len(sys.argv) == 4 and sys.argv[1] == "diff":
+        print(diff(sys.argv[2], sys.argv[3]))
+    else:
+        print("usage : python -m src.instrument show run.ndjson | diff before.ndjson after.ndjson")
+        sys.exit(2)
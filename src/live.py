@@ -0,0 +1,260 @@
+### Live Match Scoring ###
+import os, json, time, socket, numpy as np, polars as pl
+from src.inference import load_model
+from src.model import NeuralModel
+from src.instrument import stage
+
+# Accumulator columns, one row per match slot
+P1_FIRST, P1_FIRST_WON, P1_SECND, P1_SECND_WON, P2_FIRST, P2_FIRST_WON, P2_SECND, P2_SECND_WON, \
+    P1_WINNERS, P1_ERRORS, P2_WINNERS, P2_ERRORS, POINTS = range(13)
+
+def _int(value) -> int:
+    '''Point feed values arrive as ints, floats or strings depending on the year, blanks count as 0'''
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+class LiveScorer:
+    '''
+    In-play win probabilities from a stream of point rows (get_points schema).
+
+    Each match has a slot in fixed width NumPy arrays: static features (year, surface, age, rank points) set when the
+    match is registered and running counts of serve points played / won and winners / unforced errors. update() touches
+    one slot per point, so its cost doesn't grow with the match or the number of matches in play. score() rebuilds the
+    NeuralModel feature rows for every match with new points and scores them in a single model call.
+
+    Until a player has served a first (second) serve point their serve-win rate is the prior,
+    once the match is over the features are exactly those of NeuralModel.features.
+    '''
+    priors = {"first_won": 0.7, "secnd_won": 0.5}
+
+    def __init__(self, model = "models/dropshot.npz", capacity: int = 256):
+        self.model = load_model(model) if isinstance(model, str) else model
+        self.slots = {}
+        self.match_ids = []
+        self.static = np.full((capacity, 6), np.nan, dtype=np.float32)
+        self.counts = np.zeros((capacity, 13), dtype=np.int64)
+        self.dirty = np.zeros(capacity, dtype=bool)
+        self.p1_win = np.full(capacity, np.nan, dtype=np.float32)
+
+    def _grow(self):
+        self.static = np.concatenate([self.static, np.full_like(self.static, np.nan)])
+        self.counts = np.concatenate([self.counts, np.zeros_like(self.counts)])
+        self.dirty = np.concatenate([self.dirty, np.zeros_like(self.dirty)])
+        self.p1_win = np.concatenate([self.p1_win, np.full_like(self.p1_win, np.nan)])
+
+    def add_match(self, match_id: str, surface: str, age: float, age_p2: float, rank_points: float, rank_points_p2: float) -> int:
+        '''Register a match (column names as in the events table), the year comes from the match_id prefix'''
+        match_id = str(match_id)
+        if match_id in self.slots:
+            return self.slots[match_id]
+        if len(self.match_ids) == len(self.dirty):
+            self._grow()
+
+        slot = len(self.match_ids)
+        nan = lambda x: np.nan if x is None else x
+        self.static[slot] = [
+            int(match_id.split("-")[0]) - NeuralModel.first_year,
+            NeuralModel.surface_map[str(surface)],
+            nan(age) / NeuralModel.max_age,
+            nan(age_p2) / NeuralModel.max_age,
+            nan(rank_points) / NeuralModel.max_points,
+            nan(rank_points_p2) / NeuralModel.max_points,
+        ]
+        self.slots[match_id] = slot
+        self.match_ids.append(match_id)
+        return slot
+
+    def add_matches(self, matches: pl.DataFrame):
+        '''Register every match in a frame of the events table (one or more rows per match)'''
+        columns = ["match_id", "surface", "age", "age_p2", "rank_points", "rank_points_p2"]
+        matches = matches.select(columns).with_columns(pl.col("match_id", "surface").cast(pl.String)).unique("match_id", keep="first", maintain_order=True)
+        for row in matches.iter_rows(named=True):
+            self.add_match(**row)
+
+    def update(self, point: dict) -> int:
+        '''Add one point to its match's counts, rows that carry the events table columns register their match on first sight'''
+        match_id = str(point["match_id"])
+        slot = self.slots.get(match_id)
+        if slot is None:
+            if "surface" not in point:
+                raise KeyError(f"unregistered match_id : {match_id}")
+            slot = self.add_match(match_id, point["surface"], point.get("age"), point.get("age_p2"), point.get("rank_points"), point.get("rank_points_p2"))
+
+        counts = self.counts[slot]
+        server = _int(point.get("PointServer"))
+        serve = _int(point.get("ServeIndicator", point.get("ServeNumber")))
+        if server in (1, 2) and serve in (1, 2):
+            col = 4 * (server - 1) + 2 * (serve - 1)
+            counts[col] += 1
+            counts[col + 1] += _int(point.get("PointWinner")) == server
+
+        counts[P1_WINNERS] += _int(point.get("P1Winner"))
+        counts[P1_ERRORS] += _int(point.get("P1UnfErr"))
+        counts[P2_WINNERS] += _int(point.get("P2Winner"))
+        counts[P2_ERRORS] += _int(point.get("P2UnfErr"))
+        counts[POINTS] += 1
+        self.dirty[slot] = True
+        return slot
+
+    def features(self, slots: np.ndarray) -> np.ndarray:
+        '''NeuralModel feature rows for the given slots, from the running counts'''
+        counts = self.counts[slots].astype(np.float32)
+        rate = lambda won, n, prior: np.where(counts[:, n] > 0, counts[:, won] / np.maximum(counts[:, n], 1), prior)
+        ratio = lambda winners, errors: counts[:, winners] / np.maximum(counts[:, errors], 1)
+
+        return np.column_stack([
+            self.static[slots],
+            rate(P1_FIRST_WON, P1_FIRST, self.priors["first_won"]),
+            rate(P1_SECND_WON, P1_SECND, self.priors["secnd_won"]),
+            rate(P2_FIRST_WON, P2_FIRST, self.priors["first_won"]),
+            rate(P2_SECND_WON, P2_SECND, self.priors["secnd_won"]),
+            ratio(P1_WINNERS, P1_ERRORS),
+            ratio(P2_WINNERS, P2_ERRORS),
+        ]).astype(np.float32)
+
+    def score(self) -> dict:
+        '''Re-score every match with new points in one batched model call, returns {match_id: P1_win}'''
+        slots = np.flatnonzero(self.dirty[:len(self.match_ids)])
+        if len(slots) == 0:
+            return {}
+
+        self.p1_win[slots] = self.model.predict(self.features(slots))[:, 0]
+        self.dirty[slots] = False
+        return {self.match_ids[i]: float(self.p1_win[i]) for i in slots}
+
+    def table(self) -> pl.DataFrame:
+        '''Latest probability and points played for every match'''
+        n = len(self.match_ids)
+        return pl.DataFrame({
+            "match_id": self.match_ids,
+            "points": self.counts[:n, POINTS],
+            "P1_win": self.p1_win[:n],
+        }).with_columns(P2_win = 1 - pl.col("P1_win"))
+
+    def run(self, points, every: int = 1, on_score = None):
+        '''
+        Consume an iterable of point rows, scoring after every `every` points (and at the end of the stream).
+        Concurrent matches are batched together, every = 1 re-scores after each point.
+        '''
+        n = 0
+        for point in points:
+            self.update(point)
+            n += 1
+            if n % every == 0:
+                scores = self.score()
+                if on_score is not None:
+                    on_score(scores)
+
+        scores = self.score()
+        if on_score is not None and len(scores) > 0:
+            on_score(scores)
+
+# Point sources
+def tail(path: str, follow: bool = True, poll: float = 0.1, stop = None):
+    '''Point rows from an NDJSON file, following appends like tail -f until stop (a threading.Event) is set'''
+    with open(path) as f:
+        buffer = ""
+        while True:
+            line = f.readline()
+            if line == "":
+                if not follow or (stop is not None and stop.is_set()):
+                    return
+                time.sleep(poll)
+                continue
+
+            buffer += line
+            if not buffer.endswith("\n"):
+                continue # partial write, wait for the rest of the line
+            if buffer.strip():
+                yield json.loads(buffer)
+            buffer = ""
+
+def listen(host: str, port: int, timeout: float = None):
+    '''Point rows from an NDJSON feed on a TCP socket, until the feed closes the connection'''
+    with socket.create_connection((host, port), timeout=timeout) as conn, conn.makefile("r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+# Replay harness
+def slam_points(file: str) -> pl.DataFrame:
+    '''
+    Points of a stored slam (see src.store) in simulated live order :
+    every match in the draw is in play at once, one point from each in turn
+    '''
+    return pl.read_parquet(file).with_columns(
+        pl.col("match_id", "surface").cast(pl.String),
+        seq = pl.int_range(pl.len()).over("match_id"),
+    ).sort("seq", "match_id", maintain_order=True).drop("seq")
+
+def replay(file: str, model = "models/dropshot.npz", every: int = 1) -> dict:
+    '''
+    Replay a stored slam through a LiveScorer, timing each point from arrival to re-scored probability.
+    Returns the scorer and latency percentiles (microseconds).
+    '''
+    points = slam_points(file)
+    scorer = LiveScorer(model)
+    scorer.add_matches(points)
+    rows = points.select("match_id", "PointWinner", "PointServer", "ServeIndicator", "P1Winner", "P2Winner", "P1UnfErr", "P2UnfErr").to_dicts()
+
+    update_ns = np.empty(len(rows), dtype=np.int64)
+    latency_ns = np.empty(len(rows), dtype=np.int64)
+    score_ns = []
+    pending = []
+
+    with stage("live.replay", file=file, rows_in=len(rows), every=every) as s:
+        start = time.perf_counter_ns()
+        for n, row in enumerate(rows):
+            arrived = time.perf_counter_ns()
+            scorer.update(row)
+            update_ns[n] = time.perf_counter_ns() - arrived
+            pending.append((n, arrived))
+
+            if (n + 1) % every == 0 or n + 1 == len(rows):
+                t = time.perf_counter_ns()
+                scorer.score()
+                done = time.perf_counter_ns()
+                score_ns.append(done - t)
+                for i, arrived in pending:
+                    latency_ns[i] = done - arrived
+                pending = []
+        elapsed = (time.perf_counter_ns() - start) / 1e9
+        s.set(rows_out=len(scorer.match_ids))
+
+    pct = lambda x, q: round(float(np.percentile(x, q)) / 1e3, 2)
+    return {
+        "scorer": scorer,
+        "points": len(rows),
+        "matches": len(scorer.match_ids),
+        "points_per_s": round(len(rows) / elapsed),
+        "update_p50_us": pct(update_ns, 50), "update_p99_us": pct(update_ns, 99),
+        "score_p50_us": pct(score_ns, 50), "score_p99_us": pct(score_ns, 99),
+        "latency_p50_us": pct(latency_ns, 50), "latency_p99_us": pct(latency_ns, 99),
+    }
+
+
+if __name__ == "__main__":
+    # python -m src.live replay data/events/atp-usopen-2024.parquet [every]
+    # python -m src.live tail points.ndjson matches.parquet       (matches : events table rows for the matches in play)
+    # python -m src.live listen host:port matches.parquet
+    import sys
+    model = os.getenv("MODEL_PATH", "models/dropshot.npz")
+    command, source = sys.argv[1:3]
+
+    if command == "replay":
+        for every in [int(sys.argv[3])] if len(sys.argv) > 3 else [1, 16, 128]:
+            result = replay(source, model, every)
+            result.pop("scorer")
+            print(json.dumps({"every": every, **result}))
+    else:
+        scorer = LiveScorer(model)
+        scorer.add_matches(pl.read_parquet(sys.argv[3]))
+        if command == "tail":
+            points = tail(source)
+        else:
+            host, port = source.rsplit(":", 1)
+            points = listen(host, int(port))
+
+        scorer.run(points, on_score=lambda scores: [print(json.dumps({"match_id": k, "P1_win": round(v, 4)}), flush=True) for k, v in scores.items()])
@@ -1,7 +1,71 @@
 ### Tour Match Data Pipeline ###
-import datetime as dt, polars as pl
+import os, glob, json, datetime as dt, polars as pl
+from functools import partial
+from urllib.error import HTTPError
+from concurrent.futures import ThreadPoolExecutor
+from src.cache import HttpCache, default_cache
+from src.instrument import stage
+
+# Bump when the transform changes, so incremental runs rebuild every partition
+PIPELINE_VERSION = 2
+
+TOUR_URLS = {
+    "ATP": r"https://raw.githubusercontent.com/JeffSackmann/tennis_atp/master/atp_matches_",
+    "WTA": r"https://raw.githubusercontent.com/JeffSackmann/tennis_wta/master/wta_matches_",
+}
+
+def tour_files(start_year: int, end_year: int, tour: str = "ATP", url_base: str = None) -> list:
+    """Create a list of annual tour csv locations, from start_year up to (not including) end_year."""
+    if url_base is None:
+        if tour.upper() not in TOUR_URLS:
+            raise ValueError("Select a tour : 'ATP' or 'WTA'")
+        url_base = TOUR_URLS[tour.upper()]
+
+    return [url_base + "{}.csv".format(i) for i in range(start_year, end_year)]
+
+def _read_tour_file(file: str, cache: HttpCache) -> pl.DataFrame:
+    """Read an annual tour csv, None if the year isn't published (HTTP 404, or not cached in offline mode)"""
+    try:
+        df_iter = cache.read_csv(file, schema="tour")
+
+    except HTTPError as e:
+        if e.code != 404:
+            raise
+        return None
+
+    except FileNotFoundError:
+        return None
+
+    else:
+        return parse_tourney_date(df_iter)
+
+def parse_tourney_date(df_tour: pl.DataFrame) -> pl.DataFrame:
+    """Parse the tourney_date column (20240115 or 2024-01-15) into a datetime"""
+    return df_tour.with_columns(
+        tourney_date= pl.col("tourney_date").cast(pl.String).str.replace_all("-", "", literal=True).str.strptime(pl.Datetime("us"), "%Y%m%d")
+    )
+
+def fetch_tour_files(files: list, max_workers: int = 8, cache: HttpCache = None) -> pl.DataFrame:
+    """
+    Download the annual tour csv's concurrently (at most max_workers at a time) and combine them once at the end.
+
+    Files are read through the shared source cache (see src.cache), so repeat runs only revalidate them.
+    Missing years (e.g. a future year which has not been published yet) are skipped, other fetch & parse errors are raised.
+    """
+    cache = cache or default_cache()
+    with stage("matches.fetch", files=len(files)) as s:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            frames = [df for df in pool.map(partial(_read_tour_file, cache=cache), files) if df is not None]
+
+        if len(frames) == 0:
+            return pl.DataFrame()
+
+        df_tour = pl.concat(frames, how="vertical") # one declared schema, see src.schemas
+        s.set(rows_out=df_tour.height, bytes_read=sum(cache.size(i) for i in files))
     
-def get_tour_results(start_year = 1968, end_year = dt.datetime.now().year + 1, tour: str = "ATP"):
+    return df_tour
+
+def get_tour_results(start_year = 1968, end_year = dt.datetime.now().year + 1, tour: str = "ATP", max_workers: int = 8, url_base: str = None, cache: HttpCache = None):
     """
     This pipeline will extract tour match data from Jeff Sackmann"s Github repo of annual tour csv"s 
     and consolodate it into a common database.
@@ -9,40 +73,19 @@ def get_tour_results(start_year = 1968, end_year = dt.datetime.now().year + 1, t
     There is data available from 1968 up to the present day by default.
 
     Users can specify the start_year and end_year kw-args in the run_pipeline() function call. 
+    The annual files are downloaded in parallel, max_workers sets the concurrency limit and 
+    url_base can point the pipeline at an alternative (e.g. local) copy of the files.
     """
-    # Create a list of file locations
-    tour_files = []
-
-    for i in range(start_year, end_year):
-        if tour.upper() == "ATP":
-            url_base = r"https://raw.githubusercontent.com/JeffSackmann/tennis_atp/master/atp_matches_"
-        elif tour.upper() == "WTA":
-            url_base = r"https://raw.githubusercontent.com/JeffSackmann/tennis_wta/master/wta_matches_"
-        else:
-            raise ValueError("Select a tour : 'ATP' or 'WTA'")
-        
-        url_end = "{}.csv".format(i)
-        tour_files.append(url_base + url_end)
-    
-    # Extract files using list
-    df_tour = pl.DataFrame()
-    for n, file in enumerate(tour_files):
-        try:
-            df_iter = pl.read_csv(file)
-        
-        except Exception:
-            pass
-        
-        else:
-            df_iter = df_iter.with_columns(
-                tourney_date= pl.col("tourney_date").map_elements(lambda x: dt.datetime.strptime(str(x).replace("-", ""), "%Y%m%d"), pl.Datetime)
-            )
-            
-            if n == 0:
-                df_tour = df_iter
-            else:
-                df_tour = pl.concat([df_tour, df_iter], how="vertical_relaxed")
-    
+    # Extract files
+    df_tour = fetch_tour_files(tour_files(start_year, end_year, tour, url_base), max_workers=max_workers, cache=cache)
+
+    with stage("matches.transform", rows_in=df_tour.height) as s:
+        df_tour = transform_tour_results(df_tour)
+        s.set(rows_out=df_tour.height)
+    return df_tour
+
+def transform_tour_results(df_tour: pl.DataFrame) -> pl.DataFrame:
+    """Map the raw tour csv columns to the consolidated matches table (row-wise, so years can be processed independently)"""
     # Set up mapping groups
     map_tourney_level = {"A": 1, "M": 2, "F": 3, "G": 4}
     map_round = {"R128": 1, "R64": 2, "R32": 3, "R16": 4, "QF": 5, "SF": 6, "F": 7, "RR":5}
@@ -51,15 +94,20 @@ def get_tour_results(start_year = 1968, end_year = dt.datetime.now().year + 1, t
         "ATP Next Gen Finals": 0,"Us Open": 2000, "Cagliari": 250, "Marbella": 250}
     
     events_url = "data/static/events.csv"
-    events_map = pl.read_csv(events_url)
-    events_map = {e : p for e in events_map.select("event").to_series().to_list() for p in events_map.select("points").to_series().to_list()}
-    events_map.update(null_map)
+    events_map = pl.concat([
+        pl.read_csv(events_url, schema={"event": pl.String, "points": pl.Int64}),
+        pl.DataFrame({"event": list(null_map.keys()), "points": list(null_map.values())}),
+    ]).unique("event", keep="last").rename({"event": "tourney_name", "points": "tour_points"})
 
     # Map objects to integers
     df_tour = df_tour.with_columns(
         tourney_level=pl.col("tourney_level").cast(pl.String).replace_strict(map_tourney_level, default=0),
         round_no=pl.col("round").cast(pl.String).replace_strict(map_round, default=0),
-        tour_points=pl.col("tourney_name").map_elements(lambda x: 0 if str(x) not in events_map.keys() else events_map[str(x)], pl.Int64)
+        tourney_name=pl.col("tourney_name").cast(pl.String),
+    ).join(
+        events_map, on="tourney_name", how="left", maintain_order="left"
+    ).with_columns(
+        tour_points=pl.col("tour_points").fill_null(0)
     )
     
     # Map ranking points gained from match
@@ -76,42 +124,115 @@ def get_tour_results(start_year = 1968, end_year = dt.datetime.now().year + 1, t
         1000: {7:240, 6:180, 5:90, 4:45, 3: 35, 2:10, 1: 0},
         500: {7:120, 6:90, 5:45, 4:25, 3: 20, 2:0, 1:0},
         250: {7:60, 6:45, 5:25, 4:15, 3: 5, 2:0, 1:0}}
-    
 
-    df_tour = df_tour.with_columns(
-        points_winner=pl.struct("tour_points", "round_no"
-        ).map_elements(
-            lambda x: round_points_win[x["tour_points"]][x["round_no"]] if x["tour_points"] > 0 and x["round_no"] > 0 else 0, 
-            pl.Int64
-        ),
-        points_loser=pl.struct("tour_points", "round_no"
-        ).map_elements(
-            lambda x: round_points_lose[x["tour_points"]][x["round_no"]] if x["tour_points"] > 0 and x["round_no"] > 0 else 0, 
-            pl.Int64
-        ),
+    round_points = pl.DataFrame(
+        data=[(t, r, p, round_points_lose[t].get(r, 0)) for t in round_points_win for r, p in round_points_win[t].items()],
+        schema={"tour_points": pl.Int64, "round_no": pl.Int64, "points_winner": pl.Int64, "points_loser": pl.Int64},
+        orient="row",
+    )
+
+    sets_played = pl.col("score").str.count_matches(" ", literal=True).cast(pl.Int64) + 1
+
+    df_tour = df_tour.join(
+        round_points, on=["tour_points", "round_no"], how="left", maintain_order="left"
+    ).with_columns(
+        points_winner=pl.col("points_winner").fill_null(0),
+        points_loser=pl.col("points_loser").fill_null(0),
         sets_played=pl.when(
             (pl.col("score").str.ends_with("RET")) |
             (pl.col("score").str.ends_with("W/O")) |
             (pl.col("score").str.to_lowercase().str.ends_with("walkover"))
-        ).then(pl.col("score").map_elements(lambda x : len(str(x).split(" ")), pl.Int64) - 1
-        ).otherwise(
-            pl.when(pl.col("score").is_null()
-            ).then(pl.lit(0)
-            ).otherwise(pl.col("score").map_elements(lambda x : len(str(x).split(" ")), pl.Int64))
-        ),
+        ).then(sets_played - 1
+        ).otherwise(sets_played.fill_null(0)),
     )
 
     # Remove unrequired / unuseful columns and return data frame with a reset index
     drop_cols = ["winner_entry", "winner_seed", "loser_entry", "loser_seed"]
-    return df_tour.drop(drop_cols)
+    return df_tour.drop(drop_cols, strict=False)
+
+def _tour_year(file: str, cache: HttpCache) -> pl.DataFrame:
+    df_iter = _read_tour_file(file, cache)
+    return None if df_iter is None else transform_tour_results(df_iter)
+
+def update_tour_partitions(tour: str = "ATP", start_year: int = 1968, end_year: int = dt.datetime.now().year + 1, dir: str = "data/matches", 
+                           max_workers: int = 8, url_base: str = None, cache: HttpCache = None) -> list:
+    """
+    Incremental version of get_tour_results.
+
+    Output is stored as hive style partitions, one per source year ({dir}/{TOUR}/year={year}/data.parquet), alongside 
+    a manifest of the source file hashes. Only years whose source csv has changed since the last run (or whose partition 
+    is missing) are re-fetched, recomputed and rewritten. A change to PIPELINE_VERSION forces a full rebuild.
+
+    Returns the list of years which were rewritten.
+    """
+    cache = cache or default_cache()
+    out = f"{dir}/{tour.upper()}"
+    manifest = _load_manifest(out)
+    if manifest.get("version") != PIPELINE_VERSION:
+        manifest = {"version": PIPELINE_VERSION, "sources": {}}
+
+    files = dict(zip(range(start_year, end_year), tour_files(start_year, end_year, tour, url_base)))
+
+    # Revalidate sources (cheap when unchanged) and compare their hashes against the manifest
+    def source_hash(file):
+        try:
+            cache.fetch(file)
+        except Exception:
+            return None
+        return cache.digest(file)
+
+    with stage("matches.revalidate", files=len(files)) as s, ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        hashes = dict(zip(files.keys(), pool.map(source_hash, files.values())))
+        s.set(bytes_read=sum(cache.size(i) for i in files.values()))
+
+    changed = [
+        year for year, digest in hashes.items() 
+        if digest is not None and (manifest["sources"].get(str(year)) != digest or not os.path.exists(f"{out}/year={year}/data.parquet"))
+    ]
+
+    # Recompute changed partitions
+    with stage("matches.update", years=changed) as s:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            frames = dict(zip(changed, pool.map(partial(_tour_year, cache=cache), [files[i] for i in changed])))
+
+        for year, df_year in frames.items():
+            if df_year is None:
+                continue
+            os.makedirs(f"{out}/year={year}", exist_ok=True)
+            df_year.write_parquet(f"{out}/year={year}/data.parquet")
+            manifest["sources"][str(year)] = hashes[year]
+        s.set(rows_out=sum(i.height for i in frames.values() if i is not None))
+
+    _save_manifest(out, manifest)
+    return [year for year, df_year in frames.items() if df_year is not None]
+
+def load_tour_results(tour: str = "ATP", dir: str = "data/matches") -> pl.LazyFrame:
+    """Scan the partitioned tour results written by update_tour_partitions (adds the partition year column)"""
+    files = sorted(glob.glob(f"{dir}/{tour.upper()}/year=*/data.parquet"))
+    return pl.concat(
+        items=[pl.scan_parquet(i).with_columns(year=pl.lit(int(i.split("year=")[1].split("/")[0]))) for i in files], 
+        how="diagonal_relaxed",
+    )
+
+def _load_manifest(dir: str) -> dict:
+    try:
+        with open(f"{dir}/manifest.json") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def _save_manifest(dir: str, manifest: dict):
+    os.makedirs(dir, exist_ok=True)
+    with open(f"{dir}/manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
 
 
 if __name__ == "__main__":
-    import os
     tour_key = os.getenv("TOUR_KEY")
     
-    table_name=f"{tour_key}_matches"
-    table_data=get_tour_results(start_year=2011, tour=tour_key)
-    table_data.write_parquet(f"data/matches/{table_name}.parquet")
+    updated = update_tour_partitions(tour=tour_key, start_year=2011, max_workers=int(os.getenv("MATCHES_WORKERS", 8)))
+    print(f"{tour_key} partitions updated : {updated}")
 
-    print(table_data)
+    # Rate the new matches from the persisted checkpoint (see src.elo)
+    from src.elo import EloRatings
+    print(f"{tour_key} matches rated : {EloRatings(tour_key).update()}")
@@ -1,101 +1,92 @@
 # Models
 import os, datetime as dt, polars as pl
-from sklearn.model_selection import train_test_split
-from sklearn import metrics
+from src.store import POINT_SCHEMA, conform
+from src.features import FeatureStore, default_store
+from src.inference import DenseModel, load_model
+from src.instrument import stage
 
-import keras
-from keras import Sequential
-from keras.src.layers import Dense
-from keras.src.callbacks import EarlyStopping
+def _keras():
+    '''Import keras (and TensorFlow) on demand, only training needs them'''
+    import keras
+    from tensorflow.python.keras.engine import data_adapter
 
-from tensorflow.python.keras.engine import data_adapter
+    def _is_distributed_dataset(ds):
+        return isinstance(ds, data_adapter.input_lib.DistributedDatasetSpec)
 
-def _is_distributed_dataset(ds):
-    return isinstance(ds, data_adapter.input_lib.DistributedDatasetSpec)
-
-data_adapter._is_distributed_dataset = _is_distributed_dataset
+    data_adapter._is_distributed_dataset = _is_distributed_dataset
+    return keras
 
 # Build model
 class NeuralModel:
     '''Methods for loading data, building a neural model, and running predictions against a saved model'''
+    # Columns the feature aggregation needs (read in the point store's compact types, see src.store)
+    feature_columns = [
+        'match_id', 'surface', 'winner', 'age', 'rank_points', 'age_p2', 'rank_points_p2', 
+        'PointWinner', 'PointServer', 'ServeIndicator', 'P1Winner', 'P2Winner', 'P1UnfErr', 'P2UnfErr',
+    ]
+    # Feature scaling (shared with the live scorer, see src.live)
+    first_year = 2011
+    max_age = 50 # no player ever reaches
+    max_points = 18_000 # 16,950 is record
+    surface_map = {
+        "clay": -1,
+        "hard": 0,
+        "grass": 1,
+    }
+
     @staticmethod
-    def create_feature_table(dir:str) -> pl.DataFrame:
-        # Consolidate event tables
-        files = [pl.read_parquet(f"{dir}/{i}") for i in os.listdir(dir) if i.endswith(".parquet")]
-        table =  pl.concat(files, how="diagonal_relaxed")
-        table = table.with_columns(
-            serve_mph = pl.when(pl.col("Speed_MPH").is_not_null()).then(pl.col("Speed_MPH")).otherwise((pl.col("Speed_KMH").cast(pl.Int64) / 1.60934).cast(pl.Int64)),
-            rally_count = pl.when(pl.col("Rally").is_not_null()).then(pl.col("Rally")).otherwise(pl.col("RallyCount")),
-        ).drop(["Speed_MPH", "Speed_KMH", "Rally", "RallyCount"])
-
-        # Standardise types
-        feature_schema = {
-            'match_id' : pl.String,
-            'surface' : pl.String,
-            'player1' : pl.String,
-            'player2' : pl.String,
-            'winner' : pl.Int32,
-            'round' : pl.Int32,
-            'age' : pl.Float64,
-            'rank' : pl.Int64,
-            'rank_points' : pl.Int64,
-            'age_p2' : pl.Float64,
-            'rank_p2' : pl.Int64,
-            'rank_points_p2' : pl.Int64,
-            'ElapsedTime' : pl.String,
-            'SetNo' : pl.Int64,
-            'P1GamesWon' : pl.Int32,
-            'P2GamesWon' : pl.Int32,
-            'SetWinner' : pl.Int32,
-            'GameNo' : pl.Int32,
-            'GameWinner' : pl.Int32,
-            'PointNumber' : pl.Int32,
-            'PointWinner' : pl.Int32,
-            'PointServer' : pl.Int32,
-            'ServeIndicator' : pl.Int32,
-            'P1Score' : pl.Int32,
-            'P2Score' : pl.Int32,
-            'P1PointsWon' : pl.Int64,
-            'P2PointsWon' : pl.Int64,
-            'P1Ace' : pl.Int32,
-            'P2Ace' : pl.Int32,
-            'P1Winner' : pl.Int32,
-            'P2Winner' : pl.Int32,
-            'P1DoubleFault' : pl.Int32,
-            'P2DoubleFault' : pl.Int32,
-            'P1UnfErr' : pl.Int32,
-            'P2UnfErr' : pl.Int32,
-            'ServeNumber' : pl.Int32,
-            'P1DistanceRun' : pl.Float64,
-            'P2DistanceRun' : pl.Float64,
-            'serve_mph' : pl.Int64,
-            'rally_count' : pl.Int32,
-        }
-        table = table.cast(feature_schema)
+    def event_files(dir:str, start_year: int = None, end_year: int = None, tournament_list: list = None) -> list:
+        '''Event files in dir, named {tour}-{tournament}-{year}.parquet, optionally limited to a year range and list of tournaments'''
+        files = []
+        for i in sorted(os.listdir(dir)):
+            if not i.endswith(".parquet"):
+                continue
+
+            tournament, year = i.removesuffix(".parquet").split("-")[-2:]
+            if start_year is not None and int(year) < start_year:
+                continue
+            if end_year is not None and int(year) > end_year:
+                continue
+            if tournament_list is not None and tournament not in tournament_list:
+                continue
+            files.append(f"{dir}/{i}")
         
-        # Create features
+        return files
+
+    @staticmethod
+    def scan_events(files: list) -> pl.LazyFrame:
+        '''Lazily scan event files from the point store, projecting only the feature columns (legacy layouts are conformed)'''
+        frames = []
+        for file in files:
+            frame = pl.scan_parquet(file)
+            if frame.collect_schema() != pl.Schema(POINT_SCHEMA):
+                frame = conform(frame)
+            frames.append(frame.select(NeuralModel.feature_columns))
+
+        if len(frames) == 0:
+            return pl.LazyFrame(schema={k: POINT_SCHEMA[k] for k in NeuralModel.feature_columns})
+        return pl.concat(frames, how="vertical")
+
+    @staticmethod
+    def features(table: pl.LazyFrame) -> pl.LazyFrame:
+        '''Aggregate point level event data to one row of features per match'''
         match_winners = {i["match_id"] : i["winner"] for i in pl.read_csv("data/static/match_winners.csv").select("match_id", "winner").to_dicts()}
         match_winners = {k: (2 if v == 0 else v) for k,v in match_winners.items()} # has 1 for p1 win & 0 for p2 win
-        max_age = 50 # no player ever reaches
-        max_points = 18_000 # 16,950 is record
-        surface_map = {
-            "clay": -1,
-            "hard": 0,
-            "grass": 1,
-        }
+        max_age, max_points = NeuralModel.max_age, NeuralModel.max_points
 
         table = table.with_columns(
-            year = pl.col("match_id").map_elements(lambda x: int(str(x).split("-")[0]), pl.Int64),
-            surface = pl.col("surface").replace_strict(surface_map),
-            ServeIndicator = pl.when(pl.col("ServeIndicator").is_null()).then(pl.col("ServeNumber")).otherwise(pl.col("ServeIndicator")),
+            match_id = pl.col("match_id").cast(pl.String),
+        ).with_columns(
+            year = pl.col("match_id").str.split("-").list.first().cast(pl.Int64),
+            surface = pl.col("surface").replace_strict(NeuralModel.surface_map, return_dtype=pl.Int32),
             winner = pl.when(pl.col("winner").is_null()
-                ).then(pl.col("match_id").str.replace("MS", "1").str.replace("WS", "2").replace_strict(match_winners, default=pl.col("winner"))
+                ).then(pl.col("match_id").str.replace("MS", "1").str.replace("WS", "2").replace_strict(match_winners, default=pl.col("winner"), return_dtype=pl.Int32)
                 ).otherwise(pl.col("winner")),
         )
 
         table = table.group_by("match_id").agg(
             winner = pl.col("winner").mean().cast(pl.Int32),
-            year = pl.col("year").mean().cast(pl.Int64) - 2011,
+            year = pl.col("year").mean().cast(pl.Int64) - NeuralModel.first_year,
             surface = pl.col("surface").mean().cast(pl.Int32),
 
             p1_age = pl.col("age").mean() / max_age,
@@ -124,48 +115,126 @@ class NeuralModel:
             p2_win_err = pl.col("P2Winner").sum() / pl.when(pl.col("P2UnfErr").sum() == 0).then(pl.lit(1)).otherwise(pl.col("P2UnfErr").sum()),
         )
     
-        filter_cols = [i for i in table.columns if i not in ["match_id", "winner"]]
+        filter_cols = [i for i in table.collect_schema().names() if i not in ["match_id", "winner"]]
         table = table.drop_nulls(filter_cols).drop_nans(filter_cols)
         
         return table.sort("match_id", descending=False)
+
+    @staticmethod
+    def stored_features(files: list, store: FeatureStore = None, streaming: bool = False) -> pl.DataFrame:
+        '''
+        Per-match features for a list of event files. Unchanged events are served from the feature store (see src.features), 
+        new or changed events are aggregated with a lazy scan (on the streaming engine if streaming = True) and stored.
+        '''
+        store = store or default_store()
+        engine = "streaming" if streaming else "auto"
+
+        def compute(file):
+            with stage("model.aggregate", file=file, bytes_read=os.path.getsize(file)) as s:
+                query = NeuralModel.features(NeuralModel.scan_events([file]))
+                s.plan(query)
+                table = query.collect(engine=engine)
+                s.set(rows_out=table.height)
+            return table
+
+        with stage("model.features", files=len(files)) as s:
+            tables = [store.get(file, compute) for file in files]
+            if len(tables) == 0:
+                return NeuralModel.features(NeuralModel.scan_events([])).collect()
+            
+            table = pl.concat(tables, how="vertical").sort("match_id", descending=False)
+            s.set(rows_out=table.height)
+        return table
+
+    @staticmethod
+    def create_feature_table(dir:str, store: FeatureStore = None, streaming: bool = False) -> pl.DataFrame:
+        return NeuralModel.stored_features(NeuralModel.event_files(dir), store, streaming)
     
     @staticmethod
-    def load_data(dir:str, start_year: int = 2011, end_year: int = 2025, tournament_list: list = ['ausopen', 'frenchopen', 'wimbledon', 'usopen']) -> pl.DataFrame:
-        return NeuralModel.create_feature_table(dir).filter(
-            (pl.col("year") >= (start_year - 2011)) & 
-            (pl.col("year") <= (end_year - 2011)) &
+    def load_data(dir:str, start_year: int = 2011, end_year: int = 2025, tournament_list: list = ['ausopen', 'frenchopen', 'wimbledon', 'usopen'], 
+                  streaming: bool = False, store: FeatureStore = None, ratings = None, form = None) -> pl.DataFrame:
+        '''
+        Feature table for a slice of the event archive, only files for the requested years & tournaments are read.
+        Passing an EloRatings (see src.elo) appends each player's overall & surface rating from before the event,
+        passing a PlayerForm (see src.form) their rolling serve, return & winner / error stats from earlier events.
+        '''
+        files = NeuralModel.event_files(dir, start_year, end_year, tournament_list)
+        table = NeuralModel.stored_features(files, store, streaming).filter(
+            (pl.col("year").is_between(start_year - 2011, end_year - 2011)) &
             (pl.col("match_id").str.contains_any(tournament_list))
         )
+        if ratings is not None:
+            table = table.join(ratings.event_features(files), on="match_id", how="left", maintain_order="left")
+        if form is not None:
+            table = table.join(form.event_features(files), on="match_id", how="left", maintain_order="left")
+        return table
+
+    # Network & training settings used by build (override any of them with build's config argument)
+    default_config = {
+        "units": [256, 128, 64, 32, 16],
+        "activation": "relu",
+        "optimizer": "adagrad",
+        "batch_size": 32,
+        "epochs": 128,
+        "patience": 32,
+    }
+
+    @staticmethod
+    def training_arrays(data: pl.DataFrame) -> tuple:
+        '''Feature matrix & target (1 for a player 1 win, 0 for player 2) from a feature table'''
+        data = data.drop_nulls()
+        target = data.select(pl.when(pl.col("winner") == 2).then(0).otherwise(pl.col("winner"))).to_series().to_numpy()
+        features = data.drop(["match_id", "winner"]).to_numpy()
+        return features, target
+
+    @staticmethod
+    def fit(x_train, y_train, config: dict = None, verbose: int = 1):
+        '''Build, compile & fit the sequential network described by config (see default_config)'''
+        _keras()
+        from keras import Sequential
+        from keras.src.layers import Dense
+        from keras.src.callbacks import EarlyStopping
+
+        config = NeuralModel.default_config | (config or {})
+
+        # Model build
+        model = Sequential()
+
+        for n, units in enumerate(config["units"]):
+            if n == 0:
+                model.add(Dense(units = units, activation = config["activation"], input_shape = (x_train.shape[1],)))
+            else:
+                model.add(Dense(units = units, activation = config["activation"]))
+        model.add(Dense(units = 1,  activation = 'sigmoid'))
+
+        # Complie model and with early stopping function
+        es = EarlyStopping(monitor = 'loss', mode = 'min', verbose = 0, patience = config["patience"])
+
+        model.compile(optimizer = config["optimizer"], loss = 'binary_crossentropy', metrics = ['accuracy'])
+        model.fit(x_train, y_train, batch_size = config["batch_size"], epochs = config["epochs"], verbose = verbose, callbacks = es)
+        
+        return model
 
     @staticmethod
-    def build(data: pl.DataFrame, save_model: bool = False) -> dict:
+    def build(data: pl.DataFrame, save_model: bool = False, config: dict = None) -> dict:
         ''' Function will build a sequential neural network, given a dataset (add details)...
             
             It returns a dictionary containing the timestamp, accuracy score, training dataset with model predictions, and the model itself.
             If the user specifies save_model = True then the model will be saved in a saved_model folder as SlamModel_{timestamp}
+            The network & training settings can be changed with config (see default_config & src.search).
         '''
+        from sklearn.model_selection import train_test_split
+        from sklearn import metrics
+
         timestamp = dt.datetime.strftime(dt.datetime.today(), '%Y-%m-%d')
-        target = data.drop_nulls().select("winner").to_series().map_elements(lambda x: 0 if x == 2 else x).to_numpy()
-        features = data.drop_nulls().drop(["match_id", "winner"]).to_numpy()
+        features, target = NeuralModel.training_arrays(data)
 
         # Split data
         x_train, x_test, y_train, y_test = train_test_split(features, target, test_size=0.1, random_state=0)
 
         # Model build
-        model = Sequential()
-
-        model.add(Dense(units = 256, activation = 'relu', input_shape = (features.shape[1],)))
-        model.add(Dense(units = 128, activation = 'relu'))
-        model.add(Dense(units = 64, activation = 'relu'))
-        model.add(Dense(units = 32, activation = 'relu'))
-        model.add(Dense(units = 16, activation = 'relu'))
-        model.add(Dense(units = 1,  activation = 'sigmoid'))
-
-        # Complie model and with early stopping function
-        es = EarlyStopping(monitor = 'loss', mode = 'min', verbose = 0, patience = 32)
-
-        model.compile(optimizer = 'adagrad', loss = 'binary_crossentropy', metrics = ['accuracy'])
-        model.fit(x_train, y_train, batch_size = 32, epochs = 128, verbose = 1, callbacks = es)
+        with stage("model.fit", rows_in=len(x_train)):
+            model = NeuralModel.fit(x_train, y_train, config)
 
         # Apply model to test data and measure accuracy
         y_pred = model.predict(x_test) > 0.5
@@ -177,9 +246,10 @@ class NeuralModel:
         data = pl.concat([data, pl.DataFrame({"P1_win": data_pred})], how="horizontal")
         data = data.with_columns(P2_win = 1 - pl.col('P1_win'))
         
-        # Save
+        # Save (plus NumPy weights for TensorFlow free predictions)
         if save_model == True:
            model.save(f'models/dropshot.keras')
+           DenseModel.load('models/dropshot.keras').save('models/dropshot.npz')
         
         return {
             'timestamp': timestamp,
@@ -191,10 +261,16 @@ class NeuralModel:
     
     @staticmethod
     def pred(model, data:pl.DataFrame) -> pl.DataFrame:
-        if isinstance(model, str):
-            model = keras.models.load_model(model)
-        
-        data_pred = [i[0] for i in model.predict(data.drop(["match_id", "winner"]).to_numpy())]
+        '''
+        Append P1_win / P2_win probabilities to a feature table. The model can be a trained keras model or a path 
+        to a saved model (.keras or exported .npz weights), which is scored with the NumPy forward pass (see src.inference) 
+        and cached between calls.
+        '''
+        with stage("model.pred", rows_in=data.height):
+            if isinstance(model, str):
+                model = load_model(model)
+            
+            data_pred = [i[0] for i in model.predict(data.drop(["match_id", "winner"]).to_numpy())]
         return pl.concat(
             items=[data, pl.DataFrame({"P1_win": data_pred})], 
             how="horizontal"
@@ -219,7 +295,7 @@ if __name__ == '__main__':
 
     # Run a model
     predictions = NeuralModel.pred(
-        model="models/dropshot.keras", 
+        model="models/dropshot.npz", 
         data = NeuralModel.load_data(
             dir="data/events", 
             start_year=2022, 
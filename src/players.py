@@ -0,0 +1,101 @@
+### Player Identity Index ###
+import os, glob, threading, polars as pl
+from src.matches import load_tour_results
+
+def join_name(col: str) -> pl.Expr:
+    '''First initial + surname key used to match point-by-point names to tour names (Roger Federer -> R Federer)'''
+    return pl.col(col).str.replace(r"^(\S)\S*", "${1}")
+
+def name_ids(players: pl.DataFrame) -> pl.DataFrame:
+    '''
+    Name lookup (name, name_id) from player_id / name rows in order of preference : point-by-point names are full or
+    abbreviated (L. Pouille), so exact names come first, then initial + surname keys, each going to its first player
+    '''
+    players = players.select("player_id", "name").drop_nulls()
+    return pl.concat([
+        players.select("name", "player_id", priority = pl.lit(0)),
+        players.select(join_name("name"), "player_id", priority = pl.lit(1)),
+    ]).unique("name", keep="first", maintain_order=True).rename({"player_id": "name_id"}).drop("priority")
+
+def tour_players(tour: str, dir: str = "data/matches") -> pl.DataFrame:
+    '''Players in the tour results partitions (see src.matches), best ranked first : player_id, name'''
+    if len(glob.glob(f"{dir}/{tour.upper()}/year=*/data.parquet")) == 0:
+        return pl.DataFrame(schema={"player_id": pl.Int64, "name": pl.String})
+
+    results = load_tour_results(tour, dir)
+    return pl.concat([
+        results.select(pl.col(f"{i}_id").alias("player_id"), pl.col(f"{i}_name").alias("name"), pl.col(f"{i}_rank").alias("rank")) for i in ("winner", "loser")
+    ]).group_by("player_id", "name").agg(pl.col("rank").min()).sort("rank", "player_id", nulls_last=True).select("player_id", "name").collect()
+
+def fill_ids(frame: pl.DataFrame, names: pl.DataFrame, id_col: str, name_col: str) -> pl.DataFrame:
+    '''Fill the missing ids in id_col by looking up name_col in names (see name_ids), exact name then initial + surname'''
+    exact = frame.join(names, left_on=name_col, right_on="name", how="left", maintain_order="left")["name_id"]
+    key = frame.select(join_name(name_col)).join(names, left_on=name_col, right_on="name", how="left", maintain_order="left")["name_id"]
+    return frame.with_columns(pl.coalesce(pl.col(id_col).cast(pl.Int64), exact, key).alias(id_col))
+
+def player_key(id_col: str, name_col: str) -> pl.Expr:
+    '''
+    Player id (ids missing from older stored events are filled from the tour results names, see fill_ids),
+    otherwise initial + surname for names no tour player matches, as AO & FO names are abbreviated (L. Pouille)
+    '''
+    return pl.when(pl.col(id_col).is_not_null()).then(pl.format("#{}", pl.col(id_col))).otherwise(join_name(name_col))
+
+class PlayerIndex:
+    '''
+    Persistent map of point-by-point display names to Jeff Sackmann player ID's, for each tour.
+
+    Names are resolved once, against the players in the event's rank table, and then reused for every later event.
+    Exact name matches are preferred, otherwise players sharing the same initial + surname key are resolved 
+    deterministically to the best ranked (then lowest ID) candidate, so each name maps to exactly one player.
+
+    The index file is a build artifact of the events backfill (see src.backfill), which the scheduled pipeline runs
+    and commits, so checkouts reuse it rather than resolving every name again.
+    '''
+    schema = {"tour": pl.String, "name": pl.String, "player_id": pl.Int64}
+
+    def __init__(self, path: str = "data/static/players.csv"):
+        self.path = path
+        self._lock = threading.Lock()
+        self.table = pl.read_csv(path, schema=self.schema) if os.path.exists(path) else pl.DataFrame(schema=self.schema)
+
+    def save(self):
+        self.table.sort("tour", "name").write_csv(self.path)
+
+    def resolve(self, tour: str, names: pl.Series, candidates: pl.DataFrame) -> pl.DataFrame:
+        '''
+        Return a name / player_id table for the given display names. Unknown names are resolved against 
+        candidates (player_id, name & rank columns) and added to the index. Names without a match get a null ID.
+        '''
+        tour = tour.upper()
+        names = pl.DataFrame({"name": names.cast(pl.String)}).drop_nulls().unique()
+
+        with self._lock:
+            known = self.table.filter(pl.col("tour") == tour).select("name", "player_id")
+            new = names.join(known, on="name", how="anti")
+
+            if not new.is_empty():
+                candidates = candidates.select("player_id", pl.col("name").alias("candidate"), "rank").unique("player_id")
+
+                resolved = new.with_columns(key=join_name("name")).join(
+                    candidates.with_columns(key=join_name("candidate")), on="key", how="inner",
+                ).sort(
+                    by=[pl.col("name"), pl.col("candidate") != pl.col("name"), pl.col("rank"), pl.col("player_id")], 
+                    nulls_last=True,
+                ).unique("name", keep="first").select(pl.lit(tour).alias("tour"), "name", "player_id")
+
+                if not resolved.is_empty():
+                    self.table = pl.concat([self.table, resolved])
+                    self.save()
+                    known = pl.concat([known, resolved.drop("tour")])
+
+        return names.join(known, on="name", how="left")
+
+
+_default_index = None
+
+def default_index() -> PlayerIndex:
+    '''Shared index stored in data/static/players.csv'''
+    global _default_index
+    if _default_index is None:
+        _default_index = PlayerIndex()
+    return _default_index
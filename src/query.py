@@ -0,0 +1,136 @@
+### Match Queries ###
+import os, glob, json, threading, polars as pl
+from src.matches import load_tour_results
+from src.instrument import stage
+
+class MatchIndex:
+    '''
+    Indexed copies of the tour results (see matches.update_tour_partitions) for small queries, stored under {dir}/{TOUR} :
+
+        by_player.parquet       every match twice, once from each player's side (player_id, opponent_id, won + the match
+                                columns), sorted by player and date so a player's matches are one contiguous row range
+        by_event.parquet        one row per match, sorted by year, tournament and match number
+        players.parquet         player_id, name, start, stop : row range of each player in by_player
+        events.parquet          tourney_id, tourney_name, year, start, stop : row range of each tournament in by_event
+
+    Lookups read the small sidecar indexes (kept in memory) and then only the row groups holding the requested rows,
+    so they don't load the tables. The indexes are rebuilt when the source partitions change.
+    '''
+    row_group_size = 2048
+
+    def __init__(self, tour: str = "ATP", dir: str = "data/query", source: str = "data/matches"):
+        self.tour = tour.upper()
+        self.dir = f"{dir}/{self.tour}"
+        self.source = source
+        self._lock = threading.Lock()
+        self._stamp = None
+        self.players = None
+        self.events = None
+
+    def _source_stamp(self) -> dict:
+        files = sorted(glob.glob(f"{self.source}/{self.tour}/year=*/data.parquet"))
+        return {i: [os.stat(i).st_size, os.stat(i).st_mtime_ns] for i in files}
+
+    def build(self) -> "MatchIndex":
+        '''(Re)write the sorted tables and sidecar indexes from the source partitions'''
+        stamp = self._source_stamp()
+        with stage("query.build", tour=self.tour, files=len(stamp)) as s:
+            matches = load_tour_results(self.tour, self.source).sort("year", "tourney_id", "match_num").collect()
+            sides = lambda player, opponent, won: matches.with_columns(
+                player_id = pl.col(f"{player}_id"), player_name = pl.col(f"{player}_name"),
+                opponent_id = pl.col(f"{opponent}_id"), opponent_name = pl.col(f"{opponent}_name"),
+                won = pl.lit(won),
+            )
+            by_player = pl.concat([sides("winner", "loser", True), sides("loser", "winner", False)]).sort(
+                "player_id", "tourney_date", "match_num", maintain_order=True,
+            ).select("player_id", "player_name", "opponent_id", "opponent_name", "won", pl.exclude("player_id", "player_name", "opponent_id", "opponent_name", "won"))
+
+            players = by_player.with_row_index("row").group_by("player_id", maintain_order=True).agg(
+                name = pl.col("player_name").last(),
+                start = pl.col("row").first(),
+                stop = pl.col("row").last() + 1,
+            )
+            events = matches.with_row_index("row").group_by("tourney_id", maintain_order=True).agg(
+                tourney_name = pl.col("tourney_name").first(),
+                year = pl.col("year").first(),
+                start = pl.col("row").first(),
+                stop = pl.col("row").last() + 1,
+            )
+
+            os.makedirs(self.dir, exist_ok=True)
+            for name, table in [("by_player", by_player), ("by_event", matches), ("players", players), ("events", events)]:
+                table.write_parquet(f"{self.dir}/{name}.parquet.tmp", statistics=True, row_group_size=self.row_group_size)
+                os.replace(f"{self.dir}/{name}.parquet.tmp", f"{self.dir}/{name}.parquet")
+            with open(f"{self.dir}/manifest.json", "w") as f:
+                json.dump({"sources": stamp}, f, indent=2)
+            s.set(rows_out=by_player.height)
+
+        self._stamp = None
+        return self
+
+    def _load(self):
+        '''Load the sidecar indexes, building the tables first if they are missing or out of date with the source'''
+        with self._lock:
+            stamp = self._source_stamp()
+            if stamp == self._stamp:
+                return
+            try:
+                with open(f"{self.dir}/manifest.json") as f:
+                    fresh = json.load(f)["sources"] == stamp
+            except (FileNotFoundError, json.JSONDecodeError, KeyError):
+                fresh = False
+            if not fresh:
+                self.build()
+
+            self.players = pl.read_parquet(f"{self.dir}/players.parquet")
+            self.events = pl.read_parquet(f"{self.dir}/events.parquet")
+            self._ranges = {k: (a, b) for k, a, b in self.players.select("player_id", "start", "stop").iter_rows()}
+            self._stamp = stamp
+
+    def _rows(self, table: str, *ranges: tuple) -> pl.DataFrame:
+        scan = pl.scan_parquet(f"{self.dir}/{table}.parquet")
+        return pl.concat([scan.slice(start, stop - start) for start, stop in ranges or [(0, 0)]]).collect()
+
+    def find_player(self, name: str) -> pl.DataFrame:
+        '''Players whose name contains name (case insensitive)'''
+        self._load()
+        return self.players.filter(pl.col("name").str.to_lowercase().str.contains(name.lower(), literal=True)).select("player_id", "name")
+
+    def player(self, player_id: int, start_year: int = None, end_year: int = None) -> pl.DataFrame:
+        '''A player's matches in date order, from their side (opponent_id, won ...), optionally limited to a year range'''
+        self._load()
+        if player_id not in self._ranges:
+            return self._rows("by_player")
+
+        history = self._rows("by_player", self._ranges[player_id])
+        if start_year is not None:
+            history = history.filter(pl.col("year") >= start_year)
+        if end_year is not None:
+            history = history.filter(pl.col("year") <= end_year)
+        return history
+
+    def head_to_head(self, player_id: int, opponent_id: int) -> pl.DataFrame:
+        '''Every match between two players, from the first player's side'''
+        return self.player(player_id).filter(pl.col("opponent_id") == opponent_id)
+
+    def tournament(self, name: str, year: int = None) -> pl.DataFrame:
+        '''Results of a tournament (tourney_name, case insensitive), in one year or all years'''
+        self._load()
+        events = self.events.filter(pl.col("tourney_name").str.to_lowercase() == name.lower())
+        if year is not None:
+            events = events.filter(pl.col("year") == year)
+
+        return self._rows("by_event", *events.select("start", "stop").iter_rows())
+
+
+if __name__ == "__main__":
+    # python -m src.query ATP "Novak Djokovic" ["Rafael Nadal"]
+    import sys, time
+    index = MatchIndex(sys.argv[1] if len(sys.argv) > 1 else "ATP").build()
+
+    start = time.perf_counter()
+    players = [index.find_player(i)["player_id"][0] for i in sys.argv[2:4] or [""]]
+    table = index.head_to_head(*players) if len(players) > 1 else index.player(players[0])
+    print(f"{table.height} matches in {1000 * (time.perf_counter() - start):.1f}ms")
+    with pl.Config(tbl_cols=8):
+        print(table.select("tourney_date", "tourney_name", "round", "player_name", "opponent_name", "won", "score"))
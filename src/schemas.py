@@ -0,0 +1,123 @@
+### Source Schemas ###
+import io, polars as pl
+
+# Annual tour results, Jeff Sackmann's {atp|wta}_matches_{year}.csv (entry & seed columns aren't read)
+TOUR_RESULTS = {
+    'tourney_id' : pl.String,
+    'tourney_name' : pl.String,
+    'surface' : pl.String,
+    'draw_size' : pl.Int64,
+    'tourney_level' : pl.String,
+    'tourney_date' : pl.String, # 20240115 or 2024-01-15, see matches.parse_tourney_date
+    'match_num' : pl.Int64,
+    'winner_id' : pl.Int64,
+    'winner_name' : pl.String,
+    'winner_hand' : pl.String,
+    'winner_ht' : pl.Int64,
+    'winner_ioc' : pl.String,
+    'winner_age' : pl.Float64,
+    'loser_id' : pl.Int64,
+    'loser_name' : pl.String,
+    'loser_hand' : pl.String,
+    'loser_ht' : pl.Int64,
+    'loser_ioc' : pl.String,
+    'loser_age' : pl.Float64,
+    'score' : pl.String,
+    'best_of' : pl.Int64,
+    'round' : pl.String,
+    'minutes' : pl.Int64,
+    **{f'{side}_{stat}' : pl.Int64 for side in ['w', 'l'] for stat in ['ace', 'df', 'svpt', '1stIn', '1stWon', '2ndWon', 'SvGms', 'bpSaved', 'bpFaced']},
+    'winner_rank' : pl.Int64,
+    'winner_rank_points' : pl.Int64,
+    'loser_rank' : pl.Int64,
+    'loser_rank_points' : pl.Int64,
+}
+
+# The tour results columns the events pipeline reads for player ranks (see events.EventData.get_ranks)
+RANKINGS = [
+    'tourney_name', 'winner_id', 'winner_name', 'winner_age', 'winner_rank', 'winner_rank_points',
+    'loser_id', 'loser_name', 'loser_age', 'loser_rank', 'loser_rank_points',
+]
+
+# Slam match lists, tennis_slam_pointbypoint {year}-{slam}-matches.csv
+SLAM_MATCHES = {
+    'match_id' : pl.String,
+    'player1' : pl.String,
+    'player2' : pl.String,
+    'winner' : pl.Int8,
+}
+
+# Slam points, tennis_slam_pointbypoint {year}-{slam}-points.csv, in the point store's types (see src.store)
+SLAM_POINTS = {
+    'match_id' : pl.String,
+    'ElapsedTime' : pl.String,
+    'SetNo' : pl.Int8,
+    'P1GamesWon' : pl.Int8,
+    'P2GamesWon' : pl.Int8,
+    'SetWinner' : pl.Int8,
+    'GameNo' : pl.Int16,
+    'GameWinner' : pl.Int8,
+    'PointNumber' : pl.String, # 0X / 0Y before the first point, see events.EventData.get_points
+    'PointWinner' : pl.Int8,
+    'PointServer' : pl.Int8,
+    'ServeIndicator' : pl.Int8,
+    'P1Score' : pl.String, # 0, 15, 30, 40, AD & tiebreak points
+    'P2Score' : pl.String,
+    'P1PointsWon' : pl.Int16,
+    'P2PointsWon' : pl.Int16,
+    'P1Ace' : pl.Int8,
+    'P2Ace' : pl.Int8,
+    'P1Winner' : pl.Int8,
+    'P2Winner' : pl.Int8,
+    'P1DoubleFault' : pl.Int8,
+    'P2DoubleFault' : pl.Int8,
+    'P1UnfErr' : pl.Int8,
+    'P2UnfErr' : pl.Int8,
+    'P1DistanceRun' : pl.Float32,
+    'P2DistanceRun' : pl.Float32,
+    'serve_mph' : pl.Int16,
+    'rally_count' : pl.Int16,
+}
+
+# Historical column names, {column: [(csv column, read dtype, conversion), ...]}, coalesced row by row in order of preference
+VARIANTS = {
+    'serve_mph' : [('Speed_MPH', pl.Int16, None), ('Speed_KMH', pl.Float64, lambda c: c / 1.60934)],
+    'rally_count' : [('Rally', pl.Int16, None), ('RallyCount', pl.Int16, None)],
+    'ServeIndicator' : [('ServeIndicator', pl.Int8, None), ('ServeNumber', pl.Int8, None)],
+}
+
+SCHEMAS = {
+    'tour' : TOUR_RESULTS,
+    'slam_matches' : SLAM_MATCHES,
+    'slam_points' : SLAM_POINTS,
+}
+
+def read_csv(source, schema: str, columns: tuple = None) -> pl.DataFrame:
+    '''
+    Read a source csv with its declared schema in a single pass : only the requested columns (default all declared)
+    are parsed, straight into their declared dtypes, with the historical variants present coalesced into the declared name.
+    Declared columns missing from the file come back as typed nulls, so every file gives the same frame.
+    '''
+    data = source if isinstance(source, bytes) else source.read()
+    header = data[:data.find(b"\n")].decode("utf-8-sig").strip().split(",")
+    declared = SCHEMAS[schema]
+    columns = list(columns or declared.keys())
+
+    read, exprs = {}, []
+    for name in columns:
+        dtype = declared[name]
+        found = [i for i in VARIANTS.get(name, [(name, dtype, None)]) if i[0] in header]
+        if len(found) == 0:
+            exprs.append(pl.lit(None, dtype).alias(name))
+            continue
+
+        # Files can carry several variants with the data split between them (e.g. an empty Speed_MPH next to Speed_KMH)
+        variants = []
+        for csv_name, read_dtype, convert in found:
+            read[csv_name] = read_dtype
+            variants.append((pl.col(csv_name) if convert is None else convert(pl.col(csv_name))).cast(dtype))
+        exprs.append(pl.coalesce(variants).alias(name))
+
+    if len(read) == 0:
+        return pl.DataFrame(schema={i: declared[i] for i in columns})
+    return pl.read_csv(io.BytesIO(data), columns=list(read), schema_overrides=read, infer_schema=False).select(exprs)
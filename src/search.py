@@ -0,0 +1,123 @@
+### Hyperparameter Search & Cross Validation ###
+import os, json, time, itertools, numpy as np, polars as pl
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Worker state, set by _init_worker
+_shared = {}
+
+def grid(**space) -> list:
+    '''Every combination of the given settings, e.g. grid(optimizer=["adam", "adagrad"], batch_size=[32, 64])'''
+    keys = list(space.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*space.values())]
+
+def kfold(n: int, folds: int, seed: int = 0) -> list:
+    '''Shuffled (train, test) index pairs for k-fold cross validation'''
+    splits = np.array_split(np.random.default_rng(seed).permutation(n), folds)
+    return [(np.concatenate(splits[:k] + splits[k + 1:]), splits[k]) for k in range(folds)]
+
+def keras_trial(config: dict, x_train, y_train, x_test, y_test) -> float:
+    '''Train NeuralModel's network with config on one fold, returning the test accuracy (%)'''
+    from src.model import NeuralModel
+    model = NeuralModel.fit(x_train, y_train, config, verbose=0)
+    return float(100 * np.mean((model.predict(x_test, verbose=0)[:, 0] > 0.5) == y_test))
+
+def _limit_threads(threads: int):
+    for var in ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS", "POLARS_MAX_THREADS"]:
+        os.environ[var] = str(threads)
+
+def _init_worker(names: tuple, shapes: tuple, dtypes: tuple, best, threads: int):
+    # Cap each worker's thread pools before TensorFlow / BLAS are imported, so workers x threads <= cores
+    _limit_threads(threads)
+
+    arrays = []
+    for name, shape, dtype in zip(names, shapes, dtypes):
+        block = shared_memory.SharedMemory(name=name)
+        array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        array.flags.writeable = False
+        arrays.append(array)
+        _shared[name] = block # keep the mapping open
+    
+    _shared["x"], _shared["y"] = arrays
+    _shared["best"] = best
+
+def _run_trial(trial: int, config: dict, splits: list, trainer, min_folds: int, prune_margin: float) -> dict:
+    x, y, best = _shared["x"], _shared["y"], _shared["best"]
+    scores, pruned, start = [], False, time.perf_counter()
+
+    for n, (train, test) in enumerate(splits):
+        scores.append(trainer(config, x[train], y[train], x[test], y[test]))
+
+        # Stop trials that are clearly behind the best finished trial
+        if n + 1 >= min_folds and n + 1 < len(splits) and np.mean(scores) < best.value - prune_margin:
+            pruned = True
+            break
+
+    if not pruned:
+        with best.get_lock():
+            best.value = max(best.value, float(np.mean(scores)))
+
+    return {
+        "trial": trial,
+        "config": json.dumps(config, sort_keys=True),
+        "folds": len(scores),
+        "accuracy": float(np.mean(scores)),
+        "accuracy_std": float(np.std(scores)),
+        "pruned": pruned,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+def search(data: pl.DataFrame, configs: list, folds: int = 5, workers: int = None, threads_per_worker: int = 1, 
+           min_folds: int = 2, prune_margin: float = 2.0, seed: int = 0, trainer = keras_trial, 
+           leaderboard: str = "data/static/leaderboard.csv") -> pl.DataFrame:
+    '''
+    Cross validate NeuralModel.build configurations (see NeuralModel.default_config) across a process pool.
+
+    The feature matrix is placed in shared memory once and mapped read-only by every worker. Each worker is limited 
+    to threads_per_worker threads (workers defaults to cores // threads_per_worker). A trial is pruned once it has run 
+    min_folds folds and its mean accuracy is more than prune_margin points behind the best completed trial.
+
+    Returns the leaderboard (best first), which is also written to the leaderboard csv unless it is None.
+    '''
+    from src.model import NeuralModel
+    x, y = NeuralModel.training_arrays(data)
+    x, y = np.ascontiguousarray(x, dtype=np.float32), np.ascontiguousarray(y, dtype=np.int8)
+    
+    workers = workers or max(1, (os.cpu_count() or 1) // threads_per_worker)
+    splits = kfold(len(y), folds, seed)
+
+    blocks = [shared_memory.SharedMemory(create=True, size=max(1, i.nbytes)) for i in (x, y)]
+    try:
+        for block, array in zip(blocks, (x, y)):
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+
+        context = mp.get_context("spawn") # fresh interpreters, so thread limits apply before any imports
+        best = context.Value("d", -np.inf)
+        init_args = (tuple(i.name for i in blocks), (x.shape, y.shape), (x.dtype, y.dtype), best, threads_per_worker)
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker, initargs=init_args) as pool:
+            jobs = [pool.submit(_run_trial, n, config, splits, trainer, min_folds, prune_margin) for n, config in enumerate(configs)]
+            results = [job.result() for job in as_completed(jobs)]
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    table = pl.DataFrame(results).sort(["pruned", "accuracy"], descending=[False, True])
+    if leaderboard is not None:
+        table.write_csv(leaderboard)
+    return table
+
+
+if __name__ == "__main__":
+    from src.model import NeuralModel
+    data = NeuralModel.load_data(dir="data/events", start_year=2011, end_year=2021)
+    configs = grid(
+        units=[[256, 128, 64, 32, 16], [128, 64, 32], [64, 32]],
+        optimizer=["adagrad", "adam"],
+        batch_size=[32, 128],
+        epochs=[64],
+    )
+    with pl.Config(tbl_cols=-1, fmt_str_lengths=120):
+        print(search(data, configs, folds=5, threads_per_worker=int(os.getenv("THREADS_PER_WORKER", 1))))
@@ -0,0 +1,199 @@
+### Prediction Service ###
+import os, json, time, queue, threading, numpy as np, polars as pl
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from src.inference import DenseModel
+from src.model import NeuralModel
+
+class MicroBatcher:
+    '''
+    Coalesce concurrent predict requests into micro-batches.
+
+    Requests queue up while a batch is scoring; the worker then takes everything waiting (up to max_batch rows, 
+    waiting at most max_wait seconds for more to arrive) and makes a single vectorised predict call for all of them.
+    width (the model's input width, or a function returning it) is checked on submit, so one malformed request is
+    rejected on its own rather than failing the whole batch it would have joined.
+    '''
+    def __init__(self, predict, max_batch: int = 4096, max_wait: float = 0.002, width = None):
+        self.predict = predict
+        self.width = width
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, rows: np.ndarray) -> Future:
+        rows = np.atleast_2d(rows)
+        width = self.width() if callable(self.width) else self.width
+        if rows.ndim != 2 or (width is not None and rows.shape[1] != width):
+            raise ValueError(f"expected rows of {width} features, got shape {rows.shape}")
+
+        future = Future()
+        self._queue.put((rows, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0][0])
+            deadline = time.perf_counter() + self.max_wait
+
+            while size < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            try:
+                out = self.predict(np.concatenate([rows for rows, _ in batch]))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            
+            self.batches += 1
+            start = 0
+            for rows, future in batch:
+                future.set_result(out[start:start + len(rows)])
+                start += len(rows)
+
+class PredictionService:
+    '''
+    Keeps the model and latest feature table in memory, scoring requests through a MicroBatcher.
+
+    The model file is checked every check_every seconds and swapped in (between batches) when it changes, 
+    so a newly saved dropshot.npz (or dropshot.keras, which needs h5py) goes live without restarting the server.
+    '''
+    def __init__(self, model_path: str = "models/dropshot.npz", features: pl.DataFrame = None, events_dir: str = "data/events", 
+                 check_every: float = 1.0, **batch_kwargs):
+        self.model_path = model_path
+        self.events_dir = events_dir
+        self.check_every = check_every
+        self._lock = threading.Lock()
+        self._checked = 0.0
+        self._mtime = None
+        self.model = None
+        self._swap_model()
+
+        self.features = None
+        self.set_features(features if features is not None else NeuralModel.load_data(events_dir))
+        self.batcher = MicroBatcher(self._predict, width=self.input_width, **batch_kwargs)
+
+    def _swap_model(self):
+        mtime = os.stat(self.model_path).st_mtime_ns
+        if mtime != self._mtime:
+            model = DenseModel.load(self.model_path)
+            with self._lock:
+                self.model, self._mtime = model, mtime
+
+    def input_width(self) -> int:
+        return self.model.weights[0].shape[0]
+
+    def _predict(self, rows: np.ndarray) -> np.ndarray:
+        if time.monotonic() - self._checked > self.check_every:
+            self._checked = time.monotonic()
+            try:
+                self._swap_model()
+            except (OSError, ValueError, KeyError):
+                pass # keep serving the current model if the new file is missing or part written
+        
+        return self.model.predict(rows)[:, 0]
+
+    def set_features(self, features: pl.DataFrame):
+        '''Swap in a new feature table (one row per match, as from NeuralModel.load_data)'''
+        matrix = features.drop("match_id", "winner").to_numpy().astype(np.float32)
+        index = {k: n for n, k in enumerate(features.select("match_id").to_series().to_list())}
+        with self._lock:
+            self.features = (index, matrix)
+
+    def reload_features(self):
+        '''Rebuild the feature table from the events directory (only new / changed events are aggregated)'''
+        self.set_features(NeuralModel.load_data(self.events_dir))
+
+    def predict_matches(self, match_ids: list) -> list:
+        index, matrix = self.features
+        missing = [i for i in match_ids if i not in index]
+        if len(missing) > 0:
+            raise KeyError(f"unknown match_id : {', '.join(missing)}")
+
+        p1_win = self.batcher.submit(matrix[[index[i] for i in match_ids]]).result()
+        return [{"match_id": k, "P1_win": float(v), "P2_win": float(1 - v)} for k, v in zip(match_ids, p1_win)]
+
+    def predict_features(self, rows: list) -> list:
+        p1_win = self.batcher.submit(np.asarray(rows, dtype=np.float32)).result()
+        return [{"P1_win": float(v), "P2_win": float(1 - v)} for v in p1_win]
+
+    def status(self) -> dict:
+        return {"model": self.model_path, "model_mtime_ns": self._mtime, "matches": len(self.features[0]), "batches": self.batcher.batches}
+
+def handler(service: PredictionService):
+    '''
+    Request handler for the service :
+        GET  /health                        model & feature table status
+        GET  /predict?match_id=...          single match (repeat match_id for several)
+        POST /predict                       {"match_ids": [...]} or {"features": [[...], ...]} for bulk requests
+        POST /reload                        refresh the feature table from the events directory
+    '''
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code: int, body: dict):
+            data = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _score(self, request: dict):
+            try:
+                if "features" in request:
+                    self._send(200, {"predictions": service.predict_features(request["features"])})
+                else:
+                    self._send(200, {"predictions": service.predict_matches(list(request.get("match_ids", [])))})
+            except KeyError as e:
+                self._send(404, {"error": str(e).strip("'\"")})
+            except (ValueError, TypeError) as e:
+                self._send(400, {"error": str(e)})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/health":
+                self._send(200, service.status())
+            elif url.path == "/predict":
+                self._score({"match_ids": parse_qs(url.query).get("match_id", [])})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if urlparse(self.path).path == "/reload":
+                service.reload_features()
+                return self._send(200, service.status())
+            if urlparse(self.path).path != "/predict":
+                return self._send(404, {"error": "not found"})
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            except json.JSONDecodeError as e:
+                return self._send(400, {"error": str(e)})
+            self._score(request)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+def serve(service: PredictionService, host: str = "127.0.0.1", port: int = 8050) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), handler(service))
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    service = PredictionService(model_path=os.getenv("MODEL_PATH", "models/dropshot.npz"))
+    server = serve(service, port=int(os.getenv("PORT", 8050)))
+    print(f"Serving {service.status()} on http://{server.server_address[0]}:{server.server_address[1]}")
+    server.serve_forever()
@@ -0,0 +1,228 @@
+### Tournament Draw Simulation ###
+import os, hashlib, numpy as np, polars as pl
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from src.inference import load_model
+from src.model import NeuralModel
+from src.instrument import stage
+from src.players import fill_ids, name_ids, player_key, tour_players
+
+PROFILE_COLUMNS = ["first_won", "secnd_won", "win_err"]
+
+# Pairwise matrices by draw digest, so re-running a draw (e.g. after each completed match) skips the model
+_matrices = {}
+
+def round_names(size: int) -> list:
+    '''Column names for reaching each round of a size player draw, e.g. 128 -> R64, R32, R16, QF, SF, F, W'''
+    named = {8: "QF", 4: "SF", 2: "F", 1: "W"}
+    names, size = [], size // 2
+    while size >= 1:
+        names.append(named.get(size, f"R{size}"))
+        size //= 2
+    return names
+
+def player_profiles(files: list, store = None, names: pl.DataFrame = None) -> pl.DataFrame:
+    '''
+    Each player's mean serve-won rates and winner / error ratio over the matches in files (key, first_won, secnd_won, win_err).
+    Players are keyed by id (see src.players.player_key), names fills in the ids missing from older events (see name_ids),
+    as display names differ between slams (L. Pouille at the AO & FO, Lucas Pouille elsewhere).
+    '''
+    features = NeuralModel.stored_features(files, store)
+    players = pl.concat([
+        pl.scan_parquet(i).select(pl.col("match_id", "player1", "player2").cast(pl.String), pl.col("p1_id", "p2_id").cast(pl.Int64)).unique("match_id") for i in files
+    ]).collect() if len(files) > 0 else pl.DataFrame(schema={"match_id": pl.String, "player1": pl.String, "player2": pl.String, "p1_id": pl.Int64, "p2_id": pl.Int64})
+    if names is not None:
+        for i in (1, 2):
+            players = fill_ids(players, names, f"p{i}_id", f"player{i}")
+
+    table = features.with_columns(pl.col("match_id").cast(pl.String)).join(players, on="match_id", how="inner")
+    sides = [
+        table.select(player_key(f"p{i}_id", f"player{i}").alias("key"), **{k: pl.col(f"p{i}_{k}") for k in PROFILE_COLUMNS}) for i in (1, 2)
+    ]
+    return pl.concat(sides).group_by("key").agg(pl.col(PROFILE_COLUMNS).mean()).sort("key")
+
+class Draw:
+    '''
+    A single elimination draw : players in bracket order (adjacent pairs meet in the first round) with the
+    static and profile features NeuralModel needs for any pairing.
+
+    players columns : player, age, rank_points, first_won, secnd_won, win_err
+    '''
+    def __init__(self, players: pl.DataFrame, year: int, surface: str, model = "models/dropshot.npz"):
+        size = players.height
+        if size < 2 or size & (size - 1) != 0:
+            raise ValueError(f"draw size must be a power of 2, got {size}")
+
+        self.players = players
+        self.year = year
+        self.surface = surface
+        self.model = model
+        self._matrix = None
+        self.index = {k: n for n, k in enumerate(players["player"].to_list()) if k is not None}
+
+    @classmethod
+    def from_events(cls, file: str, history_years: int = 2, model = "models/dropshot.npz", store = None, matches: str = "data/matches") -> "Draw":
+        '''
+        The draw of a stored slam (see src.store), from its first round matches (match numbers 1101, 1102, ... or 2101, ... in bracket order).
+        Player profiles come from the same tour's slams in the previous history_years years; players without
+        history, and slots of first round matches missing from the point data, get the field average. Players are matched
+        on id, with ids missing from older events filled from the names in the tour results partitions under matches.
+        '''
+        dir, name = os.path.split(file)
+        tour, slam, year = name.removesuffix(".parquet").split("-")
+        year = int(year)
+        first = 11 if tour.lower() == "atp" else 21 # round 1 match numbers, 1101 ... (men) or 2101 ... (women)
+
+        first_round = pl.read_parquet(file, columns=["match_id", "surface", "player1", "player2", "p1_id", "p2_id", "age", "age_p2", "rank_points", "rank_points_p2"]).with_columns(
+            pl.col("match_id", "surface", "player1", "player2").cast(pl.String), pl.col("p1_id", "p2_id").cast(pl.Int64),
+        ).unique("match_id").with_columns(
+            # Recent slams number matches MS101 / WS101 rather than 1101 / 2101
+            number = pl.col("match_id").str.split("-").list.last().str.replace("MS", "1").str.replace("WS", "2").cast(pl.Int32, strict=False),
+        ).filter(pl.col("number") // 100 == first)
+        if first_round.height == 0:
+            raise ValueError(f"No first round matches in {file}")
+        names = name_ids(tour_players(tour, matches))
+        for i in (1, 2):
+            first_round = fill_ids(first_round, names, f"p{i}_id", f"player{i}")
+        size = 2 ** int(np.ceil(np.log2(max(2, 2 * (first_round["number"].max() - first * 100)))))
+
+        slots = pl.DataFrame({"number": np.repeat(np.arange(first * 100 + 1, first * 100 + 1 + size // 2), 2), "side": np.tile([1, 2], size // 2)}).join(
+            pl.concat([
+                first_round.select("number", side = pl.lit(1), player = pl.col("player1"), key = player_key("p1_id", "player1"), age = pl.col("age"), rank_points = pl.col("rank_points")),
+                first_round.select("number", side = pl.lit(2), player = pl.col("player2"), key = player_key("p2_id", "player2"), age = pl.col("age_p2"), rank_points = pl.col("rank_points_p2")),
+            ]).with_columns(pl.col("number").cast(pl.Int64), pl.col("side").cast(pl.Int64)),
+            on=["number", "side"], how="left", maintain_order="left",
+        )
+
+        files = [i for i in NeuralModel.event_files(dir, year - history_years, year - 1) if os.path.basename(i).startswith(f"{tour}-")]
+        players = slots.join(player_profiles(files, store, names), on="key", how="left", maintain_order="left").select(
+            "player", "age", "rank_points", *PROFILE_COLUMNS,
+        ).with_columns(
+            pl.col("age").fill_null(pl.col("age").median()),
+            pl.col("rank_points").fill_null(0),
+            *[pl.col(i).fill_null(pl.col(i).mean()) for i in PROFILE_COLUMNS],
+        )
+        return cls(players, year, first_round["surface"][0], model)
+
+    def digest(self) -> str:
+        return hashlib.sha256(
+            self.players.hash_rows(seed=0).to_numpy().tobytes() + f"{self.year}|{self.surface}|{self.model}|{os.stat(self.model).st_mtime_ns}".encode()
+        ).hexdigest()
+
+    def pair_features(self) -> np.ndarray:
+        '''NeuralModel feature rows for every ordered pairing (i, j), i as p1, row i * size + j'''
+        size = self.players.height
+        p = self.players.select(
+            pl.col("age") / NeuralModel.max_age,
+            pl.col("rank_points") / NeuralModel.max_points,
+            *PROFILE_COLUMNS,
+        ).to_numpy().astype(np.float32)
+        i, j = np.repeat(np.arange(size), size), np.tile(np.arange(size), size)
+
+        return np.column_stack([
+            np.full(size * size, self.year - NeuralModel.first_year),
+            np.full(size * size, NeuralModel.surface_map[self.surface]),
+            p[i, 0], p[j, 0], p[i, 1], p[j, 1],
+            p[i, 2], p[i, 3], p[j, 2], p[j, 3], p[i, 4], p[j, 4],
+        ]).astype(np.float32)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        '''
+        P[i, j] = probability player i beats player j. Scored once per draw in a single batch; the network isn't
+        symmetric in p1 / p2 so both orderings are averaged, making P[i, j] + P[j, i] = 1.
+        '''
+        # saved models are cached across Draw instances by digest, in memory models only on the instance
+        key = self.digest() if isinstance(self.model, str) else None
+        if key in _matrices:
+            return _matrices[key]
+        if self._matrix is None:
+            with stage("simulate.matrix", rows_in=self.players.height ** 2):
+                model = load_model(self.model) if isinstance(self.model, str) else self.model
+                size = self.players.height
+                p1_win = model.predict(self.pair_features())[:, 0].reshape(size, size).astype(np.float64)
+                self._matrix = (p1_win + 1 - p1_win.T) / 2
+                np.fill_diagonal(self._matrix, 0.5)
+            if key is not None:
+                _matrices[key] = self._matrix
+        return self._matrix
+
+    def force(self, results: list) -> np.ndarray:
+        '''The pairwise matrix with completed matches, (winner, loser) player pairs, fixed to 1 / 0'''
+        matrix = self.matrix.copy()
+        for winner, loser in results:
+            w, l = self.index[winner], self.index[loser]
+            matrix[w, l], matrix[l, w] = 1.0, 0.0
+        return matrix
+
+def completed_results(file: str, through_round: int = None) -> list:
+    '''(winner, loser) pairs for the matches of a stored slam, optionally only up to a round (match winner = last point's winner)'''
+    last = pl.read_parquet(file, columns=["match_id", "player1", "player2", "round", "PointWinner"]).with_columns(
+        pl.col("match_id", "player1", "player2").cast(pl.String),
+    ).group_by("match_id", maintain_order=True).last()
+    if through_round is not None:
+        last = last.filter(pl.col("round") <= through_round)
+
+    return [
+        (p1, p2) if winner == 1 else (p2, p1) for p1, p2, winner in last.select("player1", "player2", "PointWinner").iter_rows()
+    ]
+
+def bracket(matrix: np.ndarray, sims: int, seed) -> np.ndarray:
+    '''
+    Play a draw out sims times at once. Each round pairs adjacent survivors, looks their win probabilities up in the
+    matrix and draws one uniform per match; returns counts of how often each player reached each round (rounds x size).
+    '''
+    rng = np.random.default_rng(seed)
+    size = matrix.shape[0]
+    field = np.broadcast_to(np.arange(size, dtype=np.int32), (sims, size))
+    reached = []
+
+    while field.shape[1] > 1:
+        a, b = field[:, 0::2], field[:, 1::2]
+        field = np.where(rng.random(a.shape) < matrix[a, b], a, b)
+        reached.append(np.bincount(field.ravel(), minlength=size))
+
+    return np.stack(reached)
+
+def _limit_threads():
+    for var in ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "POLARS_MAX_THREADS"]:
+        os.environ[var] = "1"
+
+def simulate(draw: Draw, sims: int = 100_000, seed: int = 0, results: list = None, workers: int = 1, shard_size: int = 25_000) -> pl.DataFrame:
+    '''
+    Round reach probabilities for every player in the draw from sims Monte Carlo runs (completed results are fixed).
+
+    Runs are split into shards of shard_size, each with its own stream spawned from seed, so the output for a given
+    seed is the same however many worker processes the shards are spread over.
+    '''
+    matrix = draw.force(results or [])
+    shards = [min(shard_size, sims - i) for i in range(0, sims, shard_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(shards))
+
+    with stage("simulate.run", sims=sims, shards=len(shards), workers=workers, rows_out=draw.players.height):
+        if workers > 1 and len(shards) > 1:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"), initializer=_limit_threads) as pool:
+                reached = sum(pool.map(bracket, [matrix] * len(shards), shards, seeds))
+        else:
+            reached = sum(bracket(matrix, n, s) for n, s in zip(shards, seeds))
+
+    return pl.DataFrame({"player": draw.players["player"]}).with_columns(
+        pl.Series(name, reached[r] / sims) for r, name in enumerate(round_names(matrix.shape[0]))
+    )
+
+
+if __name__ == "__main__":
+    # python -m src.simulate data/events/atp-usopen-2024.parquet [sims] [workers] [through_round]
+    import sys, time
+    file = sys.argv[1]
+    sims = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    through_round = int(sys.argv[4]) if len(sys.argv) > 4 else None
+
+    draw = Draw.from_events(file)
+    results = completed_results(file, through_round) if through_round is not None else []
+    start = time.perf_counter()
+    table = simulate(draw, sims, results=results, workers=workers)
+    print(f"{sims:,} simulations in {time.perf_counter() - start:.2f}s")
+    with pl.Config(tbl_rows=16, tbl_cols=-1):
+        print(table.sort("W", descending=True).head(16))
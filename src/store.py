@@ -0,0 +1,99 @@
+### Point-by-Point Store ###
+import os, glob, polars as pl
+
+SURFACES = pl.Enum(["clay", "hard", "grass"])
+
+# Compact, consistent schema for every stored event (historical column variants are mapped on read, see src.schemas)
+POINT_SCHEMA = {
+    'match_id' : pl.Categorical(),
+    'surface' : SURFACES,
+    'player1' : pl.Categorical(),
+    'player2' : pl.Categorical(),
+    'p1_id' : pl.Int32,
+    'p2_id' : pl.Int32,
+    'winner' : pl.Int8,
+    'round' : pl.Int8,
+    'age' : pl.Float64,
+    'rank' : pl.Int16,
+    'rank_points' : pl.Int32,
+    'age_p2' : pl.Float64,
+    'rank_p2' : pl.Int16,
+    'rank_points_p2' : pl.Int32,
+    'ElapsedTime' : pl.String,
+    'SetNo' : pl.Int8,
+    'P1GamesWon' : pl.Int8,
+    'P2GamesWon' : pl.Int8,
+    'SetWinner' : pl.Int8,
+    'GameNo' : pl.Int16,
+    'GameWinner' : pl.Int8,
+    'PointNumber' : pl.Int16,
+    'PointWinner' : pl.Int8,
+    'PointServer' : pl.Int8,
+    'ServeIndicator' : pl.Int8,
+    'P1Score' : pl.Int8,
+    'P2Score' : pl.Int8,
+    'P1PointsWon' : pl.Int16,
+    'P2PointsWon' : pl.Int16,
+    'P1Ace' : pl.Int8,
+    'P2Ace' : pl.Int8,
+    'P1Winner' : pl.Int8,
+    'P2Winner' : pl.Int8,
+    'P1DoubleFault' : pl.Int8,
+    'P2DoubleFault' : pl.Int8,
+    'P1UnfErr' : pl.Int8,
+    'P2UnfErr' : pl.Int8,
+    'P1DistanceRun' : pl.Float32,
+    'P2DistanceRun' : pl.Float32,
+    'serve_mph' : pl.Int16,
+    'rally_count' : pl.Int16,
+}
+
+def conform(table: pl.LazyFrame) -> pl.LazyFrame:
+    '''Map an event table (any historical layout) to POINT_SCHEMA, sorted by match with point order preserved'''
+    cols = table.collect_schema().names()
+    col = lambda name, dtype=pl.Int64: pl.col(name).cast(pl.String).cast(dtype, strict=False) if name in cols else pl.lit(None, dtype)
+
+    table = table.with_columns(
+        serve_mph = pl.coalesce(col("serve_mph"), col("Speed_MPH"), (col("Speed_KMH") / 1.60934).cast(pl.Int64)),
+        rally_count = pl.coalesce(col("rally_count"), col("Rally"), col("RallyCount")),
+        ServeIndicator = pl.coalesce(col("ServeIndicator"), col("ServeNumber")),
+        winner = col("winner"),
+    )
+    cols = table.collect_schema().names()
+
+    return table.sort("match_id", maintain_order=True).select(
+        pl.col(k).cast(v, strict=False) if k in cols else pl.lit(None, v).alias(k) for k, v in POINT_SCHEMA.items()
+    )
+
+def write_points(table: pl.DataFrame, path: str, row_group_size: int = 16_384) -> str:
+    '''Write an event table to the store (compact schema, sorted by match, with row group statistics)'''
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Written aside & renamed so an interrupted write never leaves a truncated file in the store
+    conform(table.lazy()).collect().write_parquet(f"{path}.tmp", compression="zstd", statistics=True, row_group_size=row_group_size)
+    os.replace(f"{path}.tmp", path)
+    return path
+
+def scan_points(dir: str = "data/events") -> pl.LazyFrame:
+    '''Scan the whole store as one table (files share POINT_SCHEMA, legacy files are conformed)'''
+    files = sorted(glob.glob(f"{dir}/*.parquet"))
+    frames = [pl.scan_parquet(i) for i in files]
+
+    if all(i.collect_schema() == pl.Schema(POINT_SCHEMA) for i in frames):
+        return pl.scan_parquet(files) if len(files) > 0 else pl.LazyFrame(schema=POINT_SCHEMA)
+    return pl.concat([conform(i) for i in frames], how="vertical")
+
+def load_points(dir: str = "data/events", memory_map: bool = True) -> pl.DataFrame:
+    '''Read the whole store (memory mapped)'''
+    files = sorted(glob.glob(f"{dir}/*.parquet"))
+    if not all(pl.read_parquet_schema(i) == pl.Schema(POINT_SCHEMA) for i in files):
+        return scan_points(dir).collect()
+    return pl.concat([pl.read_parquet(i, memory_map=memory_map) for i in files], how="vertical")
+
+
+if __name__ == "__main__":
+    # Rewrite existing event files in the compact schema : python -m src.store data/events
+    import sys
+    for file in sorted(glob.glob(f"{sys.argv[1] if len(sys.argv) > 1 else 'data/events'}/*.parquet")):
+        before = os.path.getsize(file)
+        write_points(pl.read_parquet(file), file)
+        print(f"{file} : {before:,} -> {os.path.getsize(file):,} bytes")
@@ -0,0 +1,40 @@
+import os, threading, functools, pytest
+from src.cache import HttpCache
+from src.features import FeatureStore
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        self.server.requests.append((self.command, self.path))
+
+@pytest.fixture
+def sackmann_server(tmp_path):
+    """Local HTTP stand-in for the Sackmann GitHub repos, serving whatever is written to the yielded directory"""
+    handler = functools.partial(_QuietHandler, directory=str(tmp_path))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield tmp_path, f"http://127.0.0.1:{server.server_address[1]}", server.requests
+
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def repo_root(monkeypatch):
+    """Pipelines use repo relative paths (e.g. data/static/events.csv)"""
+    monkeypatch.chdir(ROOT)
+    return ROOT
+
+@pytest.fixture
+def cache(tmp_path_factory):
+    """Empty source cache, isolated from data/cache"""
+    return HttpCache(dir=str(tmp_path_factory.mktemp("cache")))
+
+@pytest.fixture
+def store(repo_root, tmp_path):
+    """Feature store under tmp_path, so tests never write to data/features"""
+    return FeatureStore(dir=str(tmp_path / "features"))
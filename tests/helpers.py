@@ -0,0 +1,58 @@
+# Test Fixtures
+import polars as pl
+
+def tour_csv(year: int, rows: int = 4) -> pl.DataFrame:
+    """Sackmann style annual tour results (only the columns the pipelines touch)"""
+    return pl.DataFrame({
+        "tourney_id": [f"{year}-580"] * rows,
+        "tourney_name": ["Australian Open", "Australian Open", "Brisbane", "Brisbane"][:rows],
+        "surface": ["Hard"] * rows,
+        "tourney_level": ["G", "G", "A", "A"][:rows],
+        "tourney_date": [int(f"{year}0115")] * rows,
+        "match_num": list(range(1, rows + 1)),
+        "winner_id": [104925, 104745, 105453, 104925][:rows],
+        "winner_name": ["Novak Djokovic", "Rafael Nadal", "Kei Nishikori", "Novak Djokovic"][:rows],
+        "winner_entry": [None] * rows,
+        "winner_seed": [1] * rows,
+        "winner_age": [32.7, 33.6, 30.1, 32.7][:rows],
+        "winner_rank": [1, 2, 13, 1][:rows],
+        "winner_rank_points": [10220, 9850, 2400, 10220][:rows],
+        "loser_id": [104745, 200001, 104925, 104745][:rows],
+        "loser_name": ["Rafael Nadal", "Nikola Djokovic", "Novak Djokovic", "Rafael Nadal"][:rows],
+        "loser_entry": [None] * rows,
+        "loser_seed": [2] * rows,
+        "loser_age": [33.6, 21.0, 32.7, 33.6][:rows],
+        "loser_rank": [2, 500, 1, 2][:rows],
+        "loser_rank_points": [9850, 50, 10220, 9850][:rows],
+        "score": ["6-4 6-4 6-4", "6-3 3-6 7-6(5) RET", "W/O", "6-1 6-1"][:rows],
+        "round": ["F", "SF", "R32", "QF"][:rows],
+    })
+
+def slam_matches_csv(year: int) -> pl.DataFrame:
+    """Point-by-point repo match list (one men's final, one men's semi, one women's final)"""
+    return pl.DataFrame({
+        "match_id": [f"{year}-ausopen-1701", f"{year}-ausopen-1601", f"{year}-ausopen-2701"],
+        "player1": ["Novak Djokovic", "Rafael Nadal", "Sofia Kenin"],
+        "player2": ["Rafael Nadal", "N. Djokovic", "Garbine Muguruza"],
+        "winner": [1, 1, 1],
+    })
+
+def slam_points_csv(year: int) -> pl.DataFrame:
+    """Point-by-point repo points (two points for each match, scores as published incl. AD & 0X point numbers)"""
+    return pl.DataFrame({
+        "match_id": [f"{year}-ausopen-{i}" for i in ["1701", "1701", "1601", "1601", "2701", "2701"]],
+        "PointNumber": ["0X", "1", "0Y", "1", "1", "2"],
+        "SetNo": [1] * 6,
+        "GameNo": [1] * 6,
+        "PointServer": [1, 1, 2, 2, 1, 1],
+        "PointWinner": [1, 2, 2, 2, 1, 1],
+        "ServeIndicator": [1, 2, 1, 1, 1, 2],
+        "P1Score": ["0", "AD", "15", "30", "0", "15"],
+        "P2Score": ["0", "40", "0", "0", "0", "0"],
+        "P1Winner": [0, 1, 0, 0, 1, 0],
+        "P2Winner": [0, 0, 1, 0, 0, 0],
+        "P1UnfErr": [1, 0, 0, 0, 0, 0],
+        "P2UnfErr": [0, 0, 0, 1, 0, 0],
+        "Speed_KMH": [200, 180, 190, 170, 160, 150],
+        "Rally": [1, 4, 2, 6, 3, 1],
+    })
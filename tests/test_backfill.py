@@ -0,0 +1,76 @@
+import json, threading, time, polars as pl, pytest
+from src import events, matches
+from src.backfill import backfill, run_graph
+from src.cache import HttpCache
+from src.players import PlayerIndex
+from tests.helpers import tour_csv, slam_matches_csv, slam_points_csv
+
+def test_run_graph():
+    order = []
+    def task(key, seconds=0.0, fail=False):
+        def run():
+            time.sleep(seconds)
+            if fail:
+                raise ValueError(key)
+            order.append(key)
+            return key
+        return run
+
+    start = time.perf_counter()
+    results = run_graph({
+        "source": (task("source", 0.1), []),
+        "bad": (task("bad", fail=True), []),
+        **{f"job{i}": (task(f"job{i}", 0.2), ["source"]) for i in range(4)},
+        "orphan": (task("orphan"), ["bad"]),
+    }, workers=4)
+
+    assert time.perf_counter() - start < 0.5 # jobs ran side by side once their shared source was ready
+    assert order[0] == "source" and sorted(order[1:]) == [f"job{i}" for i in range(4)]
+    assert isinstance(results["bad"], ValueError) and isinstance(results["orphan"], RuntimeError)
+
+def test_run_graph_unrunnable():
+    run = lambda: None
+    with pytest.raises(ValueError, match="missing"):
+        run_graph({"a": (run, ["missing"])})
+    with pytest.raises(ValueError, match="b, c"):
+        run_graph({"a": (run, []), "b": (run, ["c"]), "c": (run, ["b"])}, workers=2)
+
+def test_backfill_resumes(sackmann_server, monkeypatch, tmp_path_factory):
+    folder, url, requests_log = sackmann_server
+    tour_csv(2020).write_csv(folder / "atp_matches_2020.csv")
+    tour_csv(2020).write_csv(folder / "wta_matches_2020.csv")
+    slam_matches_csv(2020).write_csv(folder / "2020-ausopen-matches.csv")
+    slam_points_csv(2020).write_csv(folder / "2020-ausopen-points.csv")
+    monkeypatch.setattr(events, "SLAM_URL", f"{url}/")
+    monkeypatch.setitem(matches.TOUR_URLS, "ATP", f"{url}/atp_matches_")
+    monkeypatch.setitem(matches.TOUR_URLS, "WTA", f"{url}/wta_matches_")
+
+    out = str(tmp_path_factory.mktemp("events"))
+    cache_dir = str(tmp_path_factory.mktemp("cache"))
+    players = PlayerIndex(str(tmp_path_factory.mktemp("static") / "players.csv"))
+    run = lambda cache: backfill(["atp", "wta"], ["Australian Open", "French Open"], [2020], dir=out, cache=cache, players=players)
+
+    # Sources unreachable : every job fails and is left for the next run
+    assert run(HttpCache(dir=cache_dir, offline=True)) == {"done": 0, "empty": 0, "failed": 4, "skipped": 0}
+
+    assert run(HttpCache(dir=cache_dir)) == {"done": 2, "empty": 2, "failed": 0, "skipped": 0}
+    served = [i for _, i in requests_log if "frenchopen" not in i] # missing files are logged twice by the test server
+    assert sorted(served) == ["/2020-ausopen-matches.csv", "/2020-ausopen-points.csv", "/atp_matches_2020.csv", "/wta_matches_2020.csv"] # shared sources downloaded once
+    assert pl.read_parquet(f"{out}/wta-australianopen-2020.parquet")["match_id"].unique().to_list() == ["2020-ausopen-2701"]
+
+    manifest = json.load(open(f"{out}/backfill.json"))["jobs"]
+    assert {k: v["status"] for k, v in manifest.items()} == {
+        "atp-australianopen-2020.parquet": "done", "wta-australianopen-2020.parquet": "done",
+        "atp-frenchopen-2020.parquet": "empty", "wta-frenchopen-2020.parquet": "empty",
+    }
+    assert run(HttpCache(dir=cache_dir)) == {"done": 0, "empty": 0, "failed": 0, "skipped": 4}
+
+    # An event stored before the player index (no ids, no manifest entry) is rebuilt once with ids
+    legacy = f"{out}/atp-australianopen-2020.parquet"
+    pl.read_parquet(legacy).with_columns(pl.lit(None, pl.Int32).alias("p1_id"), pl.lit(None, pl.Int32).alias("p2_id")).write_parquet(legacy)
+    manifest = json.load(open(f"{out}/backfill.json"))
+    del manifest["jobs"]["atp-australianopen-2020.parquet"]
+    json.dump(manifest, open(f"{out}/backfill.json", "w"))
+    assert run(HttpCache(dir=cache_dir)) == {"done": 1, "empty": 0, "failed": 0, "skipped": 3}
+    assert pl.read_parquet(legacy)["p1_id"].is_not_null().any()
+    assert run(HttpCache(dir=cache_dir)) == {"done": 0, "empty": 0, "failed": 0, "skipped": 4}
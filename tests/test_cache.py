@@ -0,0 +1,79 @@
+import os, time, pytest
+from src.cache import HttpCache
+
+def gets(requests):
+    return len([i for i in requests if i[0] == "GET"])
+
+def test_fetch_once(sackmann_server, cache):
+    folder, url, requests = sackmann_server
+    (folder / "a.csv").write_text("a,b\n1,2\n")
+
+    assert cache.fetch(f"{url}/a.csv") == b"a,b\n1,2\n"
+    assert cache.read_csv(f"{url}/a.csv").shape == (1, 2)
+    assert gets(requests) == 1
+
+def test_revalidation(sackmann_server, cache):
+    folder, url, requests = sackmann_server
+    (folder / "a.csv").write_text("a,b\n1,2\n")
+    cache.max_age = 0
+
+    cache.fetch(f"{url}/a.csv")
+    digest = cache.digest(f"{url}/a.csv")
+    cache.fetch(f"{url}/a.csv") # not modified (304)
+    assert cache.digest(f"{url}/a.csv") == digest
+
+    time.sleep(1.1) # Last-Modified has second resolution
+    (folder / "a.csv").write_text("a,b\n3,4\n")
+    assert cache.fetch(f"{url}/a.csv") == b"a,b\n3,4\n"
+    assert cache.digest(f"{url}/a.csv") != digest
+    assert gets(requests) == 3
+
+def test_content_addressed(sackmann_server, cache):
+    folder, url, _ = sackmann_server
+    (folder / "a.csv").write_text("a,b\n1,2\n")
+    (folder / "b.csv").write_text("a,b\n1,2\n")
+
+    cache.fetch(f"{url}/a.csv")
+    cache.fetch(f"{url}/b.csv")
+    assert cache.digest(f"{url}/a.csv") == cache.digest(f"{url}/b.csv")
+    assert sum(len(files) for _, _, files in os.walk(f"{cache.dir}/objects")) == 1
+
+def test_lru_eviction(sackmann_server, cache):
+    folder, url, _ = sackmann_server
+    for name in ["a", "b", "c"]:
+        (folder / f"{name}.csv").write_text(f"{name}\n" + "1\n" * 50)
+    cache.max_bytes = 250
+
+    cache.fetch(f"{url}/a.csv")
+    cache.fetch(f"{url}/b.csv")
+    cache.fetch(f"{url}/a.csv") # a is now more recently used than b
+    cache.fetch(f"{url}/c.csv")
+
+    assert cache.digest(f"{url}/b.csv") is None
+    assert cache.digest(f"{url}/a.csv") is not None
+    assert cache.digest(f"{url}/c.csv") is not None
+
+def test_hits_batch_index_writes(sackmann_server, cache):
+    folder, url, _ = sackmann_server
+    (folder / "a.csv").write_text("a,b\n1,2\n")
+    cache.fetch(f"{url}/a.csv")
+    written = os.stat(f"{cache.dir}/index.json").st_mtime_ns
+
+    for _ in range(10):
+        cache.fetch(f"{url}/a.csv") # hits only touch the in memory index
+    assert os.stat(f"{cache.dir}/index.json").st_mtime_ns == written
+
+    accessed = cache.index[f"{url}/a.csv"]["accessed"]
+    cache.close()
+    assert HttpCache(dir=cache.dir).index[f"{url}/a.csv"]["accessed"] == accessed
+
+def test_offline(sackmann_server, cache):
+    folder, url, requests = sackmann_server
+    (folder / "a.csv").write_text("a,b\n1,2\n")
+    cache.fetch(f"{url}/a.csv")
+
+    offline = HttpCache(dir=cache.dir, max_age=0, offline=True)
+    assert offline.fetch(f"{url}/a.csv") == b"a,b\n1,2\n"
+    with pytest.raises(FileNotFoundError):
+        offline.fetch(f"{url}/b.csv")
+    assert len(requests) == 1
@@ -0,0 +1,76 @@
+import os, shutil, datetime as dt, numpy as np, polars as pl
+from src.elo import EloRatings, INITIAL
+from src.model import NeuralModel
+
+def copy_years(source, years):
+    for year in years:
+        os.makedirs(source / f"ATP/year={year}", exist_ok=True)
+        shutil.copy(f"data/matches/ATP/year={year}/data.parquet", source / f"ATP/year={year}/data.parquet")
+
+def test_incremental_matches_replay(repo_root, tmp_path):
+    source = tmp_path / "matches"
+    copy_years(source, [2019])
+    ratings = EloRatings("ATP", dir=str(tmp_path / "elo"), source=str(source))
+    first = ratings.update()
+    assert first > 0 and ratings.update() == 0
+
+    copy_years(source, [2020])
+    reloaded = EloRatings("ATP", dir=str(tmp_path / "elo"), source=str(source)) # state comes back from the checkpoint
+    added = reloaded.update()
+    assert 0 < added < first
+
+    full = EloRatings("ATP", dir=str(tmp_path / "full"), source=str(source))
+    assert full.update() == first + added
+    assert full.current().equals(reloaded.current())
+
+    # A back-dated year replays everything
+    copy_years(source, [2018])
+    assert reloaded.update() == reloaded.history().height // 2
+
+def test_point_in_time(repo_root, tmp_path):
+    source = tmp_path / "matches"
+    copy_years(source, [2019, 2020])
+    ratings = EloRatings("ATP", dir=str(tmp_path / "elo"), source=str(source))
+    ratings.update()
+
+    djokovic = 104925
+    history = ratings.history().filter(pl.col("player_id") == djokovic)
+    date = history["tourney_date"][40]
+    before = history.filter(pl.col("tourney_date") < date).tail(1)
+
+    frame = pl.DataFrame({"player_id": [djokovic, djokovic, -1], "date": [date, dt.datetime(2010, 1, 1), date], "surface": ["clay", "hard", "grass"]})
+    joined = ratings.as_of(frame, "player_id", "date", "surface")
+    assert joined["elo"].to_list() == [before["elo"][0], INITIAL, INITIAL]
+    assert joined["surface_elo"][0] == before["elo_clay"][0]
+
+def test_model_features(repo_root, tmp_path, store):
+    source = tmp_path / "matches"
+    copy_years(source, [2018, 2019])
+    ratings = EloRatings("ATP", dir=str(tmp_path / "elo"), source=str(source))
+    ratings.update()
+
+    data = NeuralModel.load_data("data/events", 2019, 2019, store=store, ratings=ratings)
+    elo = data.select("p1_elo", "p2_elo", "p1_surface_elo", "p2_surface_elo").to_numpy()
+    assert not np.isnan(elo).any() and (elo > 0.3).all() and (elo < 0.9).all()
+    assert (elo != INITIAL / 3000).mean() > 0.8 # most players are rated
+
+def test_event_players_by_id(repo_root, tmp_path):
+    source = tmp_path / "matches"
+    copy_years(source, [2018, 2019])
+    ratings = EloRatings("ATP", dir=str(tmp_path / "elo"), source=str(source))
+    ratings.update()
+
+    # Every player named after Djokovic but carrying their own id keeps their own rating
+    djokovic = 104925
+    current = ratings.current()
+    other = current.filter(pl.col("player_id") != djokovic)["player_id"][10]
+    event = pl.read_parquet("data/events/atp-wimbledon-2019.parquet").with_columns(
+        pl.lit("Novak Djokovic").alias("player1"), pl.lit("N. Djokovic").alias("player2"),
+        pl.lit(other, pl.Int32).alias("p1_id"), pl.lit(None, pl.Int32).alias("p2_id"),
+    )
+    event.write_parquet(tmp_path / "atp-wimbledon-2019.parquet")
+
+    features = ratings.event_features([str(tmp_path / "atp-wimbledon-2019.parquet")])
+    start = ratings.as_of(pl.DataFrame({"player_id": [other, djokovic], "date": [dt.datetime(2019, 7, 1)] * 2}), "player_id", "date")["elo"]
+    assert (features["p1_elo"] == start[0] / 3000).all() # the id wins over the name
+    assert (features["p2_elo"] == start[1] / 3000).all() # no id, matched on the name key
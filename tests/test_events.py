@@ -0,0 +1,40 @@
+import polars as pl
+from src import events, matches
+from src.players import PlayerIndex
+from tests.helpers import tour_csv, slam_matches_csv, slam_points_csv
+
+def serve_event(sackmann_server, monkeypatch, year=2020):
+    folder, url, _ = sackmann_server
+    tour_csv(year).write_csv(folder / f"atp_matches_{year}.csv")
+    slam_matches_csv(year).write_csv(folder / f"{year}-ausopen-matches.csv")
+    slam_points_csv(year).write_csv(folder / f"{year}-ausopen-points.csv")
+    monkeypatch.setattr(events, "SLAM_URL", f"{url}/")
+    monkeypatch.setitem(matches.TOUR_URLS, "ATP", f"{url}/atp_matches_")
+
+def test_get_points(sackmann_server, cache, monkeypatch, tmp_path_factory):
+    serve_event(sackmann_server, monkeypatch)
+    players = PlayerIndex(str(tmp_path_factory.mktemp("static") / "players.csv"))
+
+    points = events.EventData("atp", "Australian Open", 2020, cache=cache, players=players).get_points()
+    assert points.select("PointNumber").to_series().to_list() == [0, 1, 0, 1, 1, 2]
+    assert points.select("P1Score").to_series().to_list() == [0, 45, 15, 30, 0, 15]
+    assert points.schema["P1Score"] == pl.Int32
+
+def test_get_results(sackmann_server, cache, monkeypatch, tmp_path_factory):
+    serve_event(sackmann_server, monkeypatch)
+    path = tmp_path_factory.mktemp("static") / "players.csv"
+    players = PlayerIndex(str(path))
+
+    results = events.EventData("atp", "Australian Open", 2020, cache=cache, players=players).get_results()
+    matches_ = results.unique("match_id", maintain_order=True)
+
+    assert results.height == 4 # two points for each of the men's matches, no duplicated rows
+    assert matches_.select("match_id", "round", "p1_id", "p2_id", "rank", "rank_p2").rows() == [
+        ("2020-ausopen-1701", 7, 104925, 104745, 1, 2),
+        ("2020-ausopen-1601", 6, 104745, 104925, 2, 1), # N. Djokovic is ambiguous, resolves to best ranked candidate
+    ]
+
+    # The index is persisted & reused
+    index = PlayerIndex(str(path)).table
+    assert index.filter(pl.col("name") == "N. Djokovic").select("player_id").item() == 104925
+    assert index.height == 3
@@ -0,0 +1,33 @@
+import polars as pl
+from src.features import FeatureStore
+
+def test_feature_store(tmp_path):
+    source = tmp_path / "atp-usopen-2024.parquet"
+    pl.DataFrame({"match_id": ["2024-usopen-1101"], "x": [1]}).write_parquet(source)
+    (tmp_path / "winners.csv").write_text("match_id,winner\n")
+
+    calls = []
+    def compute(path):
+        calls.append(path)
+        return pl.read_parquet(path).with_columns(y=pl.col("x") * 2)
+
+    store = FeatureStore(dir=str(tmp_path / "features"), inputs=[str(tmp_path / "winners.csv")])
+    assert store.get(str(source), compute).select("y").item() == 2
+    assert store.get(str(source), compute).select("y").item() == 2
+    assert len(calls) == 1
+
+    # Served across instances
+    store = FeatureStore(dir=str(tmp_path / "features"), inputs=[str(tmp_path / "winners.csv")])
+    store.get(str(source), compute)
+    assert len(calls) == 1
+
+    # Changed source event
+    pl.DataFrame({"match_id": ["2024-usopen-1101"], "x": [5]}).write_parquet(source)
+    assert store.get(str(source), compute).select("y").item() == 10
+    assert len(calls) == 2
+
+    # Changed static input
+    (tmp_path / "winners.csv").write_text("match_id,winner\n2024-usopen-1101,1\n")
+    store = FeatureStore(dir=str(tmp_path / "features"), inputs=[str(tmp_path / "winners.csv")])
+    store.get(str(source), compute)
+    assert len(calls) == 3
@@ -0,0 +1,105 @@
+import os, shutil, numpy as np, polars as pl
+from src.form import PlayerForm, FORM
+from src.model import NeuralModel
+from src.players import join_name
+
+def copy_events(source, names):
+    os.makedirs(source, exist_ok=True)
+    for name in names:
+        shutil.copy(f"data/events/atp-{name}.parquet", source / f"atp-{name}.parquet")
+
+def test_incremental_matches_full_build(repo_root, tmp_path):
+    source = tmp_path / "events"
+    copy_events(source, ["wimbledon-2018", "usopen-2018"])
+    form = PlayerForm(dir=str(tmp_path / "form"), source=str(source))
+    first = form.update()
+    assert first > 0 and form.update() == 0
+
+    copy_events(source, ["australianopen-2019", "australianopen-2018"]) # one back-dated
+    reloaded = PlayerForm(dir=str(tmp_path / "form"), source=str(source))
+    assert reloaded.update() > 0
+
+    full = PlayerForm(dir=str(tmp_path / "full"), source=str(source))
+    full.update()
+    assert full.form().equals(reloaded.form())
+
+def test_no_leakage(repo_root, tmp_path):
+    source = tmp_path / "events"
+    copy_events(source, ["australianopen-2019", "frenchopen-2019", "wimbledon-2019"])
+    form = PlayerForm(dir=str(tmp_path / "form"), source=str(source), window=2)
+    form.update()
+
+    # The French Open features only see the Australian Open, as if the later events were never stored
+    earlier = tmp_path / "earlier"
+    copy_events(earlier, ["australianopen-2019"])
+    before = PlayerForm(dir=str(tmp_path / "before"), source=str(earlier), window=2)
+    before.update()
+    event = [str(source / "atp-frenchopen-2019.parquet")]
+    assert form.event_features(event).equals(before.event_features(event))
+
+    # Rolling rates over the last window matches, checked against a plain loop for the first player
+    history = form.history().sort("player", "date", "match_id")
+    player = history["player"][0]
+    rows = history.filter(pl.col("player") == player).to_dicts()
+    last = rows[-2:]
+    assert form.form().filter(pl.col("player") == player)["serve_won"][-1] == sum(i["serve_won"] for i in last) / sum(i["serve"] for i in last)
+
+def test_model_features(repo_root, tmp_path, store):
+    form = PlayerForm(dir=str(tmp_path / "form"))
+    form.update()
+
+    data = NeuralModel.load_data("data/events", 2019, 2019, store=store, form=form)
+    columns = [f"p{i}_form_{k}" for i in (1, 2) for k in FORM]
+    values = data.select(columns).to_numpy()
+    assert not np.isnan(values).any()
+    assert (data["p1_form_matches"] > 0).mean() > 0.8 # most players have earlier matches
+
+def test_players_keyed_by_id(repo_root, tmp_path):
+    # Two players renamed to one name but given their own ids keep separate histories
+    names = ["australianopen-2019", "frenchopen-2019"]
+    copy_events(tmp_path / "names", names)
+    events = {i: pl.read_parquet(f"data/events/atp-{i}.parquet").with_columns(pl.col("player1", "player2").cast(pl.String)) for i in names}
+    keys = [set(pl.concat([e["player1"], e["player2"]]).to_frame("name").select(join_name("name"))["name"]) for e in events.values()]
+    ids = {k: n for n, k in enumerate(sorted(keys[0] | keys[1]))}
+    a, b = sorted(keys[0] & keys[1])[:2]
+
+    os.makedirs(tmp_path / "ids")
+    for name, event in events.items():
+        event.with_columns(
+            *[join_name(f"player{i}").replace_strict(ids, return_dtype=pl.Int32).alias(f"p{i}_id") for i in (1, 2)],
+            *[pl.when(join_name(f"player{i}") == b).then(pl.lit(a)).otherwise(pl.col(f"player{i}")).alias(f"player{i}") for i in (1, 2)],
+        ).write_parquet(tmp_path / "ids" / f"atp-{name}.parquet")
+
+    by_name = PlayerForm(dir=str(tmp_path / "form_names"), source=str(tmp_path / "names"))
+    by_id = PlayerForm(dir=str(tmp_path / "form_ids"), source=str(tmp_path / "ids"))
+    by_name.update(), by_id.update()
+    expected = by_name.event_features([str(tmp_path / "names/atp-frenchopen-2019.parquet")])
+    assert by_id.event_features([str(tmp_path / "ids/atp-frenchopen-2019.parquet")]).equals(expected)
+
+def test_legacy_names_resolved(repo_root, tmp_path):
+    # A name-only event (as stored before ids) and an id-bearing one key the same player alike
+    copy_events(tmp_path / "events", ["australianopen-2019"])
+    djokovic = 104925
+    pl.read_parquet("data/events/atp-frenchopen-2019.parquet").with_columns(pl.col("player1", "player2").cast(pl.String)).with_columns(
+        *[pl.when(join_name(f"player{i}") == "N Djokovic").then(djokovic).otherwise(pl.col(f"p{i}_id")).cast(pl.Int64).alias(f"p{i}_id") for i in (1, 2)],
+    ).write_parquet(tmp_path / "events" / "atp-frenchopen-2019.parquet")
+    french = [str(tmp_path / "events" / "atp-frenchopen-2019.parquet")]
+
+    form = PlayerForm(dir=str(tmp_path / "form"), source=str(tmp_path / "events"))
+    form.update()
+    history = form.history()
+    assert history.filter(pl.col("player") == f"#{djokovic}")["event"].unique().sort().to_list() == ["atp-australianopen-2019", "atp-frenchopen-2019"]
+    assert history.filter(pl.col("player").str.starts_with("#")).height / history.height > 0.9
+    assert "N Djokovic" not in history["player"]
+
+    # His French Open form counts his Australian Open matches
+    features = form.event_features(french).join(
+        pl.read_parquet(french[0]).filter((pl.col("p1_id") == djokovic) | (pl.col("p2_id") == djokovic)).select(pl.col("match_id").cast(pl.String), "p1_id").unique(), on="match_id",
+    )
+    assert features.height > 0
+    assert features.select(pl.when(pl.col("p1_id") == djokovic).then(pl.col("p1_form_matches")).otherwise(pl.col("p2_form_matches")).min()).item() > 0
+
+    # Without the tour results to resolve names, the name-only event would be keyed apart
+    unresolved = PlayerForm(dir=str(tmp_path / "unresolved"), source=str(tmp_path / "events"), matches=str(tmp_path / "none"))
+    unresolved.update()
+    assert "N Djokovic" in unresolved.history()["player"]
@@ -0,0 +1,25 @@
+import numpy as np
+from src import inference
+
+def test_forward_pass():
+    rng = np.random.default_rng(0)
+    weights = [rng.normal(size=(4, 8)), rng.normal(size=(8, 1))]
+    biases = [rng.normal(size=8), rng.normal(size=1)]
+    model = inference.DenseModel(weights, biases, ["relu", "sigmoid"])
+
+    x = rng.normal(size=(10, 4))
+    expected = 1 / (1 + np.exp(-(np.maximum(x @ weights[0] + biases[0], 0) @ weights[1] + biases[1])))
+    assert model.predict(x).shape == (10, 1)
+    assert np.allclose(model.predict(x, batch_size=3), expected, atol=1e-5)
+
+def test_export(repo_root, tmp_path):
+    out = inference.export("models/dropshot.keras", str(tmp_path / "dropshot.npz"))
+    model = inference.DenseModel.load(out)
+
+    assert [w.shape[1] for w in model.weights] == [256, 128, 64, 32, 16, 1]
+    assert model.activations == ["relu"] * 5 + ["sigmoid"]
+    x = np.random.default_rng(0).random((5, model.weights[0].shape[0]))
+    assert np.allclose(model.predict(x), inference.DenseModel.load("models/dropshot.keras").predict(x))
+
+def test_load_model_cache(repo_root):
+    assert inference.load_model("models/dropshot.npz") is inference.load_model("models/dropshot.npz")
@@ -0,0 +1,51 @@
+import polars as pl, pytest
+from src import instrument, matches, events
+from src.players import PlayerIndex
+from tests.helpers import tour_csv
+from tests.test_events import serve_event
+
+@pytest.fixture
+def profile(tmp_path):
+    path = str(tmp_path / "run.ndjson")
+    instrument.enable(path, plans=True)
+    yield path
+    instrument.disable()
+
+def test_disabled():
+    assert instrument.stage("anything") is instrument._NULL
+
+def test_stage_records(profile):
+    with instrument.stage("demo", rows_in=10) as s:
+        s.set(rows_out=5).plan(pl.LazyFrame({"a": [1]}).filter(pl.col("a") > 0))
+
+    with pytest.raises(ValueError):
+        with instrument.stage("failing"):
+            raise ValueError()
+
+    demo, failing = instrument.load(profile)
+    assert demo["stage"] == "demo" and demo["rows_in"] == 10 and demo["rows_out"] == 5
+    assert "FILTER" in demo["plan"]
+    assert demo["seconds"] >= 0 and demo["process_peak_rss_mb"] > 0
+    assert demo["rss_delta_mb"] == round(demo["rss_end_mb"] - demo["rss_start_mb"], 1)
+    assert failing["error"] == "ValueError"
+
+def test_pipeline_profile_and_diff(profile, sackmann_server, cache, repo_root, tmp_path):
+    folder, url, _ = sackmann_server
+    tour_csv(2020).write_csv(folder / "atp_matches_2020.csv")
+    matches.get_tour_results(2020, 2021, url_base=f"{url}/atp_matches_", cache=cache)
+
+    summary = instrument.summarise(instrument.load(profile))
+    assert summary["matches.fetch"]["rows_out"] == 4 and summary["matches.fetch"]["bytes_read"] > 0
+    assert summary["matches.transform"]["rows_in"] == 4
+
+    report = instrument.diff(profile, profile)
+    assert "matches.transform" in report
+
+def test_event_bytes_read(profile, sackmann_server, cache, monkeypatch, tmp_path):
+    serve_event(sackmann_server, monkeypatch)
+    events.EventData("atp", "Australian Open", 2020, cache=cache, players=PlayerIndex(str(tmp_path / "players.csv"))).get_results()
+
+    summary = instrument.summarise(instrument.load(profile))
+    sources = sum(cache.size(url) for url in [f"{sackmann_server[1]}/{i}" for i in ["2020-ausopen-matches.csv", "2020-ausopen-points.csv", "atp_matches_2020.csv"]])
+    assert sources > 0
+    assert summary["events.download"]["bytes_read"] == summary["events.join"]["bytes_read"] == sources
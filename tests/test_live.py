@@ -0,0 +1,46 @@
+import json, socket, threading, numpy as np, polars as pl, pytest
+from src.live import LiveScorer, listen, replay, tail
+from src.model import NeuralModel
+
+def test_replay_matches_post_match_features(repo_root):
+    file = "data/events/atp-usopen-2024.parquet"
+    result = replay(file, every=64)
+    assert result["points"] > 0 and result["matches"] == 127
+
+    expected = NeuralModel.pred("models/dropshot.npz", NeuralModel.features(NeuralModel.scan_events([file])).collect())
+    live = result["scorer"].table().join(expected.select("match_id", P1_win_post="P1_win"), on="match_id")
+    assert live.height == expected.height
+    assert (live["P1_win"] - live["P1_win_post"]).abs().max() < 1e-5
+
+def test_update_and_batched_score(repo_root):
+    scorer = LiveScorer(capacity=1)
+    scorer.add_match("2024-usopen-1101", "hard", 25.0, 30.0, 9000, 1000)
+    with pytest.raises(KeyError):
+        scorer.update({"match_id": "2024-usopen-1102", "PointServer": 1})
+
+    scorer.update({"match_id": "2024-usopen-1101", "PointServer": 1, "ServeIndicator": 1, "PointWinner": 1, "P1Winner": 1})
+    scorer.update({ # events table rows register their match, feed values may be strings
+        "match_id": "2024-usopen-1102", "surface": "hard", "age": 20.0, "age_p2": 21.0, "rank_points": 500, "rank_points_p2": 600,
+        "PointServer": "2", "ServeNumber": "2", "PointWinner": "1", "P1UnfErr": "",
+    })
+    features = scorer.features(np.arange(2))
+    assert np.allclose(features[0, 6:], [1.0, 0.5, 0.7, 0.5, 1.0, 0.0]) # priors until a serve type is played
+    assert np.allclose(features[1, 6:], [0.7, 0.5, 0.7, 0.0, 0.0, 0.0])
+
+    scores = scorer.score()
+    assert list(scores) == ["2024-usopen-1101", "2024-usopen-1102"] and scorer.score() == {}
+
+def test_point_sources(tmp_path):
+    points = [{"match_id": "2024-usopen-1101", "PointServer": 1, "PointWinner": i % 2 + 1} for i in range(5)]
+    path = tmp_path / "points.ndjson"
+    path.write_text("".join(json.dumps(i) + "\n" for i in points))
+    assert list(tail(str(path), follow=False)) == points
+
+    server = socket.create_server(("127.0.0.1", 0))
+    def feed():
+        conn, _ = server.accept()
+        with conn:
+            conn.sendall(path.read_bytes())
+    threading.Thread(target=feed, daemon=True).start()
+    assert list(listen(*server.getsockname(), timeout=5)) == points
+    server.close()
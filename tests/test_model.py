@@ -0,0 +1,33 @@
+import sys, pytest, numpy as np, polars as pl
+from polars.testing import assert_frame_equal
+from src.model import NeuralModel
+
+def test_event_files(repo_root):
+    files = NeuralModel.event_files("data/events", 2023, 2024, ["usopen", "wimbledon"])
+    assert files == [
+        "data/events/atp-usopen-2023.parquet", "data/events/atp-usopen-2024.parquet", 
+        "data/events/atp-wimbledon-2023.parquet", "data/events/atp-wimbledon-2024.parquet",
+    ]
+
+@pytest.mark.parametrize(argnames="streaming", argvalues=[False, True])
+def test_load_data_slice(repo_root, store, streaming):
+    full = NeuralModel.create_feature_table("data/events", store=store).filter(
+        (pl.col("year") == 2024 - 2011) & (pl.col("match_id").str.contains("usopen"))
+    )
+    data = NeuralModel.load_data("data/events", 2024, 2024, ["usopen"], streaming=streaming, store=store)
+
+    assert data.height > 0
+    assert_frame_equal(data, full)
+
+def test_import_without_tensorflow():
+    assert "tensorflow" not in sys.modules
+
+@pytest.mark.parametrize(argnames="path", argvalues=["models/dropshot.npz", "models/dropshot.keras"])
+def test_pred_matches_keras(repo_root, path):
+    # data/dropshot.csv holds features & predictions from keras' Model.predict
+    reference = pl.read_csv("data/dropshot.csv")
+    data = reference.drop("P1_win", "P2_win")
+
+    result = NeuralModel.pred(path, data)
+    assert np.allclose(result.select("P1_win").to_numpy(), reference.select("P1_win").to_numpy(), atol=1e-5)
+    assert np.allclose(result.select("P2_win").to_numpy(), reference.select("P2_win").to_numpy(), atol=1e-5)
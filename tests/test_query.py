@@ -0,0 +1,38 @@
+import os, shutil, polars as pl
+from src.matches import load_tour_results
+from src.query import MatchIndex
+
+def test_lookups_match_full_scan(repo_root, tmp_path):
+    index = MatchIndex("ATP", dir=str(tmp_path))
+    full = load_tour_results("ATP").collect()
+
+    djokovic, nadal = [index.find_player(i)["player_id"][0] for i in ["Novak Djokovic", "Rafael Nadal"]]
+    involved = lambda a: (pl.col("winner_id") == a) | (pl.col("loser_id") == a)
+
+    history = index.player(djokovic)
+    assert history.height == full.filter(involved(djokovic)).height
+    assert history["tourney_date"].is_sorted() and history["won"].sum() == full.filter(pl.col("winner_id") == djokovic).height
+    assert index.player(djokovic, 2015, 2016)["year"].unique().sort().to_list() == [2015, 2016]
+    assert index.player(-1).height == 0
+
+    h2h = index.head_to_head(djokovic, nadal)
+    assert h2h.height == full.filter(involved(djokovic) & involved(nadal)).height
+    assert (h2h["won"] == (h2h["winner_id"] == djokovic)).all()
+
+    wimbledon = index.tournament("wimbledon", 2019)
+    assert wimbledon.height == 127 and wimbledon["match_num"].is_sorted()
+    assert index.tournament("Wimbledon").height == full.filter(pl.col("tourney_name") == "Wimbledon").height
+
+def test_rebuilt_when_source_changes(repo_root, tmp_path):
+    source = tmp_path / "matches"
+    for year in [2019, 2020]:
+        os.makedirs(source / f"ATP/year={year}")
+        shutil.copy(f"data/matches/ATP/year={year}/data.parquet", source / f"ATP/year={year}/data.parquet")
+
+    index = MatchIndex("ATP", dir=str(tmp_path / "query"), source=str(source))
+    assert index.tournament("Wimbledon")["year"].unique().to_list() == [2019]
+
+    pl.read_parquet(source / "ATP/year=2020/data.parquet").with_columns(
+        tourney_name = pl.when(pl.col("tourney_name") == "Us Open").then(pl.lit("Wimbledon")).otherwise(pl.col("tourney_name")),
+    ).write_parquet(source / "ATP/year=2020/data.parquet")
+    assert index.tournament("Wimbledon")["year"].unique().sort().to_list() == [2019, 2020]
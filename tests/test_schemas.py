@@ -0,0 +1,47 @@
+import io, polars as pl
+from src.schemas import SLAM_POINTS, TOUR_RESULTS, RANKINGS, read_csv
+from tests.helpers import tour_csv, slam_points_csv
+
+def csv(frame: pl.DataFrame) -> bytes:
+    buffer = io.BytesIO()
+    frame.write_csv(buffer)
+    return buffer.getvalue()
+
+def test_variants_read_alike():
+    current = slam_points_csv(2020)
+    legacy = current.rename({"Rally": "RallyCount", "ServeIndicator": "ServeNumber"}).with_columns(
+        Speed_MPH = (pl.col("Speed_KMH") / 1.60934).cast(pl.Int64),
+    ).drop("Speed_KMH")
+
+    a, b = read_csv(csv(current), "slam_points"), read_csv(csv(legacy), "slam_points")
+    assert a.schema == b.schema == pl.Schema(SLAM_POINTS)
+    assert a.equals(b)
+    assert a["serve_mph"].to_list() == [124, 111, 118, 105, 99, 93]
+    assert a["P1DistanceRun"].null_count() == a.height # declared, missing from the file
+
+def test_projection():
+    data = csv(tour_csv(2020))
+    ranks = read_csv(data, "tour", tuple(RANKINGS))
+    assert ranks.columns == RANKINGS
+    assert ranks.schema == pl.Schema({i: TOUR_RESULTS[i] for i in RANKINGS})
+
+    # Explicit types, no inference (tourney_date stays text for matches.parse_tourney_date, the seeds aren't read)
+    tour = read_csv(data, "tour")
+    assert tour.schema == pl.Schema(TOUR_RESULTS)
+    assert tour["tourney_date"][0] == "20200115"
+
+def test_empty_preferred_variant():
+    # 2016+ AO / FO files carry empty ServeIndicator, Speed_MPH & Rally columns next to the filled variants
+    points = slam_points_csv(2020)
+    split = points.with_columns(
+        ServeNumber = pl.col("ServeIndicator"),
+        ServeIndicator = pl.lit(None, pl.Int64),
+        Speed_MPH = pl.when(pl.int_range(pl.len()) == 0).then(pl.lit(100)),
+        RallyCount = pl.col("Rally"),
+        Rally = pl.lit(None, pl.Int64),
+    )
+
+    data = read_csv(csv(split), "slam_points")
+    assert data["ServeIndicator"].to_list() == points["ServeIndicator"].to_list()
+    assert data["rally_count"].to_list() == points["Rally"].to_list()
+    assert data["serve_mph"].to_list() == [100, 111, 118, 105, 99, 93]
@@ -0,0 +1,39 @@
+import os, numpy as np, polars as pl
+from src import search
+
+def fixed_trial(config, x_train, y_train, x_test, y_test):
+    # Checks the worker maps the shared, read-only matrix & has its thread limits, then scores from the config
+    assert not search._shared["x"].flags.writeable
+    assert os.environ["OMP_NUM_THREADS"] == "1"
+    return config["score"]
+
+def centroid_trial(config, x_train, y_train, x_test, y_test):
+    centroids = np.stack([x_train[y_train == k].mean(axis=0) for k in (0, 1)])
+    pred = np.argmin(((x_test[:, None, :] - centroids[None]) ** 2).sum(axis=2), axis=1)
+    return float(100 * np.mean(pred == y_test))
+
+def features() -> pl.DataFrame:
+    # Stored predictions as stand in labels
+    return pl.read_csv("data/dropshot.csv").with_columns(
+        winner=pl.when(pl.col("P1_win") > 0.5).then(1).otherwise(2)
+    ).drop("P1_win", "P2_win")
+
+def test_grid_and_folds():
+    assert search.grid(a=[1, 2], b=["x"]) == [{"a": 1, "b": "x"}, {"a": 2, "b": "x"}]
+    splits = search.kfold(10, 3)
+    assert sorted(np.concatenate([test for _, test in splits]).tolist()) == list(range(10))
+    assert all(len(set(train) & set(test)) == 0 for train, test in splits)
+
+def test_search_leaderboard(repo_root, tmp_path):
+    data = features()
+    configs = [{"score": 90.0}, {"score": 50.0}, {"score": 89.5}]
+    table = search.search(data, configs, folds=4, workers=1, trainer=fixed_trial, leaderboard=str(tmp_path / "board.csv"))
+
+    assert table.select("trial", "folds", "pruned").rows() == [(0, 4, False), (2, 4, False), (1, 2, True)]
+    assert pl.read_csv(tmp_path / "board.csv").height == 3
+
+def test_search_parallel(repo_root):
+    data = features()
+    table = search.search(data, [{"k": i} for i in range(4)], folds=3, workers=2, trainer=centroid_trial, leaderboard=None)
+    assert table.height == 4
+    assert table.select(pl.col("accuracy").n_unique()).item() == 1 # same folds for every trial
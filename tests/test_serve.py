@@ -0,0 +1,66 @@
+import json, shutil, threading, numpy as np, polars as pl, pytest
+from urllib.request import Request, urlopen
+from src.inference import DenseModel
+from src.serve import MicroBatcher, PredictionService, serve
+
+@pytest.fixture
+def features(repo_root):
+    return pl.read_csv("data/dropshot.csv").drop("P1_win", "P2_win")
+
+def test_micro_batching():
+    calls = []
+    release = threading.Event()
+    def predict(rows):
+        calls.append(len(rows))
+        release.wait()
+        return rows[:, 0] * 2
+
+    batcher = MicroBatcher(predict, max_wait=0)
+    first = batcher.submit(np.array([[1.0]])) # occupies the worker until released
+    while len(calls) == 0:
+        pass
+    queued = [batcher.submit(np.array([[float(i)], [float(i)]])) for i in range(10)]
+    release.set()
+
+    assert first.result().tolist() == [2.0]
+    assert [i.result().tolist() for i in queued] == [[2.0 * i] * 2 for i in range(10)]
+    assert calls == [1, 20]
+
+def test_service_http(features, tmp_path):
+    path = str(tmp_path / "model.npz")
+    shutil.copy("models/dropshot.npz", path)
+    service = PredictionService(model_path=path, features=features, check_every=0)
+
+    server = serve(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    post = lambda body: json.loads(urlopen(Request(f"{url}/predict", data=json.dumps(body).encode())).read())["predictions"]
+
+    single = json.loads(urlopen(f"{url}/predict?match_id=2022-usopen-1101").read())["predictions"]
+    assert single[0]["match_id"] == "2022-usopen-1101" and single[0]["P1_win"] > 0.99
+
+    bulk = post({"match_ids": ["2022-usopen-1101", "2022-usopen-1102"]})
+    assert [i["match_id"] for i in bulk] == ["2022-usopen-1101", "2022-usopen-1102"]
+    assert post({"features": [[0.0] * 12]})[0]["P1_win"] == pytest.approx(service.model.predict(np.zeros((1, 12)))[0, 0])
+
+    # Hot swap : a new model file goes live on the next batch
+    model = DenseModel.load(path)
+    model.biases[-1] = model.biases[-1] - 100
+    model.save(str(tmp_path / "new.npz"))
+    shutil.move(str(tmp_path / "new.npz"), path)
+    assert post({"match_ids": ["2022-usopen-1101"]})[0]["P1_win"] < 0.01
+
+    server.shutdown()
+
+def test_service_unknown_match(features):
+    service = PredictionService(model_path="models/dropshot.npz", features=features)
+    with pytest.raises(KeyError):
+        service.predict_matches(["1999-usopen-1101"])
+
+def test_bad_width_rejected_alone(features):
+    service = PredictionService(model_path="models/dropshot.npz", features=features)
+    with pytest.raises(ValueError):
+        service.predict_features([[0.0] * 11])
+    with pytest.raises(ValueError):
+        service.predict_features([[0.0] * 12, [0.0] * 11]) # ragged
+    assert len(service.predict_features([[0.0] * 12])) == 1
@@ -0,0 +1,85 @@
+import numpy as np, polars as pl, pytest
+from src.simulate import Draw, bracket, completed_results, player_profiles, round_names, simulate
+from src.model import NeuralModel
+from src.players import fill_ids, name_ids, player_key, tour_players
+
+class RankModel:
+    '''Stand in for the network : p1 wins with a probability set by the rank points gap'''
+    def predict(self, x):
+        return (1 / (1 + np.exp(-20 * (x[:, 4] - x[:, 5]))))[:, None]
+
+@pytest.fixture
+def draw():
+    players = pl.DataFrame({
+        "player": [f"p{i}" for i in range(8)],
+        "age": [25.0] * 8,
+        "rank_points": [8000, 100, 3000, 500, 5000, 200, 1000, 2000],
+        "first_won": [0.7] * 8, "secnd_won": [0.5] * 8, "win_err": [1.0] * 8,
+    })
+    return Draw(players, 2024, "hard", model=RankModel())
+
+def test_matrix(draw):
+    matrix = draw.matrix
+    assert np.allclose(matrix + matrix.T, 1) and matrix[0, 1] > 0.99
+    assert draw.matrix is matrix # scored once per draw
+    assert round_names(128) == ["R64", "R32", "R16", "QF", "SF", "F", "W"]
+    with pytest.raises(ValueError):
+        Draw(draw.players.head(6), 2024, "hard", model=RankModel())
+
+def test_simulate(draw):
+    table = simulate(draw, sims=20_000, seed=7, shard_size=5_000)
+    assert table.columns == ["player", "SF", "F", "W"]
+    assert table.select(pl.exclude("player")).sum().row(0) == pytest.approx((4, 2, 1))
+    assert table["W"].arg_max() == 0
+
+    # exact for a coin flip draw
+    coin = bracket(np.full((8, 8), 0.5), 200_000, 0) / 200_000
+    assert np.allclose(coin, [[0.5] * 8, [0.25] * 8, [0.125] * 8], atol=0.01)
+
+    # fixed seeds, independent of how shards are spread over processes
+    assert simulate(draw, sims=20_000, seed=7, shard_size=5_000, workers=2).equals(table)
+    assert not simulate(draw, sims=20_000, seed=8, shard_size=5_000).equals(table)
+
+def test_completed_results(draw):
+    table = simulate(draw, sims=10_000, results=[("p1", "p0")])
+    assert table.filter(pl.col("player") == "p0").row(0)[1:] == (0, 0, 0)
+    assert table.filter(pl.col("player") == "p1")["SF"][0] == 1
+
+def test_draw_from_events(repo_root):
+    file = "data/events/atp-usopen-2024.parquet"
+    draw = Draw.from_events(file)
+    assert draw.players.height == 128 and draw.players.null_count().sum_horizontal()[0] == 0
+    assert draw.players["player"][:2].to_list() == ["Jannik Sinner", "Mackenzie McDonald"]
+
+    results = completed_results(file, through_round=6)
+    assert len(results) == 126
+    table = simulate(draw, sims=10_000, results=results)
+    assert table.filter(pl.col("F") == 1)["player"].sort().to_list() == ["Jannik Sinner", "Taylor Fritz"]
+
+def test_profiles_matched_by_id(repo_root, store):
+    # AO names are abbreviated (N. Djokovic), the earlier Wimbledon & US Open names are in full (Novak Djokovic)
+    names = name_ids(tour_players("ATP"))
+    files = [i for i in NeuralModel.event_files("data/events", 2017, 2018) if "/atp-" in i]
+    profiles = player_profiles(files, store, names)
+
+    draw = pl.read_parquet("data/events/atp-australianopen-2019.parquet", columns=["player1", "player2", "p1_id", "p2_id"]).with_columns(
+        pl.col("player1", "player2").cast(pl.String), pl.col("p1_id", "p2_id").cast(pl.Int64),
+    ).unique()
+    for i in (1, 2):
+        draw = fill_ids(draw, names, f"p{i}_id", f"player{i}")
+    keys = pl.concat([draw.select(player_key(f"p{i}_id", f"player{i}").alias("key")) for i in (1, 2)]).unique()
+    assert "#104925" in keys["key"] and "#104925" in profiles["key"]
+    assert keys["key"].is_in(profiles["key"].implode()).mean() > 0.85 # the rest have no slam matches in the two years before
+
+def test_draw_match_numbers(repo_root, tmp_path):
+    # Recent slams number matches MS101 ... rather than 1101 ...
+    file = "data/events/atp-australianopen-2021.parquet"
+    draw = Draw.from_events(file, model=RankModel())
+    first = pl.read_parquet(file).filter(pl.col("match_id").cast(pl.String).str.ends_with("-MS101"))
+    assert draw.players.height == 128
+    assert draw.players["player"][:2].to_list() == [first["player1"][0], first["player2"][0]]
+
+    # Women's draws are numbered WS101 ... / 2101 ...
+    women = pl.read_parquet(file).with_columns(pl.col("match_id").cast(pl.String).str.replace("MS", "WS"))
+    women.write_parquet(tmp_path / "wta-australianopen-2021.parquet")
+    assert Draw.from_events(str(tmp_path / "wta-australianopen-2021.parquet"), model=RankModel()).players["player"].equals(draw.players["player"])
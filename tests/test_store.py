@@ -0,0 +1,30 @@
+import polars as pl
+from src import store
+
+def legacy_event() -> pl.DataFrame:
+    return pl.DataFrame({
+        "match_id": ["2011-wimbledon-1102", "2011-wimbledon-1101", "2011-wimbledon-1101"],
+        "surface": ["grass"] * 3,
+        "winner": ["2", None, None],
+        "PointNumber": [1, 1, 2],
+        "Speed_KMH": [161, 193, None],
+        "RallyCount": [3, 1, 7],
+        "ServeNumber": [1, 2, 1],
+        "P1Winner": [0, 1, 0],
+    })
+
+def test_conform():
+    data = store.conform(legacy_event().lazy()).collect()
+
+    assert data.schema == pl.Schema(store.POINT_SCHEMA)
+    assert data.select("match_id").to_series().cast(pl.String).to_list() == ["2011-wimbledon-1101", "2011-wimbledon-1101", "2011-wimbledon-1102"]
+    assert data.select("serve_mph", "rally_count", "ServeIndicator", "winner").rows() == [(119, 1, 2, None), (None, 7, 1, None), (100, 3, 1, 2)]
+
+def test_write_and_scan(tmp_path):
+    store.write_points(legacy_event(), str(tmp_path / "atp-wimbledon-2011.parquet"))
+    store.write_points(legacy_event().with_columns(pl.col("match_id").str.replace("2011", "2012")), str(tmp_path / "atp-wimbledon-2012.parquet"))
+    
+    points = store.scan_points(str(tmp_path))
+    assert points.collect_schema() == pl.Schema(store.POINT_SCHEMA)
+    assert points.select(pl.len()).collect().item() == 6
+    assert store.load_points(str(tmp_path)).height == 6
@@ -0,0 +1,31 @@
+import os, polars as pl
+import pytest
+from benchmarks.synthetic import TOUR_SEASONS, TOUR_MATCHES, SLAMS, seasons, generate
+from src.matches import parse_tourney_date
+from src.schemas import SLAM_MATCHES, read_csv
+
+def test_seasons():
+    assert seasons(1) == {"tour_years": (1968, 2025), "slam_years": (2011, 2025)}
+    for scale in (10, 100, 140): # 100x used to run seasons back past year 1
+        years = seasons(scale)
+        start, end = years["tour_years"]
+        assert 1000 <= start <= years["slam_years"][0] < end <= 10_000
+        assert end - start == TOUR_SEASONS * scale
+    with pytest.raises(ValueError):
+        seasons(141)
+
+def test_generate(tmp_path):
+    # The last season of the 100x archive, its dates parse like any Sackmann file
+    year = seasons(100)["tour_years"][1] - 1
+    assert generate(str(tmp_path), years={"tour_years": (year, year + 1), "slam_years": (year, year + 1)})["tour_years"] == (year, year + 1)
+    assert sorted(os.listdir(tmp_path)) == sorted([f"atp_matches_{year}.csv", *[f"{year}-{s}-{k}.csv" for s in SLAMS for k in ("matches", "points")]])
+
+    with open(tmp_path / f"atp_matches_{year}.csv", "rb") as f:
+        tour = parse_tourney_date(read_csv(f, "tour"))
+    assert tour.height == TOUR_MATCHES + 127 * len(SLAMS)
+    assert tour["winner_id"].null_count() == tour["tourney_date"].null_count() == 0
+    assert (tour["tourney_date"].dt.year() == year).all()
+
+    with open(tmp_path / f"{year}-usopen-matches.csv", "rb") as f:
+        matches = read_csv(f, "slam_matches")
+    assert matches.schema == pl.Schema(SLAM_MATCHES) and matches.height == 127